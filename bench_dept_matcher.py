@@ -0,0 +1,81 @@
+"""
+Benchmark get_school_for_department before and after precompiling the matcher.
+
+"Before" is the previous implementation: rebuild the pattern table and run a
+fresh word-boundary re.search per pattern on every call. "After" is the
+precompiled single-regex matcher in umn_structure. Every department string
+in pi_details_ldap.json (plus shuffled combinations of pattern keywords, to
+exercise priority between several matches) must map identically.
+
+Usage:
+    python3 bench_dept_matcher.py [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import time
+from umn_structure import get_school_for_department, DEPT_PATTERNS
+
+FILE_PI_DETAILS = "pi_details_ldap.json"
+
+
+def legacy_get_school_for_department(dept_str):
+    """The pre-compilation implementation, kept here as the reference."""
+    if not dept_str:
+        return None, None, None
+    dept_lower = dept_str.lower()
+    dept_patterns = dict(DEPT_PATTERNS)  # the table used to be rebuilt on every call
+    for pattern, (school, dept, division) in dept_patterns.items():
+        if re.search(r'\b' + re.escape(pattern) + r'\b', dept_lower):
+            return school, dept, division
+    return None, dept_str, None
+
+
+def load_corpus():
+    corpus = []
+    if os.path.exists(FILE_PI_DETAILS):
+        with open(FILE_PI_DETAILS, "r") as f:
+            corpus = [d.get("department") for d in json.load(f).values() if d.get("department")]
+    rng = random.Random(0)
+    keywords = list(DEPT_PATTERNS)
+    for _ in range(500):
+        words = rng.sample(keywords, 3) + ["admin", "dept", "ctr"]
+        rng.shuffle(words)
+        corpus.append(" ".join(words).title())
+    return corpus
+
+
+def time_per_call(fn, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        re.purge()  # keep re's internal cache from hiding per-call compile cost
+        start = time.perf_counter()
+        for dept in corpus:
+            fn(dept)
+        best = min(best, time.perf_counter() - start)
+    return best / len(corpus)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the department matcher")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing rounds (best is reported)")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    mismatches = [d for d in corpus if legacy_get_school_for_department(d) != get_school_for_department(d)]
+    print(f"{len(corpus)} department strings, {len(DEPT_PATTERNS)} patterns")
+    if mismatches:
+        print(f"WARNING: {len(mismatches)} strings map differently, e.g. {mismatches[:3]}")
+    else:
+        print("Before and after map every string identically")
+
+    before = time_per_call(legacy_get_school_for_department, corpus, args.repeat)
+    after = time_per_call(get_school_for_department, corpus, args.repeat)
+    print(f"before: {before * 1e6:8.1f} us/call")
+    print(f"after:  {after * 1e6:8.1f} us/call  ({before / after:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
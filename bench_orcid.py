@@ -0,0 +1,144 @@
+"""
+Benchmark the ORCID lookup modes against a local stand-in server.
+
+Serves a synthetic ORCID registry (search, expanded-search, /employments)
+on 127.0.0.1, where every PI's surname is shared by many researchers at
+other institutions, and compares request volume and wall time of
+get_pi_details with and without expanded search. Both modes must return
+the same matches.
+
+Usage:
+    python3 bench_orcid.py [--pis 50] [--candidates 12] [--latency 0.02]
+"""
+import argparse
+import contextlib
+import io
+import json
+import threading
+import time
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import http_client
+import fetch_pi_details
+from fetch_pi_details import get_pi_details, EmploymentCache
+
+ORG_NAME = "University of Minnesota"
+OTHER_ORGS = ["Harvard University", "University of Michigan", "Mayo Clinic", "Stanford University"]
+
+
+def build_registry(num_pis, candidates):
+    """{orcid_id: (family, given, [(org, ended)])}; one current UMN match per PI among `candidates` namesakes."""
+    registry = {}
+    for p in range(num_pis):
+        family, given = f"Surname{p}", f"Given{p}"
+        for c in range(candidates):
+            orcid_id = f"0000-{p:04d}-{c:04d}"
+            if c == candidates - 1:
+                affiliations = [(ORG_NAME, False)]
+            elif c % 5 == 0:
+                affiliations = [(ORG_NAME, True), (OTHER_ORGS[c % len(OTHER_ORGS)], False)]  # former UMN
+            else:
+                affiliations = [(OTHER_ORGS[c % len(OTHER_ORGS)], False)]
+            registry[orcid_id] = (family, given, affiliations)
+    return registry
+
+
+def make_handler(registry, counts, latency):
+    lock = threading.Lock()
+
+    def count(endpoint):
+        with lock:
+            counts[endpoint] += 1
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _json(self, obj):
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _matches(self, query):
+            family = query.split("family-name:")[1].split(" ")[0].lower()
+            given = query.split("given-names:")[1].split(" ")[0].lower()
+            return [o for o, (f, g, _) in registry.items() if f.lower() == family and g.lower().startswith(given)]
+
+        def do_GET(self):
+            time.sleep(latency)
+            url = urllib.parse.urlparse(self.path)
+            query = urllib.parse.unquote(urllib.parse.parse_qs(url.query).get("q", [""])[0])
+            if url.path.endswith("/expanded-search/"):
+                count("expanded-search")
+                ids = self._matches(query)
+                self._json({"num-found": len(ids), "expanded-result": [
+                    {"orcid-id": o, "family-names": registry[o][0], "given-names": registry[o][1],
+                     "institution-name": [org for org, _ in registry[o][2]]} for o in ids]})
+            elif url.path.endswith("/search/"):
+                count("search")
+                ids = self._matches(query)
+                self._json({"num-found": len(ids), "result": [{"orcid-identifier": {"path": o}} for o in ids]})
+            elif url.path.endswith("/employments"):
+                count("employments")
+                orcid_id = url.path.split("/")[-2]
+                self._json({"affiliation-group": [{"summaries": [{"employment-summary": {
+                    "end-date": {"year": {"value": "2020"}} if ended else None,
+                    "role-title": "Professor", "department-name": "Psychiatry",
+                    "organization": {"name": org}}}]} for org, ended in registry[orcid_id][2]]})
+            else:
+                self.send_response(404)
+                self.end_headers()
+    return Handler
+
+
+def run(mode, pi_names, counts):
+    for key in counts:
+        counts[key] = 0
+    cache = EmploymentCache()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # keep per-lookup progress out of the report
+        results = {name: get_pi_details(name, cache=cache, expanded=(mode == "expanded")) for name in pi_names}
+    elapsed = time.perf_counter() - start
+    return results, dict(counts), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ORCID search vs expanded search")
+    parser.add_argument("--pis", type=int, default=50, help="Number of PIs to look up")
+    parser.add_argument("--candidates", type=int, default=12, help="Namesakes per PI in the registry")
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated server latency per request (seconds)")
+    args = parser.parse_args()
+
+    registry = build_registry(args.pis, args.candidates)
+    counts = {"search": 0, "expanded-search": 0, "employments": 0}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(registry, counts, args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fetch_pi_details.ORCID_API_BASE = f"http://127.0.0.1:{server.server_port}/v3.0"
+    http_client.HOST_LIMITS["127.0.0.1"] = {"rate": 1000.0, "max_rate": 1000.0, "max_concurrency": 16}
+
+    pi_names = [f"SURNAME{p}, GIVEN{p}" for p in range(args.pis)]
+    report = []
+    for mode in ("search", "expanded"):
+        results, mode_counts, elapsed = run(mode, pi_names, counts)
+        report.append((mode, results, mode_counts, elapsed))
+    server.shutdown()
+
+    print(f"\n{args.pis} PIs, {args.candidates} namesakes each, {args.latency * 1000:.0f} ms simulated latency")
+    print(f"{'mode':<10} {'searches':>9} {'employments':>12} {'requests':>9} {'seconds':>8}")
+    for mode, _, mode_counts, elapsed in report:
+        total = sum(mode_counts.values())
+        searches = mode_counts["search"] + mode_counts["expanded-search"]
+        print(f"{mode:<10} {searches:>9} {mode_counts['employments']:>12} {total:>9} {elapsed:>8.2f}")
+    base, fast = report[0], report[1]
+    print(f"Request reduction: {sum(base[2].values()) / max(sum(fast[2].values()), 1):.1f}x")
+    if base[1] != fast[1]:
+        print("WARNING: modes returned different matches")
+    else:
+        print("Both modes returned identical matches")
+
+
+if __name__ == "__main__":
+    main()
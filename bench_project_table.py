@@ -0,0 +1,172 @@
+"""
+Benchmark memory of the reorganize -> join -> pack working set: nested dicts
+vs the columnar project table.
+
+"dicts" is the previous in-memory layout: {pi: {core: [record, ...]}} built
+from the raw store, a .copy() of every record for the join, and a per-group
+sort by fiscal year for pack. "table" does the same work on
+project_table.ProjectTable. Each mode runs in a fresh subprocess so peak RSS
+is comparable, and both must produce the same joined records and the same
+latest record per core grant. Without --raw, a synthetic 10-fiscal-year
+dataset is generated (titles, abstracts and investigators repeat across a
+grant's fiscal years, as in RePORTER data).
+
+Usage:
+    python3 bench_project_table.py [--raw projects_raw.ndjson] [--grants 6000]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+PI_FIELDS = ["pi_rank", "pi_department", "pi_school", "pi_school_official",
+             "pi_department_official", "pi_division_official", "pi_ldap_dn"]
+
+
+def write_synthetic(path, grants):
+    rng = random.Random(0)
+    words = "gene cell neural cancer immune signaling pathway model cohort trial imaging protein".split()
+    pis = [f"SURNAME{i}, GIVEN{i % 97} M" for i in range(grants // 3)]
+    with open(path, "w") as f:
+        for g in range(grants):
+            pi = rng.choice(pis)
+            core = f"R01GM{100000 + g}"
+            title = " ".join(rng.choices(words, k=8)).title()
+            abstract = " ".join(rng.choices(words, k=rng.randint(150, 400)))
+            investigators = [{"first_name": "GIVEN", "last_name": f"SURNAME{rng.randrange(len(pis))}", "middle_name": ""}
+                             for _ in range(rng.randint(1, 3))]
+            first_fy = rng.randint(2016, 2025)
+            for fy in range(first_fy, min(first_fy + rng.randint(1, 5), 2026)):
+                f.write(json.dumps({
+                    "fiscal_year": fy, "project_num": f"{5 if fy > first_fy else 1}{core}-{fy - first_fy + 1:02d}",
+                    "award_amount": rng.randint(50000, 2000000), "contact_pi_name": pi,
+                    "project_start_date": f"{first_fy}-07-01T00:00:00", "project_end_date": f"{first_fy + 5}-06-30T00:00:00",
+                    "abstract_text": abstract, "project_title": title,
+                    "budget_start": f"{fy}-07-01T00:00:00", "budget_end": f"{fy + 1}-06-30T00:00:00",
+                    "principal_investigators": investigators,
+                }) + "\n")
+
+
+def peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_dicts(raw_path, details):
+    """The previous layout, as step_reorganize/step_join/step_pack held it."""
+    from raw_store import iter_raw
+    from project_table import reorganized_entry
+    from main_ldap import extract_core_project_num
+    projects_by_pi = {}
+    for project in iter_raw(raw_path):
+        pi_name, core_num, entry = reorganized_entry(project, extract_core_project_num)
+        projects_by_pi.setdefault(pi_name, {}).setdefault(core_num, []).append(entry)
+    for core_groups in projects_by_pi.values():
+        for projects in core_groups.values():
+            projects.sort(key=lambda x: x.get("project_num_clip") or "")
+    yield "reorganize"
+
+    final_data = []
+    for pi_name, core_groups in projects_by_pi.items():
+        for projects in core_groups.values():
+            for project in projects:
+                enriched = project.copy()
+                for field in PI_FIELDS:
+                    enriched[field] = details.get(pi_name, {}).get(field)
+                final_data.append(enriched)
+    yield "join", final_data
+    del final_data
+
+    latest = []
+    for core_groups in projects_by_pi.values():
+        for projects in core_groups.values():
+            latest.append(sorted(projects, key=lambda p: p.get("fiscal_year", 0), reverse=True)[0]["project_num"])
+    yield "pack", latest
+
+
+def run_table(raw_path, details):
+    from raw_store import iter_raw
+    from project_table import ProjectTable
+    from main_ldap import extract_core_project_num
+    table = ProjectTable.from_raw(iter_raw(raw_path), extract_core_project_num)
+    yield "reorganize"
+
+    final_data = []
+    for pi_name, groups in table.iter_pis():
+        for _, start, stop in groups:
+            for row in range(start, stop):
+                enriched = table.record(row)
+                for field in PI_FIELDS:
+                    enriched[field] = details.get(pi_name, {}).get(field)
+                final_data.append(enriched)
+    yield "join", final_data
+    del final_data
+
+    latest = []
+    for _, groups in table.iter_pis():
+        for _, start, stop in groups:
+            latest.append(table.get(table.latest(start, stop), "project_num"))
+    yield "pack", latest
+
+
+def child(mode, raw_path):
+    import main_ldap  # same imports as the pipeline, counted in the baseline
+    baseline = peak_mb()
+    start = time.perf_counter()
+    report = {"baseline_mb": baseline, "phases": {}}
+    for phase in (run_dicts if mode == "dicts" else run_table)(raw_path, {}):
+        name = phase if isinstance(phase, str) else phase[0]
+        if not isinstance(phase, str):
+            digest = hashlib.sha256()
+            for item in phase[1]:
+                digest.update(json.dumps(item, sort_keys=True).encode())
+            report.setdefault("digests", {})[name] = digest.hexdigest()[:12]
+        report["phases"][name] = peak_mb() - baseline
+    report["seconds"] = time.perf_counter() - start
+    print(json.dumps(report))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nested dicts vs the columnar project table")
+    parser.add_argument("--raw", help="Raw NDJSON store to use (default: synthetic 10-year dataset)")
+    parser.add_argument("--grants", type=int, default=6000, help="Core grants in the synthetic dataset")
+    parser.add_argument("--mode", choices=["dicts", "table"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args.mode, args.raw)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_path = args.raw
+        if not raw_path:
+            raw_path = os.path.join(tmp, "projects_raw.ndjson")
+            write_synthetic(raw_path, args.grants)
+        with open(raw_path, "rb") as f:
+            records = sum(1 for _ in f)
+        reports = {}
+        for mode in ("dicts", "table"):
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode, "--raw", raw_path],
+                                 capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            reports[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(f"{records} records; peak memory above the {reports['dicts']['baseline_mb']:.0f} MB import baseline")
+    print(f"{'mode':<7} {'reorganize':>11} {'+join':>9} {'+pack':>9} {'seconds':>8}")
+    for mode, report in reports.items():
+        phases = report["phases"]
+        print(f"{mode:<7} {phases['reorganize']:>9.0f}MB {phases['join']:>7.0f}MB {phases['pack']:>7.0f}MB {report['seconds']:>8.2f}")
+    saved = 1 - reports["table"]["phases"]["pack"] / reports["dicts"]["phases"]["pack"]
+    print(f"Peak working-set reduction: {saved:.0%}")
+    if reports["dicts"]["digests"] != reports["table"]["digests"]:
+        print("WARNING: layouts produced different joined records or latest records")
+    else:
+        print("Both layouts produced identical joined records and latest records")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,8 @@ Uses official UMN organizational structure from UMN public sources
 """
 import json
 import os
-from umn_structure import UMN_STRUCTURE, get_school_for_department
+from umn_structure import get_school_for_department
+from org_index import org_index
 
 def build_nested_structure(pi_details_file):
     """
@@ -16,24 +17,9 @@ def build_nested_structure(pi_details_file):
     
     # Start with official UMN structure template
     # Departments with divisions become nested dicts; departments without get empty PI lists
-    base_structure = {}
-    for uni_name, uni_data in UMN_STRUCTURE.items():
-        base_structure[uni_name] = {}
-        for campus_name, campus_data in uni_data.items():
-            base_structure[uni_name][campus_name] = {}
-            for school_name, dept_dict in campus_data.items():
-                base_structure[uni_name][campus_name][school_name] = {}
-                for dept_name, divisions in dept_dict.items():
-                    if divisions:
-                        # Department has divisions — create nested dict
-                        base_structure[uni_name][campus_name][school_name][dept_name] = {
-                            div: [] for div in divisions
-                        }
-                    else:
-                        # No divisions — flat PI list
-                        base_structure[uni_name][campus_name][school_name][dept_name] = []
-    
-    structure = base_structure
+    index = org_index()
+    dept_leaf = lambda divisions: {div: [] for div in divisions} if divisions else []
+    structure = {index.names[root]: index.to_nested(root, leaf=dept_leaf) for root in index.roots}
     
     # Track unmapped departments
     unmapped_depts = set()
@@ -2,7 +2,7 @@
 Generate just the nested structure of UMN schools and departments without PI data
 """
 import json
-from umn_structure import UMN_STRUCTURE
+from org_index import org_index
 
 def build_structure_only():
     """
@@ -10,20 +10,8 @@ def build_structure_only():
     without any PI information.
     Departments map to a list of divisions (empty list if no divisions).
     """
-    structure = {}
-
-    for uni_name, uni_data in UMN_STRUCTURE.items():
-        structure[uni_name] = {}
-        for campus_name, campus_data in uni_data.items():
-            structure[uni_name][campus_name] = {}
-            for school_name in sorted(campus_data.keys()):
-                dept_dict = campus_data[school_name]
-                sorted_depts = {}
-                for dept_name in sorted(dept_dict.keys()):
-                    sorted_depts[dept_name] = sorted(dept_dict[dept_name])
-                structure[uni_name][campus_name][school_name] = sorted_depts
-
-    return structure
+    index = org_index()
+    return {index.names[root]: index.to_nested(root) for root in index.roots}
 
 def main():
     print("Building UMN organizational structure (schools and departments only)...")
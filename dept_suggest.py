@@ -0,0 +1,103 @@
+"""
+Suggest official mappings for unmapped LDAP department strings.
+
+SuggestionIndex builds a character n-gram TF-IDF matrix (dense NumPy, in
+memory) over every official department and division in UMN_STRUCTURE plus
+the raw keys of the known department overrides, each labelled with the
+(school, department, division) it stands for. suggest() vectorizes a whole
+list of raw strings at once, scores them against the index with one matrix
+product per chunk, and returns the top-k distinct targets per string with
+cosine scores. main_ldap.py --suggest turns that into a pi_overrides.json
+draft for review.
+"""
+import itertools
+import re
+import numpy as np
+from umn_structure import UMN_STRUCTURE
+
+NGRAM_SIZES = (2, 3, 4)
+CHUNK_ROWS = 1024  # query rows scored per matrix product, bounding peak memory
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def ngrams(text):
+    """Character n-grams of the case-folded, punctuation-collapsed text, padded at word boundaries."""
+    text = " " + _NON_ALNUM.sub(" ", text.lower()).strip() + " "
+    return [text[i:i + n] for n in NGRAM_SIZES for i in range(len(text) - n + 1)]
+
+
+def iter_official_units(structure=UMN_STRUCTURE):
+    """Yield (label, (school, department, division)) for every department and division."""
+    for uni_data in structure.values():
+        for campus_data in uni_data.values():
+            for school, departments in campus_data.items():
+                for dept, divisions in departments.items():
+                    yield dept, (school, dept, None)
+                    for division in divisions:
+                        yield division, (school, dept, division)
+
+
+class SuggestionIndex:
+    def __init__(self, dept_overrides=None, structure=UMN_STRUCTURE):
+        entries = list(iter_official_units(structure))
+        for raw, ov in (dept_overrides or {}).items():
+            if ov.get("school_official"):
+                entries.append((raw, (ov.get("school_official"), ov.get("department_official"), ov.get("division_official"))))
+
+        # Group rows by target so per-target maxima are one reduceat over column blocks
+        self.targets = sorted({target for _, target in entries}, key=lambda t: tuple(v or "" for v in t))
+        target_ids = {target: i for i, target in enumerate(self.targets)}
+        entries.sort(key=lambda entry: target_ids[entry[1]])
+        self.labels = [label for label, _ in entries]
+        row_targets = np.array([target_ids[target] for _, target in entries])
+        self.offsets = np.flatnonzero(np.r_[True, row_targets[1:] != row_targets[:-1]])
+
+        self.vocab = {}
+        for label in self.labels:
+            for gram in ngrams(label):
+                self.vocab.setdefault(gram, len(self.vocab))
+        rows, cols, counts = self._counts(self.labels)
+        df = np.bincount(cols, minlength=len(self.vocab))
+        self.idf = np.log((1 + len(self.labels)) / (1 + df)) + 1
+        self.matrix = self._vectors(len(self.labels), rows, cols, counts)  # rows x vocab, L2-normalized
+
+    def _counts(self, texts):
+        """Sparse n-gram counts as (row, col, count) arrays; n-grams outside the index vocabulary are ignored."""
+        lookup = self.vocab.get
+        grams = [[lookup(gram, -1) for gram in ngrams(text or "")] for text in texts]
+        lengths = [len(g) for g in grams]
+        cols = np.fromiter(itertools.chain.from_iterable(grams), dtype=np.int64, count=sum(lengths))
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        keep = cols >= 0
+        size = len(self.vocab)
+        keys, counts = np.unique(rows[keep] * size + cols[keep], return_counts=True)
+        return keys // size, keys % size, counts
+
+    def _vectors(self, num_rows, rows, cols, counts):
+        """Dense L2-normalized TF-IDF rows, weighting only the non-zero entries."""
+        weights = (1 + np.log(counts)) * self.idf[cols]  # sublinear tf
+        norms = np.sqrt(np.bincount(rows, weights * weights, minlength=num_rows))
+        matrix = np.zeros((num_rows, len(self.vocab)), dtype=np.float32)
+        matrix[rows, cols] = weights / norms[rows]
+        return matrix
+
+    def suggest(self, texts, top_k=3):
+        """
+        For each raw string, the top_k distinct targets as
+        [(score, (school, department, division)), ...], best first; at least
+        one candidate is always returned.
+        """
+        top_k = max(1, min(top_k, len(self.targets)))
+        results = []
+        for start in range(0, len(texts), CHUNK_ROWS):
+            chunk = texts[start:start + CHUNK_ROWS]
+            scores = self._vectors(len(chunk), *self._counts(chunk)) @ self.matrix.T
+            by_target = np.maximum.reduceat(scores, self.offsets, axis=1)
+            best = np.argpartition(-by_target, top_k - 1, axis=1)[:, :top_k]
+            best_scores = np.take_along_axis(by_target, best, axis=1)
+            order = np.argsort(-best_scores, axis=1, kind="stable")
+            best = np.take_along_axis(best, order, axis=1)
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            for ids, row_scores in zip(best, best_scores):
+                results.append([(round(float(score), 3), self.targets[i]) for i, score in zip(ids, row_scores)])
+        return results
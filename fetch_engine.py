@@ -0,0 +1,255 @@
+"""
+Concurrent fetch engine for the NIH RePORTER projects/search API.
+
+Fans out across fiscal years (and across page offsets once the first page
+of a year reports meta.total) on a bounded worker pool. Request pacing,
+retries and backoff are handled by the shared http_client, and results are
+reassembled in (year, offset) order so output is deterministic. Pages can
+be streamed to a callback (e.g. a raw_store.RawStoreWriter) as they arrive.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import requests
+import http_client
+from response_cache import CacheMiss
+from query_partition import partition, needs_partition, UnreachableRecords, MAX_PAGEABLE
+
+API_URL = "https://api.reporter.nih.gov/v2/projects/search"
+PAGE_LIMIT = 500
+DEFAULT_WORKERS = 4
+
+
+class FetchError(Exception):
+    """Raised when pages could not be fetched (even after retries, or not cached in cache-only mode)."""
+
+    def __init__(self, failed_pages):
+        self.failed_pages = failed_pages
+        pages = ", ".join(f"FY {year} offset {offset}" for year, offset in failed_pages)
+        super().__init__(f"{len(failed_pages)} page(s) could not be fetched: {pages}")
+
+
+def _build_payload(criteria, include_fields, offset, limit=PAGE_LIMIT):
+    return {
+        "criteria": criteria,
+        "include_fields": include_fields,
+        "offset": offset,
+        "limit": limit,
+        "sort_field": "project_start_date",
+        "sort_order": "desc"
+    }
+
+
+def _fetch_page(criteria, include_fields, offset, cache=None, limit=PAGE_LIMIT):
+    """
+    Fetch a single page, from `cache` if it has a fresh copy.
+    Returns (results, meta.total); raises on HTTP errors or cache-only misses.
+    """
+    payload = _build_payload(criteria, include_fields, offset, limit)
+    data = cache.get(payload) if cache else None
+    if data is None:
+        response = http_client.post(API_URL, json=payload)
+        response.raise_for_status()
+        data = response.json()
+        if cache:
+            cache.put(payload, data)
+    return data.get("results", []), data.get("meta", {}).get("total")
+
+
+def _year_criteria(base_criteria, year):
+    criteria = dict(base_criteria)
+    criteria["fiscal_years"] = [year]
+    return criteria
+
+
+def probe_totals(base_criteria, include_fields, years, workers=DEFAULT_WORKERS):
+    """
+    Cheaply ask RePORTER for meta.total of each fiscal year (one 1-record
+    request per year, never served from cache).
+
+    Returns:
+        {year: total}; raises FetchError if any probe failed.
+    """
+    totals = {}
+    failed = []
+
+    def probe(year):
+        try:
+            _, totals[year] = _fetch_page(_year_criteria(base_criteria, year), include_fields, 0, limit=1)
+        except requests.exceptions.RequestException as e:
+            print(f"Error probing FY {year}: {e}")
+            failed.append((year, 0))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(probe, years))
+
+    if failed:
+        raise FetchError(sorted(failed))
+    return totals
+
+
+class _OrderedPages:
+    """
+    Reorder buffer: pages complete out of order on the worker pool, but are
+    handed to `on_page` strictly in (year, partition, offset) order. Only
+    pages that arrive ahead of the cursor are held in memory.
+    """
+
+    def __init__(self, num_years, on_page):
+        self.num_years = num_years
+        self.on_page = on_page
+        self.pending = {}  # (year_idx, part_idx, offset) -> results
+        self.parts = {}  # year_idx -> number of partitions
+        self.totals = {}  # (year_idx, part_idx) -> records to page through
+        self.cursor = (0, 0, 0)
+        self._lock = threading.Lock()
+
+    def set_parts(self, year_idx, totals):
+        with self._lock:
+            self.parts[year_idx] = len(totals)
+            for part_idx, total in enumerate(totals):
+                self.totals[(year_idx, part_idx)] = total
+            self._drain()
+
+    def add(self, year_idx, part_idx, offset, results):
+        with self._lock:
+            self.pending[(year_idx, part_idx, offset)] = results
+            self._drain()
+
+    def _drain(self):
+        year_idx, part_idx, offset = self.cursor
+        while year_idx < self.num_years and year_idx in self.parts:
+            if part_idx >= self.parts[year_idx]:
+                year_idx, part_idx, offset = year_idx + 1, 0, 0
+                continue
+            key = (year_idx, part_idx, offset)
+            if key not in self.pending:
+                break
+            self.on_page(self.pending.pop(key))
+            offset += PAGE_LIMIT
+            if offset >= self.totals[(year_idx, part_idx)]:
+                part_idx, offset = part_idx + 1, 0
+        self.cursor = (year_idx, part_idx, offset)
+
+
+def _page_offsets(total):
+    """Offsets needed to page through `total` records, capped at the API's maximum offset."""
+    return range(0, min(total, MAX_PAGEABLE), PAGE_LIMIT)
+
+
+def fetch_projects(base_criteria, include_fields, years, label="grants",
+                   workers=DEFAULT_WORKERS, cache=None, on_page=None, on_total=None):
+    """
+    Fetch every project matching base_criteria for each fiscal year in `years`.
+
+    Years whose meta.total exceeds RePORTER's paging ceiling are split into
+    fully pageable partitions (see query_partition) which are fetched
+    concurrently. Records are de-duplicated by project_num within each
+    fiscal year (pages can overlap when partitions or offsets shift).
+
+    Args:
+        base_criteria: RePORTER criteria dict without fiscal_years.
+        include_fields: list of RePORTER field names to return.
+        years: list of fiscal years, in the order results should be returned.
+        label: name used in progress output (e.g. "grants", "VA grants").
+        workers: max concurrent requests.
+        cache: optional response_cache.ResponseCache.
+        on_page: optional callback(list_of_records). When given, pages are
+                 streamed to it in order instead of being collected.
+        on_total: optional callback(year, total) receiving each year's
+                  meta.total as RePORTER reports it (before partitioning or
+                  de-duplication), e.g. for incremental_fetch manifests.
+
+    Returns:
+        list of project dicts, ordered by year (as given) then page offset;
+        or, when on_page is given, the number of records streamed.
+
+    Raises:
+        FetchError if any page still failed after the client's retries, or
+        some records of a year could not be reached by any partition, so
+        callers never save a silently truncated dataset.
+    """
+    collected = []
+    deliver = on_page or collected.extend
+    seen_by_year = {}  # fiscal year -> project_nums already delivered
+    delivered = 0
+
+    def deliver_page(records):
+        nonlocal delivered
+        unique = []
+        for record in records:
+            seen = seen_by_year.setdefault(record.get("fiscal_year"), set())
+            key = record.get("project_num")
+            if key not in seen:
+                seen.add(key)
+                unique.append(record)
+        delivered += len(unique)
+        deliver(unique)
+
+    ordered = _OrderedPages(len(years), deliver_page)
+    failed = []
+    counts = {}
+
+    def fetch(year_idx, part_idx, year, criteria, offset):
+        try:
+            results, total = _fetch_page(criteria, include_fields, offset, cache)
+        except (requests.exceptions.RequestException, CacheMiss) as e:
+            print(f"Error fetching {label} for FY {year} (offset {offset}): {e}")
+            failed.append((year, offset))
+            return None
+        counts[(year_idx, part_idx, offset)] = len(results)
+        if not (offset == 0 and needs_partition(total)):
+            ordered.add(year_idx, part_idx, offset, results)
+        return total
+
+    def probe(criteria):
+        # Cached like any page, so --cache-only replays partitioning offline (a miss raises CacheMiss)
+        _, total = _fetch_page(criteria, include_fields, 0, cache, limit=1)
+        return total
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Phase 1: first page of every year, concurrently
+        for year in years:
+            print(f"Fetching {label} for FY {year}...")
+        first = {idx: pool.submit(fetch, idx, 0, year, _year_criteria(base_criteria, year), 0)
+                 for idx, year in enumerate(years)}
+
+        # Phase 2: remaining offsets now that meta.total is known, splitting
+        # years that exceed the paging ceiling into pageable partitions
+        rest = []
+        for idx, year in enumerate(years):
+            total = first[idx].result()
+            if total is None:
+                continue
+            if on_total:
+                on_total(year, total)
+            if not needs_partition(total):
+                print(f"  Retrieved {counts[(idx, 0, 0)]} records (offset 0). Total for FY {year}: {total}")
+                ordered.set_parts(idx, [total])
+                for offset in _page_offsets(total)[1:]:
+                    rest.append((idx, 0, year, offset, pool.submit(fetch, idx, 0, year, _year_criteria(base_criteria, year), offset)))
+                continue
+
+            print(f"  FY {year}: {total} records exceeds the paging ceiling ({MAX_PAGEABLE}); partitioning...")
+            try:
+                parts = partition(_year_criteria(base_criteria, year), total, probe)
+            except (requests.exceptions.RequestException, CacheMiss, UnreachableRecords) as e:
+                print(f"Error partitioning {label} for FY {year}: {e}")
+                failed.append((year, 0))
+                continue
+            print(f"  FY {year}: split into {len(parts)} partitions")
+            # Only what the offsets can page through, or the reorder buffer waits for pages never requested
+            ordered.set_parts(idx, [min(total, MAX_PAGEABLE) for _, total in parts])
+            for part_idx, (criteria, part_total) in enumerate(parts):
+                for offset in _page_offsets(part_total):
+                    rest.append((idx, part_idx, year, offset, pool.submit(fetch, idx, part_idx, year, criteria, offset)))
+
+        for idx, part_idx, year, offset, future in rest:
+            if future.result() is not None:
+                print(f"  Retrieved {counts[(idx, part_idx, offset)]} records (offset {offset}) for FY {year}")
+
+    if cache:
+        print(cache.summary())
+    if failed:
+        raise FetchError(sorted(failed))
+
+    return delivered if on_page else collected
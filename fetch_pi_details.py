@@ -1,15 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import threading
+import time
 import requests
 import urllib.parse
-import time
+import http_client
+from single_flight import SingleFlight
 
 ORCID_API_BASE = "https://pub.orcid.org/v3.0"
+EMPLOYMENT_WORKERS = 8  # concurrent /employments fetches; the ORCID rate cap lives in http_client
+EMPLOYMENT_TTL = 7 * 24 * 3600
+
 
-def get_pi_details(contact_pi_name, org_name="University of Minnesota"):
+class EmploymentCache:
     """
-    Retrieves PI details (Rank, Department, School) from ORCID.
+    /employments payloads keyed by orcid_id, so candidates shared by several
+    PIs are fetched once. Entries expire after `ttl` seconds; with a `path`
+    the cache is loaded from and saved to a JSON file between runs.
     """
-    print(f"Looking up details for: {contact_pi_name}")
-    
+
+    def __init__(self, path=None, ttl=EMPLOYMENT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # orcid_id -> {"fetched_at": epoch seconds, "payload": ...}
+        self._lock = threading.Lock()
+        self._flight = SingleFlight(remember=False)  # coalesce concurrent fetches; the TTL decides reuse
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                self._entries = json.load(f)
+
+    def get(self, orcid_id, fetch):
+        """Return the cached payload for orcid_id, calling fetch() (once, even if concurrent) when missing or expired."""
+        with self._lock:
+            entry = self._entries.get(orcid_id)
+            if entry and time.time() - entry["fetched_at"] < self.ttl:
+                self.hits += 1
+                return entry["payload"]
+        return self._flight.do(orcid_id, lambda: self._fetch(orcid_id, fetch))
+
+    def _fetch(self, orcid_id, fetch):
+        payload = fetch()
+        with self._lock:
+            self.misses += 1
+            if payload is not None:
+                self._entries[orcid_id] = {"fetched_at": time.time(), "payload": payload}
+        return payload
+
+    def save(self):
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            fresh = {k: v for k, v in self._entries.items() if now - v["fetched_at"] < self.ttl}
+        with open(self.path, "w") as f:
+            json.dump(fresh, f)
+
+    def summary(self):
+        return f"Employment cache: {self.hits} hits, {self.misses} fetched"
+
+
+_employment_cache = EmploymentCache()
+_employment_executor = ThreadPoolExecutor(max_workers=EMPLOYMENT_WORKERS)
+
+def parse_pi_name(contact_pi_name):
+    """Split a RePORTER PI name into (last_name, first_name), or None if it cannot be parsed."""
     # parse name (Assuming "Last, First" or "Last, First M")
     try:
         if "," in contact_pi_name:
@@ -24,14 +81,61 @@ def get_pi_details(contact_pi_name, org_name="University of Minnesota"):
     except Exception as e:
         print(f"  Error parsing name {contact_pi_name}: {e}")
         return None
+    return last_name, first_name
+
+def query_key(contact_pi_name, org_name="University of Minnesota"):
+    """
+    Canonical key of the ORCID search a PI name turns into. The search is
+    case-insensitive and ignores trailing periods ("A." vs "A"), so names
+    differing only in those ways share one query.
+    """
+    parsed = parse_pi_name(contact_pi_name)
+    if not parsed:
+        return ("unparsed", contact_pi_name)
+    last_name, first_name = parsed
+    return (last_name.lower(), first_name.rstrip(".").lower(), org_name.lower())
+
+def _lists_institution(result, org_name):
+    """True if an expanded-search result lists an institution loosely matching org_name."""
+    return any(org_name.lower() in (name or "").lower() for name in result.get("institution-name") or [])
+
+def get_pi_details(contact_pi_name, org_name="University of Minnesota", cache=None, expanded=False, index=None):
+    """
+    Retrieves PI details (Rank, Department, School) from ORCID.
+    Candidate employments are fetched concurrently but checked in search
+    order, so the first matching candidate wins as before; once it is found,
+    fetches that have not started yet are cancelled.
+
+    With expanded=True the expanded-search endpoint is used instead: it lists
+    each candidate's institution names, so candidates not affiliated with
+    org_name are dropped locally and /employments is fetched only for the rest.
+
+    With an index (orcid_index.OrcidIndex built for org_name), the PI is
+    resolved from the local ORCID public data file index without any request.
+    """
+    print(f"Looking up details for: {contact_pi_name}")
+    
+    parsed = parse_pi_name(contact_pi_name)
+    if not parsed:
+        return None
+    last_name, first_name = parsed
+
+    if index is not None:
+        details = index.lookup(last_name, first_name)
+        if details:
+            print(f"  Match found: {details}")
+        else:
+            print(f"  No indexed ORCID record for {contact_pi_name} at {org_name}")
+        return details
 
     # Search for person
     query = f"family-name:{last_name} AND given-names:{first_name} AND affiliation-org-name:({urllib.parse.quote(org_name)})"
-    search_url = f"{ORCID_API_BASE}/search/?q={query}"
+    endpoint = "expanded-search" if expanded else "search"
+    search_url = f"{ORCID_API_BASE}/{endpoint}/?q={query}"
     headers = {"Accept": "application/json"}
     
     try:
-        response = requests.get(search_url, headers=headers, timeout=10)
+        response = http_client.get(search_url, headers=headers, timeout=10)
         response.raise_for_status()
         data = response.json()
         num_found = data.get("num-found", 0)
@@ -42,19 +146,22 @@ def get_pi_details(contact_pi_name, org_name="University of Minnesota"):
         
         print(f"  Found {num_found} ORCID record(s). Checking employments...")
         
-        results = data.get("result", [])
-        for result in results:
-            orcid_id = result.get("orcid-identifier", {}).get("path")
-            if not orcid_id:
-                continue
-                
-            # Fetch employments
-            details = get_employment_details(orcid_id, org_name)
+        if expanded:
+            results = [r for r in data.get("expanded-result") or [] if _lists_institution(r, org_name)]
+            orcid_ids = [r.get("orcid-id") for r in results]
+            print(f"  {len(orcid_ids)} candidate(s) list {org_name}")
+        else:
+            results = data.get("result", [])
+            orcid_ids = [r.get("orcid-identifier", {}).get("path") for r in results]
+        futures = [_employment_executor.submit(get_employment_details, orcid_id, org_name, cache)
+                   for orcid_id in orcid_ids if orcid_id]
+        for i, future in enumerate(futures):
+            details = future.result()
             if details:
+                for pending in futures[i + 1:]:
+                    pending.cancel()
                 print(f"  Match found: {details}")
                 return details
-                
-            time.sleep(0.5) # Rate limit courtesy
             
     except requests.exceptions.RequestException as e:
         print(f"  ORCID API Request Error: {e}")
@@ -63,16 +170,22 @@ def get_pi_details(contact_pi_name, org_name="University of Minnesota"):
     print(f"  No matching current employment found for {contact_pi_name}")
     return None
 
-def get_employment_details(orcid_id, target_org_name):
+def fetch_employments(orcid_id):
+    """Fetch the raw /employments payload, or None if ORCID did not return one."""
     url = f"{ORCID_API_BASE}/{orcid_id}/employments"
     headers = {"Accept": "application/json"}
-    
+    response = http_client.get(url, headers=headers, timeout=10)
+    if response.status_code != 200:
+        return None
+    return response.json()
+
+def get_employment_details(orcid_id, target_org_name, cache=None):
+    cache = cache or _employment_cache
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code != 200:
+        data = cache.get(orcid_id, lambda: fetch_employments(orcid_id))
+        if data is None:
             return None
             
-        data = response.json()
         affiliation_groups = data.get("affiliation-group", [])
         
         for group in affiliation_groups:
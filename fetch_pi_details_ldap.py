@@ -1,4 +1,5 @@
 from ldap3 import Server, Connection, ALL
+from ldap3.core.exceptions import LDAPCommunicationError
 import time
 import os
 from dotenv import load_dotenv
@@ -40,12 +41,14 @@ def create_ldap_connection():
         return None
 
 
-def get_pi_details(contact_pi_name, conn, org_name="University of Minnesota"):
+SEARCH_ATTRIBUTES = ["cn", "sn", "givenName", "mail", "title", "ou", "o", "displayName"]
+
+
+def parse_pi_name(contact_pi_name):
     """
-    Retrieves PI details (Rank, Department, School) from UMN LDAP server.
-    Uses an existing ldap3 connection (reused across multiple lookups).
+    Split a RePORTER PI name into (last_name, first_name).
+    Returns None if the name cannot be parsed.
     """
-    # Parse name (Assuming "Last, First" or "Last, First M")
     try:
         if "," in contact_pi_name:
             parts = contact_pi_name.split(",")
@@ -71,20 +74,149 @@ def get_pi_details(contact_pi_name, conn, org_name="University of Minnesota"):
     except Exception as e:
         print(f"    Error parsing name {contact_pi_name}: {e}")
         return None
+    return last_name, first_name
+
+
+def query_key(contact_pi_name):
+    """
+    Canonical key of the LDAP query a PI name turns into: names that parse to
+    the same (surname, given name), e.g. "REDISH, A DAVID" and "REDISH, A. DAVID",
+    get identical filters and scoring and therefore identical results.
+    """
+    parsed = parse_pi_name(contact_pi_name)
+    if not parsed:
+        return ("unparsed", contact_pi_name)
+    last_name, first_name = parsed
+    return (last_name.lower(), first_name.lower())
+
+
+def candidate_filters(last_name, first_name):
+    """
+    Progressively looser filters; exact givenName first to avoid
+    prefix collisions (e.g., "Carol" vs "Carolyn").
+    """
+    return [
+        f"(&(sn={last_name})(givenName={first_name}))",
+        f"(&(sn={last_name})(givenName={first_name}*))",
+        f"(&(sn={last_name}*)(givenName={first_name}*))",
+        f"(&(sn={last_name}*)(givenName={first_name[0]}*))",
+    ]
+
+
+def _filter_rank(entry, last_name, first_name):
+    """Index of the first progressive filter that would have returned `entry`, or None."""
+    surnames = [v.lower() for v in (entry.sn.values if entry.sn else [])]
+    given_names = [v.lower() for v in (entry.givenName.values if entry.givenName else [])]
+    last, first = last_name.lower(), first_name.lower()
+    exact_sn = last in surnames
+    exact_given = first in given_names
+    prefix_given = any(g.startswith(first) for g in given_names)
+    prefix_sn = any(sn.startswith(last) for sn in surnames)
+    if exact_sn and exact_given:
+        return 0
+    if exact_sn and prefix_given:
+        return 1
+    if prefix_sn and prefix_given:
+        return 2
+    if prefix_sn and any(g.startswith(first[:1]) for g in given_names):
+        return 3
+    return None
+
+
+def _rank_candidates(entries, last_name, first_name):
+    """
+    Keep the entries any progressive filter would return for this PI, ordered
+    as the sequential searches would have seen them (server order within a filter).
+    """
+    ranked = []
+    for entry in entries:
+        rank = _filter_rank(entry, last_name, first_name)
+        if rank is not None:
+            ranked.append((rank, entry))
+    ranked.sort(key=lambda item: item[0])
+    return [entry for _, entry in ranked]
+
+
+def score_entries(entries, last_name, first_name, best=None, best_score=-1):
+    """
+    Pick the best matching entry. Score: exact first name (2) > prefix (1) >
+    initial-only (0); earlier entries win ties. Returns (best, best_score),
+    stopping early on an exact match.
+    """
+    for entry in entries:
+        # Extract attributes
+        cn = entry.cn[0] if entry.cn else None
+        given = entry.givenName[0] if entry.givenName else None
+        surname = entry.sn[0] if entry.sn else None
+        title = entry.title[0] if entry.title else None
+        ou = entry.ou[0] if entry.ou else None
+        organization = entry.o[0] if entry.o else None
+
+        # Verify this is a reasonable match - check both first AND last name
+        if not (last_name.lower() in (surname or "").lower() and
+                given and first_name and
+                first_name[0].lower() == given[0].lower()):
+            continue
+
+        # Score: exact first name > prefix > initial-only
+        if given.lower() == first_name.lower():
+            score = 2  # exact match
+        elif given.lower().startswith(first_name.lower()):
+            score = 1  # prefix match (e.g., "Carol" in "Carolina")
+        else:
+            score = 0  # initial-only match
+
+        if score > best_score:
+            best_score = score
+            best = {
+                "dn": entry.entry_dn,
+                "rank": title,
+                "department": ou,
+                "organization": organization or "University of Minnesota",
+                "source": "LDAP (UMN)"
+            }
+
+        if best_score == 2:
+            break  # exact match, done
+
+    return best, best_score
+
+
+def get_pi_details(contact_pi_name, conn, org_name="University of Minnesota", single_query=False, snapshot=None):
+    """
+    Retrieves PI details (Rank, Department, School) from UMN LDAP server.
+    Uses an existing ldap3 connection (reused across multiple lookups).
+    Raises LDAPCommunicationError if the connection drops, so callers can
+    rebind and retry instead of caching a false "not found".
+
+    With single_query=True, all progressive filters are sent as one OR filter
+    and the candidates are ranked locally in the order the sequential filters
+    would have returned them, so the result is identical in one round trip.
+
+    With a snapshot (ldap_snapshot.DirectorySnapshot), candidates come from
+    its local index instead and `conn` is not used.
+    """
+    parsed = parse_pi_name(contact_pi_name)
+    if not parsed:
+        return None
+    last_name, first_name = parsed
+
+    if snapshot is not None:
+        if not (last_name and first_name):
+            return None
+        entries = _rank_candidates(snapshot.candidates(last_name, first_name), last_name, first_name)
+        best, _ = score_entries(entries, last_name, first_name)
+        return best
 
     try:
-        # Search using sn (surname) and givenName
-        # Try progressively looser filters; exact givenName first to avoid
-        # prefix collisions (e.g., "Carol" vs "Carolyn")
-        filters = [
-            f"(&(sn={last_name})(givenName={first_name}))",
-            f"(&(sn={last_name})(givenName={first_name}*))",
-            f"(&(sn={last_name}*)(givenName={first_name}*))",
-            f"(&(sn={last_name}*)(givenName={first_name[0]}*))",
-        ]
-        
-        attributes = ["cn", "sn", "givenName", "mail", "title", "ou", "o", "displayName"]
-        
+        filters = candidate_filters(last_name, first_name)
+
+        if single_query:
+            conn.search(LDAP_BASE_DN, f"(|{''.join(filters)})", attributes=SEARCH_ATTRIBUTES)
+            entries = _rank_candidates(conn.entries, last_name, first_name)
+            best, _ = score_entries(entries, last_name, first_name)
+            return best
+
         # Track best candidate across ALL filters.
         # Only return early on an exact first-name match (score 2).
         # This prevents e.g., "Carolyn" (prefix match via sn=Peterson)
@@ -95,55 +227,108 @@ def get_pi_details(contact_pi_name, conn, org_name="University of Minnesota"):
 
         for search_filter in filters:
             try:
-                conn.search(LDAP_BASE_DN, search_filter, attributes=attributes)
+                conn.search(LDAP_BASE_DN, search_filter, attributes=SEARCH_ATTRIBUTES)
 
                 if not conn.entries:
                     continue
 
-                for entry in conn.entries:
-                    # Extract attributes
-                    cn = entry.cn[0] if entry.cn else None
-                    given = entry.givenName[0] if entry.givenName else None
-                    surname = entry.sn[0] if entry.sn else None
-                    title = entry.title[0] if entry.title else None
-                    ou = entry.ou[0] if entry.ou else None
-                    organization = entry.o[0] if entry.o else None
-
-                    # Verify this is a reasonable match - check both first AND last name
-                    if not (last_name.lower() in (surname or "").lower() and
-                            given and first_name and
-                            first_name[0].lower() == given[0].lower()):
-                        continue
-
-                    # Score: exact first name > prefix > initial-only
-                    if given.lower() == first_name.lower():
-                        score = 2  # exact match
-                    elif given.lower().startswith(first_name.lower()):
-                        score = 1  # prefix match (e.g., "Carol" in "Carolina")
-                    else:
-                        score = 0  # initial-only match
-
-                    if score > overall_best_score:
-                        overall_best_score = score
-                        overall_best = {
-                            "dn": entry.entry_dn,
-                            "rank": title,
-                            "department": ou,
-                            "organization": organization or "University of Minnesota",
-                            "source": "LDAP (UMN)"
-                        }
-
-                    if overall_best_score == 2:
-                        return overall_best  # exact match, done
+                overall_best, overall_best_score = score_entries(
+                    conn.entries, last_name, first_name, overall_best, overall_best_score)
+
+                if overall_best_score == 2:
+                    return overall_best  # exact match, done
 
+            except LDAPCommunicationError:
+                raise
             except Exception as e:
                 continue
 
         return overall_best
         
+    except LDAPCommunicationError:
+        raise
     except Exception as e:
         print(f"    Error during LDAP lookup: {e}")
         return None
+
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_PAGE_SIZE = 500
+PAGED_RESULTS_OID = "1.2.840.113556.1.4.319"
+FILTER_SPECIAL_CHARS = set("()*\\\0")
+
+
+def iter_paged(conn, search_filter, attributes, page_size=DEFAULT_PAGE_SIZE):
+    """Run a search with the simple paged results control, yielding one page of entries at a time."""
+    cookie = None
+    while True:
+        conn.search(LDAP_BASE_DN, search_filter, attributes=attributes,
+                    paged_size=page_size, paged_cookie=cookie)
+        yield conn.entries
+        cookie = conn.result.get("controls", {}).get(PAGED_RESULTS_OID, {}).get("value", {}).get("cookie")
+        if not cookie:
+            return
+
+
+def paged_search(conn, search_filter, attributes, page_size=DEFAULT_PAGE_SIZE):
+    """Run a paged search and return all entries."""
+    entries = []
+    for page in iter_paged(conn, search_filter, attributes, page_size):
+        entries.extend(page)
+    return entries
+
+
+def get_pi_details_batch(pi_names, conn, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Look up many PIs with one paged LDAP search.
+
+    The batch filter ORs the loosest progressive filter (surname prefix and
+    first initial) of every PI, and the returned entries are fanned back out
+    to each PI with the same ordering and scoring as
+    get_pi_details(single_query=True).
+
+    Returns:
+        {pi_name: details or None}. Raises LDAPCommunicationError if the
+        connection drops; falls back to per-PI lookups on other search errors.
+    """
+    results = {pi_name: None for pi_name in pi_names}
+    parsed = {}
+    for pi_name in pi_names:
+        names = parse_pi_name(pi_name)
+        if not (names and names[0] and names[1]):
+            continue
+        if FILTER_SPECIAL_CHARS & set(names[0] + names[1]):
+            # One malformed term would fail the whole batch; look it up on its own
+            results[pi_name] = get_pi_details(pi_name, conn, single_query=True)
+            continue
+        parsed[pi_name] = names
+    if not parsed:
+        return results
+
+    terms = sorted({f"(&(sn={last}*)(givenName={first[0]}*))" for last, first in parsed.values()})
+    try:
+        entries = paged_search(conn, f"(|{''.join(terms)})", SEARCH_ATTRIBUTES, page_size)
+    except LDAPCommunicationError:
+        raise
+    except Exception as e:
+        print(f"    Batch LDAP search failed ({e}); falling back to per-PI lookups")
+        for pi_name in parsed:
+            results[pi_name] = get_pi_details(pi_name, conn, single_query=True)
+        return results
+
+    # Block candidates by lowercase surname initial so each PI only scans a slice
+    by_initial = {}
+    for entry in entries:
+        initials = {v[:1].lower() for v in (entry.sn.values if entry.sn else [])}
+        for initial in initials:
+            by_initial.setdefault(initial, []).append(entry)
+
+    for pi_name, (last_name, first_name) in parsed.items():
+        candidates = _rank_candidates(by_initial.get(last_name[:1].lower(), []), last_name, first_name)
+        results[pi_name], _ = score_entries(candidates, last_name, first_name)
+    return results
+
+
 if __name__ == "__main__":
     # Test with known PI
     details = get_pi_details("LIM, KELVIN", "University of Minnesota")
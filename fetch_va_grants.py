@@ -1,9 +1,31 @@
-import requests
 import json
 import datetime
-import time
-
-API_URL = "https://api.reporter.nih.gov/v2/projects/search"
+from fetch_engine import fetch_projects, DEFAULT_WORKERS
+
+INCLUDE_FIELDS = [
+    "ProjectNum",
+    "ProjectTitle",
+    "ContactPiName",
+    "PrincipalInvestigators",
+    "FiscalYear",
+    "AwardAmount",
+    "ProjectStartDate",
+    "ProjectEndDate",
+    "BudgetStart",
+    "BudgetEnd",
+    "AbstractText",
+    "Organization",
+    "CongDist"
+]
+
+def build_criteria(org_name=None):
+    """RePORTER search criteria (without fiscal_years) for VA grants, optionally one organization."""
+    criteria = {
+        "agencies": ["VA"]
+    }
+    if org_name:
+        criteria["org_names"] = [org_name]
+    return criteria
 
 def get_fiscal_years(num_years=5):
     current_year = datetime.datetime.now().year
@@ -11,7 +33,7 @@ def get_fiscal_years(num_years=5):
         return [current_year]
     return [current_year - i for i in range(num_years)]
 
-def fetch_va_grants(years=None, org_name=None):
+def fetch_va_grants(years=None, org_name=None, workers=DEFAULT_WORKERS, cache=None, on_page=None, on_total=None):
     """
     Fetch VA-funded grants from NIH RePORTER API v2.
 
@@ -19,71 +41,24 @@ def fetch_va_grants(years=None, org_name=None):
         years: int (number of years) or list of fiscal years. Default 5.
         org_name: Optional organization name filter (e.g. "MINNEAPOLIS VA MEDICAL CENTER").
                   If None, fetches ALL VA grants.
+        workers: Max concurrent requests to RePORTER.
+        cache: Optional response_cache.ResponseCache for RePORTER pages.
+        on_page: Optional callback receiving each page of records in order
+                 (streaming mode; nothing is accumulated in memory).
+        on_total: Optional callback(year, total) receiving each fiscal year's meta.total.
 
     Returns:
-        list of project dicts
+        list of project dicts (or the record count when on_page is given)
     """
     if years is None:
         years = get_fiscal_years(5)
     elif isinstance(years, int):
         years = get_fiscal_years(years)
 
-    all_projects = []
-
-    for year in years:
-        print(f"Fetching VA grants for FY {year}...")
-
-        criteria = {
-            "fiscal_years": [year],
-            "agencies": ["VA"]
-        }
-        if org_name:
-            criteria["org_names"] = [org_name]
-
-        payload = {
-            "criteria": criteria,
-            "include_fields": [
-                "ProjectNum",
-                "ProjectTitle",
-                "ContactPiName",
-                "PrincipalInvestigators",
-                "FiscalYear",
-                "AwardAmount",
-                "ProjectStartDate",
-                "ProjectEndDate",
-                "BudgetStart",
-                "BudgetEnd",
-                "AbstractText",
-                "Organization",
-                "CongDist"
-            ],
-            "offset": 0,
-            "limit": 500,
-            "sort_field": "project_start_date",
-            "sort_order": "desc"
-        }
-
-        while True:
-            try:
-                response = requests.post(API_URL, json=payload)
-                response.raise_for_status()
-                data = response.json()
-
-                results = data.get("results", [])
-                all_projects.extend(results)
-
-                total = data.get("meta", {}).get("total", "Unknown")
-                print(f"  Retrieved {len(results)} records (offset {payload['offset']}). Total for FY {year}: {total}")
-
-                if len(results) < payload["limit"]:
-                    break
-
-                payload["offset"] += payload["limit"]
-                time.sleep(1)
-
-            except requests.exceptions.RequestException as e:
-                print(f"Error fetching data for FY {year}: {e}")
-                break
+    criteria = build_criteria(org_name)
+    all_projects = fetch_projects(criteria, INCLUDE_FIELDS, years,
+                                  label="VA grants", workers=workers, cache=cache,
+                                  on_page=on_page, on_total=on_total)
 
     return all_projects
 
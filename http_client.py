@@ -0,0 +1,176 @@
+"""
+Shared HTTP client used by every fetcher/scraper in the pipeline.
+
+- One requests.Session with keep-alive connection pools per host
+- Retries with exponential backoff + jitter on connection errors, 429 and 5xx
+- Per-host AIMD throttle: the allowed request rate and concurrency are halved
+  on 429/503 (honoring Retry-After) and grow back additively on success, so
+  each upstream runs as fast as it tolerates without hand-tuned sleeps.
+"""
+import random
+import threading
+import time
+import urllib.parse
+import requests
+from requests.adapters import HTTPAdapter
+from rate_limit import TokenBucket
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+
+# Starting / maximum request rate (req/s) and concurrency per upstream host.
+HOST_LIMITS = {
+    "api.reporter.nih.gov": {"rate": 1.0, "max_rate": 3.0, "max_concurrency": 4},
+    "pub.orcid.org": {"rate": 8.0, "max_rate": 24.0, "max_concurrency": 8},
+    "www.research.va.gov": {"rate": 1.0, "max_rate": 4.0, "max_concurrency": 4},
+}
+DEFAULT_LIMITS = {"rate": 2.0, "max_rate": 10.0, "max_concurrency": 4}
+
+
+class AdaptiveThrottle:
+    """
+    AIMD rate + concurrency controller for a single host.
+
+    acquire() blocks until a concurrency slot and a rate token are free (and
+    any Retry-After window has passed); release() feeds the outcome back.
+    """
+
+    def __init__(self, rate, max_rate, max_concurrency, min_rate=0.1, rate_step=0.1):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.rate_step = rate_step
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(max_concurrency)
+        self.bucket = TokenBucket(rate=rate, capacity=1)
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                wait = self._blocked_until - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                elif self._in_flight >= int(self.concurrency):
+                    self._cond.wait()
+                else:
+                    self._in_flight += 1
+                    break
+        self.bucket.acquire()
+
+    def release(self, success=True, throttled=False, retry_after=None):
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                # Multiplicative decrease
+                self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
+                self.concurrency = max(1.0, self.concurrency / 2)
+                if retry_after:
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            elif success:
+                # Additive increase
+                self.bucket.rate = min(self.max_rate, self.bucket.rate + self.rate_step)
+                self.concurrency = min(float(self.max_concurrency), self.concurrency + 1 / self.concurrency)
+            self._cond.notify_all()
+
+
+def _parse_retry_after(response):
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class HttpClient:
+    """Pooled, retrying, self-throttling HTTP client."""
+
+    def __init__(self, pool_size=10, max_retries=5, backoff_base=1.0, backoff_max=60.0, timeout=30):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._throttles = {}
+        self._lock = threading.Lock()
+
+    def throttle_for(self, url):
+        host = urllib.parse.urlsplit(url).hostname or ""
+        with self._lock:
+            if host not in self._throttles:
+                limits = HOST_LIMITS.get(host, DEFAULT_LIMITS)
+                self._throttles[host] = AdaptiveThrottle(**limits)
+            return self._throttles[host]
+
+    def _backoff(self, attempt):
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, delay)  # full jitter
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request, retrying transient failures.
+
+        Returns the final Response (callers still call raise_for_status()).
+        Re-raises the last RequestException if every attempt failed to connect.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        throttle = self.throttle_for(url)
+
+        for attempt in range(self.max_retries + 1):
+            throttle.acquire()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException:
+                throttle.release(success=False)
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+
+            throttled = response.status_code in THROTTLE_STATUSES
+            retry_after = _parse_retry_after(response) if throttled else None
+            throttle.release(success=response.status_code < 500, throttled=throttled,
+                             retry_after=retry_after)
+
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            time.sleep(retry_after if retry_after is not None else self._backoff(attempt))
+
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide shared HttpClient."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def get(url, **kwargs):
+    return get_client().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return get_client().post(url, **kwargs)
@@ -0,0 +1,133 @@
+"""
+Incremental (delta) RePORTER fetch driven by a per-fiscal-year manifest.
+
+The manifest records, for every fiscal year in the raw store, the number of
+records, RePORTER's meta.total, a content hash and the fetch time. A refresh
+probes meta.total for each year (one tiny request per year) and re-queries
+only years that are new, whose total moved, that are still open (current
+fiscal year), or whose last fetch is older than max_age_days. Refetched years
+are merged back into the existing raw records by project_num.
+"""
+import datetime
+import hashlib
+import json
+import os
+from fetch_engine import fetch_projects, probe_totals, DEFAULT_WORKERS
+from response_cache import current_fiscal_year
+
+DEFAULT_MAX_AGE_DAYS = 30
+_HASH_MOD = 2 ** 256
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+class ManifestBuilder:
+    """
+    Accumulates per-fiscal-year record counts and an order-independent
+    content hash (sum of per-record SHA-256 values) one record at a time,
+    so manifests can be built while records stream to disk.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.sums = {}
+
+    def add(self, records):
+        for record in records:
+            year = record.get("fiscal_year")
+            digest = hashlib.sha256(json.dumps(record, sort_keys=True).encode("utf-8")).hexdigest()
+            self.counts[year] = self.counts.get(year, 0) + 1
+            self.sums[year] = (self.sums.get(year, 0) + int(digest, 16)) % _HASH_MOD
+
+    def entry(self, year, total=None):
+        count = self.counts.get(year, 0)
+        return {
+            "records": count,
+            "total": count if total is None else total,
+            "content_hash": f"{self.sums.get(year, 0):064x}",
+            "fetched_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+
+
+def years_to_refresh(manifest, totals, max_age_days=DEFAULT_MAX_AGE_DAYS):
+    """Return [(year, reason)] for years that must be re-queried."""
+    now = datetime.datetime.now()
+    open_year = current_fiscal_year()
+    stale = []
+    for year, total in totals.items():
+        entry = manifest.get(str(year))
+        if entry is None:
+            stale.append((year, "new"))
+        elif entry.get("total") != total:
+            stale.append((year, f"total {entry.get('total')} -> {total}"))
+        elif year >= open_year:
+            stale.append((year, "open fiscal year"))
+        elif now - datetime.datetime.fromisoformat(entry["fetched_at"]) > datetime.timedelta(days=max_age_days):
+            stale.append((year, f"older than {max_age_days} days"))
+    return stale
+
+
+def fetch_delta(base_criteria, include_fields, years, existing, manifest, writer,
+                label="grants", workers=DEFAULT_WORKERS, max_age_days=DEFAULT_MAX_AGE_DAYS):
+    """
+    Refresh only the fiscal years that changed, streaming the merged raw
+    store into `writer`: existing records of untouched years are copied
+    through, refreshed years are replaced by freshly fetched records
+    (de-duplicated by project_num within each year, as in a full fetch).
+
+    Args:
+        existing: iterable of current raw records (e.g. raw_store.iter_raw()).
+        writer: raw_store.RawStoreWriter receiving the merged records.
+
+    Returns:
+        (manifest, changed_years): the updated manifest and the refreshed
+        years whose content actually changed.
+    """
+    totals = probe_totals(base_criteria, include_fields, years, workers=workers)
+    stale = years_to_refresh(manifest, totals, max_age_days)
+    for year, reason in stale:
+        print(f"  FY {year}: refresh ({reason})")
+    print(f"Refreshing {len(stale)} of {len(years)} fiscal years")
+    refresh_years = [year for year, _ in stale]
+    refreshed = set(refresh_years)
+
+    # Copy through every record of years we are not refreshing
+    batch = []
+    for project in existing:
+        if project.get("fiscal_year") not in refreshed:
+            batch.append(project)
+            if len(batch) >= 500:
+                writer.write(batch)
+                batch = []
+    writer.write(batch)
+
+    builder = ManifestBuilder()
+
+    def on_page(records):
+        # Already de-duplicated per fiscal year by fetch_projects, exactly as in a full fetch
+        builder.add(records)
+        writer.write(records)
+
+    if refresh_years:
+        fetch_projects(base_criteria, include_fields, refresh_years, label=label,
+                       workers=workers, on_page=on_page)
+
+    manifest = dict(manifest)
+    changed = []
+    for year in refresh_years:
+        entry = builder.entry(year, totals[year])
+        old = manifest.get(str(year))
+        if old is None or old.get("content_hash") != entry["content_hash"]:
+            changed.append(year)
+        manifest[str(year)] = entry
+    return manifest, changed
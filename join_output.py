@@ -0,0 +1,79 @@
+"""
+Streaming writers for the --join outputs (final JSON and CSV).
+
+JoinWriter takes enriched records one at a time and writes each straight
+to both files: a JSON array with one record per line, and a CSV through
+csv.DictWriter with a fixed column schema computed up front
+(ProjectTable.flat_columns), so no list of records or DataFrame is ever
+built and memory does not grow with the number of fiscal years or agencies
+joined. Nested dicts are flattened into "field.key" CSV columns as
+pd.json_normalize did. Both files can be gzip-compressed.
+"""
+import csv
+import json
+import os
+from raw_store import open_text, raw_path
+
+COMPRESS_LEVEL = 6  # as gzip(1); level 9 more than doubles the join time for a few percent smaller files
+
+
+def flatten_record(record, prefix="", out=None):
+    """Record as one CSV row: plain fields first, then nested dict fields as "field.key"."""
+    out = {} if out is None else out
+    nested = []
+    for key, value in record.items():
+        if isinstance(value, dict):
+            nested.append((key, value))
+        else:
+            out[prefix + key] = value
+    for key, value in nested:
+        flatten_record(value, f"{prefix}{key}.", out)
+    return out
+
+
+class JoinWriter:
+    """
+    Writes the final JSON and CSV side by side. Records go to temporary
+    files which replace the outputs only when the `with` block exits
+    cleanly; with compress=True the outputs get a .gz suffix.
+    """
+
+    def __init__(self, json_path, csv_path, columns, compress=False):
+        self.json_path = raw_path(json_path, compress)
+        self.csv_path = raw_path(csv_path, compress)
+        self.columns = columns
+        self.compress = compress
+        self.count = 0
+        self._json = None
+        self._csv = None
+        self._rows = None
+
+    def __enter__(self):
+        self._json = open_text(self.json_path + ".tmp", "w", self.compress, compresslevel=COMPRESS_LEVEL)
+        self._csv = open_text(self.csv_path + ".tmp", "w", self.compress, newline="", compresslevel=COMPRESS_LEVEL)
+        self._rows = csv.DictWriter(self._csv, fieldnames=self.columns, lineterminator="\n")  # as pandas wrote it
+        self._rows.writeheader()
+        self._json.write("[")
+        return self
+
+    def write(self, record, csv_drop=()):
+        """Write one record; fields in csv_drop are kept in the JSON but left out of the CSV."""
+        self._json.write(("," if self.count else "") + "\n" + json.dumps(record))
+        row = flatten_record({k: v for k, v in record.items() if k not in csv_drop} if csv_drop else record)
+        self._rows.writerow(row)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        self._json.write("\n]\n" if self.count else "]\n")
+        self._json.close()
+        self._csv.close()
+        for path in (self.json_path, self.csv_path):
+            if exc_type is not None:
+                os.remove(path + ".tmp")
+                continue
+            os.replace(path + ".tmp", path)
+            # Drop the other compression variant so a stale copy is never mistaken for the output
+            sibling = path[:-3] if path.endswith(".gz") else path + ".gz"
+            if os.path.exists(sibling):
+                os.remove(sibling)
+        return False
@@ -0,0 +1,78 @@
+"""
+Append-only checkpoint journal for long lookup and scrape runs.
+
+Instead of rewriting the whole cache file every few records, each resolved
+record is appended to `<cache>.journal` as one JSON line ({"key": ..., "value": ...})
+and the journal is fsynced at every checkpoint, so a checkpoint costs O(1)
+per record. The journal is compacted into the cache file at the end of a run,
+or on the next start after a crash (replaying it first).
+"""
+import json
+import os
+
+
+class Journal:
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self.path = cache_path + ".journal"
+        self._file = None
+
+    def replay(self, cache):
+        """Apply journaled records to `cache` in order. Returns the number replayed."""
+        if not os.path.exists(self.path):
+            return 0
+        count = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn final line from a crash mid-write
+                cache[record["key"]] = record["value"]
+                count += 1
+        return count
+
+    def append(self, key, value):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps({"key": key, "value": value}))
+        self._file.write("\n")
+
+    def checkpoint(self):
+        """Make every appended record durable."""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def compact(self, cache):
+        """Atomically rewrite the cache file from `cache` and drop the journal."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, self.cache_path)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def load_journaled(cache_path):
+    """
+    Load a JSON dict cache, recovering records journaled by an interrupted run.
+
+    Returns:
+        (cache, journal) ready for journal.append() / checkpoint() / compact().
+    """
+    cache = {}
+    if os.path.exists(cache_path):
+        print(f"Found existing {cache_path}, loading cache...")
+        with open(cache_path, "r") as f:
+            cache = json.load(f)
+    journal = Journal(cache_path)
+    if os.path.exists(journal.path):
+        replayed = journal.replay(cache)
+        print(f"Recovered {replayed} records from interrupted run ({journal.path}); compacting...")
+        # Compact even if nothing replayed, so new records never follow a torn line
+        journal.compact(cache)
+    return cache, journal
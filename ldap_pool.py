@@ -0,0 +1,142 @@
+"""
+Bounded pool of bound LDAP connections for parallel PI lookups.
+
+Each worker thread borrows a connection, health-checks it, and transparently
+rebinds (or reconnects) when the socket has dropped. A shared token bucket
+caps the overall lookup rate across all connections.
+"""
+import queue
+import threading
+from ldap3.core.exceptions import LDAPCommunicationError, LDAPException
+from fetch_pi_details_ldap import create_ldap_connection, get_pi_details, get_pi_details_batch, query_key
+from rate_limit import TokenBucket
+from single_flight import SingleFlight
+
+DEFAULT_RATE = 20.0  # lookups per second across all connections
+
+
+class LdapConnectionPool:
+    """
+    Args:
+        size: number of bound connections (one per worker thread).
+        rate: global lookup rate cap (lookups/second); None disables it.
+        retries: reconnect-and-retry attempts when a connection drops mid-lookup.
+        single_query: send one combined OR filter per PI instead of up to
+                      four progressive searches (see get_pi_details).
+    """
+
+    def __init__(self, size=1, rate=DEFAULT_RATE, retries=2, single_query=False):
+        self.retries = retries
+        self.single_query = single_query
+        self.flight = SingleFlight()
+        self.rebinds = 0
+        self._lock = threading.Lock()  # guards rebinds and _all across worker threads
+        self.limiter = TokenBucket(rate=rate, capacity=size) if rate else None
+        self._idle = queue.Queue()
+        self._all = []
+        for _ in range(size):
+            conn = create_ldap_connection()
+            if conn:
+                self._all.append(conn)
+                self._idle.put(conn)
+        self.size = len(self._all)
+
+    @staticmethod
+    def _healthy(conn):
+        return conn is not None and not conn.closed and conn.bound
+
+    def _reconnect(self, conn):
+        """Rebind a dropped connection, or replace it with a fresh one; None if both fail."""
+        with self._lock:
+            self.rebinds += 1
+        if conn is not None:
+            try:
+                conn.unbind()
+            except LDAPException:
+                pass
+            try:
+                conn.open()
+                if conn.bind():
+                    return conn
+            except LDAPException:
+                pass
+        new_conn = create_ldap_connection()
+        if new_conn:
+            with self._lock:
+                self._all.append(new_conn)
+        return new_conn
+
+    def run(self, search, label):
+        """
+        Run search(conn) on a pooled connection, rebinding and retrying if it
+        drops. A connection that cannot be rebound goes back to the pool as
+        is, so the pool never shrinks and the next borrower retries it.
+        """
+        conn = self._idle.get()
+        try:
+            for attempt in range(self.retries + 1):
+                if not self._healthy(conn):
+                    conn = self._reconnect(conn) or conn
+                    if not self._healthy(conn):
+                        continue
+                if self.limiter:
+                    self.limiter.acquire()
+                try:
+                    return search(conn)
+                except LDAPCommunicationError as e:
+                    print(f"    Connection dropped during lookup of {label} ({e}); rebinding...")
+                    if attempt == self.retries:
+                        raise
+                    conn = self._reconnect(conn) or conn
+            raise LDAPCommunicationError(f"Could not reconnect to LDAP for {label}")
+        finally:
+            self._idle.put(conn)
+
+    def lookup(self, pi_name):
+        """
+        Run get_pi_details on a pooled connection, sharing the query with any
+        other lookup of an equivalent name (see query_key).
+        Raises LDAPCommunicationError if the server stays unreachable after retries.
+        """
+        return self.flight.do(query_key(pi_name), lambda: self.run(
+            lambda conn: get_pi_details(pi_name, conn, single_query=self.single_query), pi_name))
+
+    def lookup_batch(self, pi_names):
+        """
+        Run get_pi_details_batch for a group of PIs on a pooled connection
+        (one rate-limited search). Names whose query is already in flight or
+        done elsewhere are not searched again. Returns {pi_name: details or None}.
+        """
+        owned = {}  # key -> (representative name, future)
+        shared = []  # (name, future) answered by another query
+        for pi_name in pi_names:
+            key = query_key(pi_name)
+            future, owner = self.flight.claim(key)
+            if owner:
+                owned[key] = (pi_name, future)
+            else:
+                shared.append((pi_name, future))
+
+        names = [name for name, _ in owned.values()]
+        try:
+            found = self.run(lambda conn: get_pi_details_batch(names, conn),
+                             f"batch of {len(names)} PIs") if names else {}
+        except BaseException as e:
+            for key, (_, future) in owned.items():
+                self.flight.resolve(key, future, error=e)
+            raise
+        results = {}
+        for key, (pi_name, future) in owned.items():
+            results[pi_name] = found.get(pi_name)
+            self.flight.resolve(key, future, results[pi_name])
+        # Resolve our own futures before waiting, so batches never wait on each other in a cycle
+        for pi_name, future in shared:
+            results[pi_name] = future.result()
+        return results
+
+    def close(self):
+        for conn in self._all:
+            try:
+                conn.unbind()
+            except LDAPException:
+                pass
@@ -0,0 +1,84 @@
+"""
+Offline snapshot of the UMN LDAP directory for PI enrichment.
+
+take_snapshot() pulls every person entry (cn, sn, givenName, title, ou, o)
+with a paged search and streams it to a compact gzip NDJSON file.
+DirectorySnapshot loads that file into an in-memory blocking index keyed by
+(surname prefix, first initial), so get_pi_details(..., snapshot=...) can
+resolve PIs locally with the same filters and scoring as a live search.
+Credential suffixes ("Bellin MD", "Peterson PhD") trail the surname, so the
+prefix blocks already contain those entries just as the live sn=Last*
+filters return them.
+"""
+import datetime
+import os
+from fetch_pi_details_ldap import iter_paged, DEFAULT_PAGE_SIZE
+from raw_store import RawStoreWriter, iter_raw
+
+SNAPSHOT_ATTRIBUTES = ["cn", "sn", "givenName", "title", "ou", "o"]
+SNAPSHOT_FILTER = "(&(sn=*)(givenName=*))"
+PREFIX_LEN = 3
+
+
+def take_snapshot(conn, path, page_size=DEFAULT_PAGE_SIZE):
+    """Write every matching directory entry to `path` (NDJSON, gzip if it ends in .gz). Returns the entry count."""
+    with RawStoreWriter(path) as writer:
+        for page_num, page in enumerate(iter_paged(conn, SNAPSHOT_FILTER, SNAPSHOT_ATTRIBUTES, page_size), 1):
+            records = []
+            for entry in page:
+                record = {"dn": entry.entry_dn}
+                for attr, values in entry.entry_attributes_as_dict.items():
+                    if values:
+                        record[attr] = [str(v) for v in values]
+                records.append(record)
+            writer.write(records)
+            if page_num % 20 == 0:
+                print(f"  ... {writer.count} entries")
+    return writer.count
+
+
+class _Values(list):
+    """List of attribute values that also answers .values, like an ldap3 Attribute."""
+
+    @property
+    def values(self):
+        return list(self)
+
+
+class SnapshotEntry:
+    """Stand-in for an ldap3 Entry built from one snapshot record."""
+
+    __slots__ = ["entry_dn"] + SNAPSHOT_ATTRIBUTES
+
+    def __init__(self, record):
+        self.entry_dn = record["dn"]
+        for attr in SNAPSHOT_ATTRIBUTES:
+            setattr(self, attr, _Values(record.get(attr, [])))
+
+
+class DirectorySnapshot:
+    """In-memory blocking index over a snapshot file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.blocks = {}  # (surname prefix, first initial) -> [SnapshotEntry] in snapshot order
+        self.size = 0
+        for record in iter_raw(path):
+            self._add(SnapshotEntry(record))
+            self.size += 1
+        self.taken_at = datetime.datetime.fromtimestamp(os.path.getmtime(path))
+
+    def _add(self, entry):
+        initials = {g[:1].lower() for g in entry.givenName if g}
+        keys = set()
+        for surname in entry.sn:
+            surname = surname.lower()
+            for length in range(1, PREFIX_LEN + 1):
+                if len(surname) >= length:
+                    keys.update((surname[:length], initial) for initial in initials)
+        for key in keys:
+            self.blocks.setdefault(key, []).append(entry)
+
+    def candidates(self, last_name, first_name):
+        """Entries whose surname shares the block prefix of `last_name` and whose givenName shares its initial."""
+        return self.blocks.get((last_name[:PREFIX_LEN].lower(), first_name[:1].lower()), [])
@@ -0,0 +1,104 @@
+"""
+Incremental LDAP sync driven by modifyTimestamp.
+
+One paged search returns the directory entries modified since the last sync
+watermark. Cached PIs whose ldap_dn is among them, plus "not found" PIs whose
+name now matches a changed entry (e.g. new hires), are re-resolved; every
+other cached entry is left as-is.
+"""
+import datetime
+import json
+import os
+from fetch_pi_details_ldap import iter_paged, parse_pi_name, _filter_rank
+
+SYNC_ATTRIBUTES = ["sn", "givenName", "modifyTimestamp"]
+
+
+def to_generalized_time(value):
+    """Format a datetime (or pass through a GeneralizedTime string) as YYYYmmddHHMMSSZ in UTC."""
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc)
+        return value.strftime("%Y%m%d%H%M%SZ")
+    return str(value)
+
+
+def load_watermark(path, pi_details=None):
+    """
+    Return the last sync watermark (GeneralizedTime). On the first sync it is
+    the newest `looked_up_at` stamp in `pi_details` (the PI cache), since
+    --refine and journal compaction rewrite the cache file without looking
+    anything up. None when neither exists, i.e. a full lookup is needed.
+    """
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f).get("watermark")
+    stamps = [details.get("looked_up_at") for details in (pi_details or {}).values()]
+    stamps = [looked_up_at for looked_up_at in stamps if looked_up_at]
+    if stamps:
+        # Naive local time, as lookup_cache.stamp() writes it
+        newest = max(datetime.datetime.fromisoformat(looked_up_at) for looked_up_at in stamps)
+        return to_generalized_time(newest.astimezone(datetime.timezone.utc))
+    return None
+
+
+def current_watermark():
+    """The current time as a watermark, for a sync that starts with a full lookup."""
+    return to_generalized_time(datetime.datetime.now(datetime.timezone.utc))
+
+
+def save_watermark(path, watermark):
+    with open(path, "w") as f:
+        json.dump({"watermark": watermark}, f, indent=2)
+
+
+class _ChangedEntry:
+    __slots__ = ("dn", "sn", "givenName")
+
+    def __init__(self, dn, sn, given):
+        self.dn = dn
+        self.sn = sn
+        self.givenName = given
+
+
+def changed_entries(conn, since):
+    """
+    Entries modified at or after `since`.
+
+    Returns:
+        (entries, watermark): the changed entries and the newest
+        modifyTimestamp seen (or `since` if nothing changed).
+    """
+    entries = []
+    watermark = since
+    for page in iter_paged(conn, f"(modifyTimestamp>={since})", SYNC_ATTRIBUTES):
+        for entry in page:
+            entries.append(_ChangedEntry(entry.entry_dn, entry.sn, entry.givenName))
+            if entry.modifyTimestamp:
+                stamp = to_generalized_time(entry.modifyTimestamp.value)
+                if stamp > watermark:
+                    watermark = stamp
+    return entries, watermark
+
+
+def pis_to_resync(pi_details, changed):
+    """
+    PIs to re-resolve: cached PIs whose ldap_dn changed, and cached
+    "not found" PIs that a changed entry would now match.
+    """
+    changed_dns = {entry.dn.lower() for entry in changed}
+    resync = []
+    unmatched = []
+    for pi_name, details in pi_details.items():
+        dn = details.get("ldap_dn")
+        if not dn:
+            unmatched.append(pi_name)
+        elif dn.lower() in changed_dns:
+            resync.append(pi_name)
+    for pi_name in unmatched:
+        names = parse_pi_name(pi_name)
+        if not (names and names[0] and names[1]):
+            continue
+        if any(_filter_rank(entry, *names) is not None for entry in changed):
+            resync.append(pi_name)
+    return resync
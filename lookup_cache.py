@@ -0,0 +1,84 @@
+"""
+Per-entry freshness for the PI lookup cache (pi_details_ldap.json).
+
+Every looked-up entry is stamped with `looked_up_at` and `misses` (the number
+of consecutive lookups that found nobody). Hits expire after hit_ttl_days;
+misses expire after miss_ttl_days, doubling with each further miss (capped at
+max_miss_ttl_days) when miss_backoff is on, so "not found" PIs are retried
+often at first and then less and less. Entries written before stamping was
+added count as looked up at the cache file's modification time.
+"""
+import datetime
+import os
+
+DEFAULT_HIT_TTL_DAYS = 180
+DEFAULT_MISS_TTL_DAYS = 14
+MAX_MISS_TTL_DAYS = 180
+
+
+def stamp(details, previous=None, id_field="ldap_dn", now=None):
+    """Record when `details` was looked up and how many lookups in a row missed."""
+    now = now or datetime.datetime.now()
+    details["looked_up_at"] = now.isoformat(timespec="seconds")
+    if details.get(id_field):
+        details["misses"] = 0
+    else:
+        details["misses"] = _misses(previous, id_field) + 1 if previous else 1
+    return details
+
+
+def _misses(details, id_field):
+    if "misses" in details:
+        return details["misses"]
+    return 0 if details.get(id_field) else 1
+
+
+class CachePolicy:
+    """
+    Args:
+        hit_ttl_days: lifetime of entries that found a directory record.
+        miss_ttl_days: lifetime of a first "not found" entry.
+        miss_backoff: double the miss lifetime for every further consecutive miss.
+        max_miss_ttl_days: cap on the backed-off miss lifetime.
+        id_field: field that is set on hits (e.g. "ldap_dn").
+        cache_path: cache file whose mtime dates unstamped legacy entries.
+    """
+
+    def __init__(self, hit_ttl_days=DEFAULT_HIT_TTL_DAYS, miss_ttl_days=DEFAULT_MISS_TTL_DAYS,
+                 miss_backoff=True, max_miss_ttl_days=MAX_MISS_TTL_DAYS, id_field="ldap_dn",
+                 cache_path=None):
+        self.hit_ttl = datetime.timedelta(days=hit_ttl_days)
+        self.miss_ttl = datetime.timedelta(days=miss_ttl_days)
+        self.max_miss_ttl = datetime.timedelta(days=max_miss_ttl_days)
+        self.miss_backoff = miss_backoff
+        self.id_field = id_field
+        self.legacy_time = datetime.datetime.now()
+        if cache_path and os.path.exists(cache_path):
+            self.legacy_time = datetime.datetime.fromtimestamp(os.path.getmtime(cache_path))
+
+    def ttl(self, details):
+        misses = _misses(details, self.id_field)
+        if not misses:
+            return self.hit_ttl
+        if not self.miss_backoff:
+            return self.miss_ttl
+        return min(self.miss_ttl * 2 ** (misses - 1), max(self.max_miss_ttl, self.miss_ttl))
+
+    def expires_at(self, details):
+        looked_up_at = details.get("looked_up_at")
+        looked_up_at = datetime.datetime.fromisoformat(looked_up_at) if looked_up_at else self.legacy_time
+        return looked_up_at + self.ttl(details)
+
+    def stale(self, entries, now=None):
+        """
+        Names of expired entries, highest priority first: misses before hits
+        (they are the most likely to change), then the longest-expired first.
+        """
+        now = now or datetime.datetime.now()
+        expired = []
+        for name, details in entries.items():
+            expires_at = self.expires_at(details)
+            if expires_at <= now:
+                expired.append((bool(details.get(self.id_field)), expires_at, name))
+        expired.sort()
+        return [name for _, _, name in expired]
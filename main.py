@@ -1,18 +1,36 @@
 import argparse
 import json
 import os
-import time
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from fetch_grants import fetch_grants
-from fetch_pi_details import get_pi_details
+from fetch_engine import FetchError
+from raw_store import RawStoreWriter, iter_raw, find_raw
+from project_table import ProjectTable, load_project_table, details_frame
+from join_output import JoinWriter
+from fetch_pi_details import get_pi_details, query_key, EmploymentCache
+from single_flight import SingleFlight
+from orcid_index import build_index, OrcidIndex
+from journal import load_journaled
 
 # File Constants
-FILE_RAW = "projects_raw.json"
+FILE_RAW = "projects_raw.ndjson"
+FILE_RAW_LEGACY = "projects_raw.json"
 FILE_BY_PI = "projects_by_pi.json"
+FILE_TABLE = "projects_table.pkl"
 FILE_PI_DETAILS = "pi_details.json"
+FILE_ORCID_EMPLOYMENTS = "orcid_employments_cache.json"
+FILE_ORCID_INDEX = "orcid_index.ndjson.gz"
 FILE_FINAL = "final_department_data.json"
 FILE_FINAL_CSV = "final_department_data.csv"
 
+# Final-output column -> PI details key, added to every project by --join
+PI_JOIN_FIELDS = {
+    "pi_rank": "rank",
+    "pi_department": "department",
+    "pi_school": "school",
+    "pi_orcid": "orcid_id",
+}
+
 def extract_core_project_num(project_num):
     """
     Extracts core project number from full string.
@@ -31,7 +49,7 @@ def extract_core_project_num(project_num):
     return base
 
 def step_projects(years=0):
-    """Fetch raw grants and save to FILE_RAW."""
+    """Stream raw grants into FILE_RAW (NDJSON)."""
     print(f"--- [Step 1] Fetching Projects ---")
     
     if years == 0:
@@ -39,68 +57,51 @@ def step_projects(years=0):
     else:
         print(f"Fetching projects for the last {years} years.")
         
-    projects = fetch_grants(years=years)
-    print(f"Total projects fetched: {len(projects)}")
-    
-    with open(FILE_RAW, "w") as f:
-        json.dump(projects, f, indent=2)
+    try:
+        with RawStoreWriter(FILE_RAW) as writer:
+            fetch_grants(years=years, on_page=writer.write)
+    except FetchError as e:
+        print(f"Error: {e}")
+        print(f"Leaving existing {FILE_RAW} untouched. Re-run --projects to retry.")
+        return
+    print(f"Total projects fetched: {writer.count}")
     print(f"Saved raw data to {FILE_RAW}")
 
 def step_reorganize():
     """Reorganize raw data by PI, then Core Grant, sorted by FY."""
     print(f"--- [Step 2] Reorganizing Data ---")
-    if not os.path.exists(FILE_RAW):
+    raw_file = find_raw(FILE_RAW, FILE_RAW_LEGACY)
+    if not raw_file:
         print(f"Error: {FILE_RAW} not found. Run --projects first.")
         return
 
-    with open(FILE_RAW, "r") as f:
-        raw_projects = json.load(f)
+    # Columnar table in by-PI order; projects_by_pi.json is written from it
+    print(f"Processing records from {raw_file}...")
+    table = ProjectTable.from_raw(iter_raw(raw_file), extract_core_project_num)
 
-    # Structure: { "PI Name": { "CoreNum": [List of Projects] } }
-    projects_by_pi = {}
-    
-    print(f"Processing {len(raw_projects)} records...")
-    for project in raw_projects:
-        pi_name = project.get("contact_pi_name")
-        if not pi_name:
-            pi_name = "Unknown"
-        
-        # Extract Core Number
-        proj_num = project.get("project_num")
-        core_num = extract_core_project_num(proj_num)
-        project["core_project_num"] = core_num # Add field to record
-        
-        # Create project_num_clip (remove first digit if present)
-        if proj_num and len(proj_num) > 0 and proj_num[0].isdigit():
-             clip = proj_num[1:]
-        else:
-             clip = proj_num
-        
-        # Create new ordered dictionary with project_num_clip first
-        new_project_entry = {"project_num_clip": clip}
-        new_project_entry.update(project)
-        
-        if pi_name not in projects_by_pi:
-            projects_by_pi[pi_name] = {}
-            
-        if core_num not in projects_by_pi[pi_name]:
-            projects_by_pi[pi_name][core_num] = []
-            
-        projects_by_pi[pi_name][core_num].append(new_project_entry)
+    table.write_by_pi(FILE_BY_PI)
+    table.save(FILE_TABLE)  # after the JSON, so the table is not mistaken for an older one
 
-    # Sort each CoreNum's list by project_num_clip ascending
-    for pi in projects_by_pi:
-        for core_num in projects_by_pi[pi]:
-            projects_by_pi[pi][core_num].sort(key=lambda x: x.get("project_num_clip") or "")
+    print(f"Reorganized {len(table)} records for {len(table.pi_names)} PIs.")
+    print(f"Saved to {FILE_BY_PI} (columnar table: {FILE_TABLE})")
 
-    with open(FILE_BY_PI, "w") as f:
-        json.dump(projects_by_pi, f, indent=2)
-    
-    print(f"Reorganized data for {len(projects_by_pi)} PIs.")
-    print(f"Saved to {FILE_BY_PI}")
+def step_index(archive_path):
+    """Build the offline ORCID index from a downloaded public data file (summaries archive)."""
+    print(f"--- [Step 3a] Indexing ORCID Public Data File ---")
+    if not os.path.exists(archive_path):
+        print(f"Error: {archive_path} not found.")
+        return
+    print(f"Streaming {archive_path}...")
+    scanned, kept = build_index(archive_path, FILE_ORCID_INDEX)
+    print(f"Scanned {scanned} ORCID records; indexed {kept} with a current employment")
+    print(f"Saved ORCID index to {FILE_ORCID_INDEX}")
 
-def step_lookup():
-    """Enhance PI info using ORCID."""
+def step_lookup(jobs=4, expanded=False, from_index=False):
+    """
+    Enhance PI info using ORCID, looking up `jobs` PIs concurrently
+    (with the expanded-search endpoint if `expanded`, or from the local
+    FILE_ORCID_INDEX if `from_index`).
+    """
     print(f"--- [Step 3] PI Lookup (ORCID) ---")
     if not os.path.exists(FILE_BY_PI):
         print(f"Error: {FILE_BY_PI} not found. Run --reorganize first.")
@@ -109,12 +110,8 @@ def step_lookup():
     with open(FILE_BY_PI, "r") as f:
         projects_by_pi = json.load(f)
     
-    pi_details = {}
-    
-    if os.path.exists(FILE_PI_DETAILS):
-        print(f"Found existing {FILE_PI_DETAILS}, loading cache...")
-        with open(FILE_PI_DETAILS, "r") as f:
-            pi_details = json.load(f)
+    # Cache plus any records journaled by an interrupted run
+    pi_details, journal = load_journaled(FILE_PI_DETAILS)
             
     # projects_by_pi keys are PI Names
     total_pis = len(projects_by_pi)
@@ -122,86 +119,94 @@ def step_lookup():
     
     print(f"Total PIs: {total_pis}. Already cached: {len(pi_details)}. To process: {len(pis_to_process)}")
     
+    # Equivalent names (same ORCID query) share one search, and candidates
+    # shared across PIs share one /employments fetch
+    flight = SingleFlight()
+    employments = EmploymentCache(FILE_ORCID_EMPLOYMENTS)
+    index = None
+    if from_index:
+        if not os.path.exists(FILE_ORCID_INDEX):
+            print(f"Error: {FILE_ORCID_INDEX} not found. Run --index-orcid first.")
+            return
+        index = OrcidIndex(FILE_ORCID_INDEX)
+        print(f"Resolving against {index.size} indexed ORCID records from {FILE_ORCID_INDEX}")
+
+    def lookup(pi_name):
+        return flight.do(query_key(pi_name), lambda: get_pi_details(pi_name, cache=employments, expanded=expanded, index=index))
+
     count = 0
-    for pi_name in pis_to_process:
-        count += 1
-        print(f"[{count}/{len(pis_to_process)}] Lookup: {pi_name}")
-        
-        details = get_pi_details(pi_name)
-        if details:
-            pi_details[pi_name] = {
-                "rank": details.get("rank"),
-                "department": details.get("department"),
-                "school": details.get("organization"),
-                "orcid_id": details.get("orcid_id")
-            }
-        else:
-             pi_details[pi_name] = {
-                "rank": None,
-                "department": None,
-                "school": None,
-                "orcid_id": None
-            }
-        
-        if count % 10 == 0:
-             with open(FILE_PI_DETAILS, "w") as f:
-                json.dump(pi_details, f, indent=2)
+    try:
+        with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+            futures = {executor.submit(lookup, pi_name): pi_name for pi_name in pis_to_process}
+            # Results are recorded on the main thread as lookups finish
+            for future in as_completed(futures):
+                pi_name = futures[future]
+                count += 1
+                print(f"[{count}/{len(pis_to_process)}] Lookup: {pi_name}")
                 
-        time.sleep(0.5) 
-
-    with open(FILE_PI_DETAILS, "w") as f:
-        json.dump(pi_details, f, indent=2)
+                details = future.result()
+                if details:
+                    pi_details[pi_name] = {
+                        "rank": details.get("rank"),
+                        "department": details.get("department"),
+                        "school": details.get("organization"),
+                        "orcid_id": details.get("orcid_id")
+                    }
+                else:
+                     pi_details[pi_name] = {
+                        "rank": None,
+                        "department": None,
+                        "school": None,
+                        "orcid_id": None
+                    }
+                journal.append(pi_name, pi_details[pi_name])
+                
+                if count % 10 == 0:
+                     journal.checkpoint()
+    finally:
+        employments.save()
+
+    print(flight.summary())
+    print(employments.summary())
+    journal.compact(pi_details)
     print(f"Saved PI details to {FILE_PI_DETAILS}")
 
-def step_join():
+def step_join(compress=False):
     """Join projects and PI details."""
     print(f"--- [Step 4] Joining Data ---")
     if not os.path.exists(FILE_BY_PI) or not os.path.exists(FILE_PI_DETAILS):
         print(f"Error: Missing input files. Ensure --reorganize and --lookup are run.")
         return
 
-    with open(FILE_BY_PI, "r") as f:
-        projects_by_pi = json.load(f)
+    table = load_project_table(FILE_TABLE, FILE_BY_PI)
         
     with open(FILE_PI_DETAILS, "r") as f:
         pi_details = json.load(f)
         
-    final_data = [] 
-    
-    # Iterate Structure: PI -> CoreNum -> [Projects]
-    for pi_name, core_groups in projects_by_pi.items():
-        details = pi_details.get(pi_name, {})
-        
-        for core_num, projects in core_groups.items():
-            for project in projects:
-                enriched = project.copy()
-                enriched["pi_rank"] = details.get("rank")
-                enriched["pi_department"] = details.get("department")
-                enriched["pi_school"] = details.get("school")
-                enriched["pi_orcid"] = details.get("orcid_id")
-                
-                final_data.append(enriched)
-
-    with open(FILE_FINAL, "w") as f:
-        json.dump(final_data, f, indent=2)
-    print(f"Saved final JSON to {FILE_FINAL}")
-    
-    try:
-        df = pd.json_normalize(final_data)
-        df.to_csv(FILE_FINAL_CSV, index=False)
-        print(f"Saved final CSV to {FILE_FINAL_CSV}")
-    except Exception as e:
-        print(f"Error saving CSV: {e}")
+    # Each project with its PI's details merged in on the PI name, streamed to both outputs
+    columns = table.flat_columns(added=PI_JOIN_FIELDS)
+    with JoinWriter(FILE_FINAL, FILE_FINAL_CSV, columns, compress=compress) as writer:
+        for enriched in table.iter_joined(details_frame(pi_details, PI_JOIN_FIELDS)):
+            writer.write(enriched)
+    print(f"Saved final JSON to {writer.json_path}")
+    print(f"Saved final CSV to {writer.csv_path} ({writer.count} records, {len(columns)} columns)")
 
 def main():
     parser = argparse.ArgumentParser(description="NIH Reporter Department Utility")
     parser.add_argument("--projects", action="store_true", help="Fetch raw grants from NIH RePORTER")
     parser.add_argument("--years", type=int, default=0, help="Number of years to fetch (0 for current year, N for last N years)")
     parser.add_argument("--reorganize", action="store_true", help="Organize grants by PI")
+    parser.add_argument("--index-orcid", type=str, default=None, metavar="ARCHIVE", help="Build the offline ORCID index from a public data file summaries archive")
     parser.add_argument("--lookup", action="store_true", help="Lookup PI details on ORCID")
+    parser.add_argument("--jobs", type=int, default=4, help="Number of PIs to look up concurrently (used with --lookup)")
+    parser.add_argument("--expanded-search", action="store_true", help="Filter ORCID candidates by institution before fetching employments (used with --lookup)")
+    parser.add_argument("--from-index", action="store_true", help="Resolve PIs against the offline ORCID index instead of the API (used with --lookup)")
     parser.add_argument("--join", action="store_true", help="Join grants and PI details")
+    parser.add_argument("--gzip", action="store_true", help="Write the final JSON/CSV gzip-compressed (used with --join)")
     
     args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
     
     if args.projects:
         step_projects(years=args.years)
@@ -209,13 +214,16 @@ def main():
     if args.reorganize:
         step_reorganize()
         
+    if args.index_orcid:
+        step_index(args.index_orcid)
+
     if args.lookup:
-        step_lookup()
+        step_lookup(jobs=args.jobs, expanded=args.expanded_search, from_index=args.from_index)
         
     if args.join:
-        step_join()
+        step_join(compress=args.gzip)
 
-    if not any(vars(args).values()):
+    if not any([args.projects, args.reorganize, args.index_orcid, args.lookup, args.join]):
         parser.print_help()
 
 if __name__ == "__main__":
@@ -2,20 +2,53 @@ import argparse
 import json
 import os
 import time
-import pandas as pd
-from fetch_grants import fetch_grants
-from fetch_pi_details_ldap import get_pi_details, create_ldap_connection
-from umn_structure import get_school_for_department
-from build_schools_structure import build_structure_only
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ldap3.core.exceptions import LDAPCommunicationError
+from fetch_grants import fetch_grants, get_fiscal_years, build_criteria, INCLUDE_FIELDS
+from fetch_engine import FetchError
+from response_cache import ResponseCache
+from incremental_fetch import load_manifest, save_manifest, ManifestBuilder, fetch_delta
+from raw_store import RawStoreWriter, iter_raw, find_raw, raw_path
+from project_table import ProjectTable, load_project_table, details_frame, save_core_grants, load_core_grants
+from join_output import JoinWriter
+from ldap_pool import LdapConnectionPool, DEFAULT_RATE as LDAP_DEFAULT_RATE
+from fetch_pi_details_ldap import create_ldap_connection, get_pi_details
+from ldap_snapshot import take_snapshot, DirectorySnapshot
+from ldap_sync import load_watermark, save_watermark, current_watermark, changed_entries, pis_to_resync
+from journal import load_journaled
+from lookup_cache import CachePolicy, stamp, DEFAULT_HIT_TTL_DAYS, DEFAULT_MISS_TTL_DAYS
+from refine_state import (map_department, dirty_pis, load_refine_state, save_refine_state, build_refine_state,
+                          empty_refine_state, OFFICIAL_FIELDS)
+from dept_suggest import SuggestionIndex
+from org_index import org_index, LEVELS
 
 # File Constants
-FILE_RAW = "projects_raw.json"
+FILE_RAW = "projects_raw.ndjson"
+FILE_RAW_LEGACY = "projects_raw.json"
+FILE_MANIFEST = "projects_manifest.json"
 FILE_BY_PI = "projects_by_pi.json"
+FILE_TABLE = "projects_table.pkl"
+FILE_CORE_GRANTS = "core_grants.json"
 FILE_PI_DETAILS = "pi_details_ldap.json"
+FILE_LDAP_SNAPSHOT = "ldap_snapshot.ndjson.gz"
+FILE_LDAP_SYNC = "ldap_sync_state.json"
 FILE_FINAL = "final_department_data_ldap.json"
 FILE_FINAL_CSV = "final_department_data_ldap.csv"
+
+# Final-output column -> PI details key, added to every project by --join
+PI_JOIN_FIELDS = {
+    "pi_rank": "rank",
+    "pi_department": "department",
+    "pi_school": "school",
+    "pi_school_official": "school_official",
+    "pi_department_official": "department_official",
+    "pi_division_official": "division_official",
+    "pi_ldap_dn": "ldap_dn",
+}
 FILE_RUNWAY = "runway_import.json"
 FILE_OVERRIDES = "pi_overrides.json"
+FILE_REFINE_STATE = "refine_state.json"
+FILE_SUGGESTIONS = "override_suggestions.json"
 
 def extract_core_project_num(project_num):
     """
@@ -34,77 +67,102 @@ def extract_core_project_num(project_num):
         return base[1:]
     return base
 
-def step_projects(years=0):
-    """Fetch raw grants and save to FILE_RAW."""
+def step_projects(years=0, use_cache=True, cache_only=False, incremental=False, compress=False):
+    """Stream raw grants into FILE_RAW (optionally refreshing only changed fiscal years)."""
     print(f"--- [Step 1] Fetching Projects ---")
     
     if years == 0:
         print("Fetching projects for the current year only.")
     else:
         print(f"Fetching projects for the last {years} years.")
-        
-    projects = fetch_grants(years=years)
-    print(f"Total projects fetched: {len(projects)}")
+    year_list = get_fiscal_years(years)
+    out_file = raw_path(FILE_RAW, compress)
+    existing_file = find_raw(FILE_RAW, FILE_RAW_LEGACY)
+
+    try:
+        with RawStoreWriter(out_file) as writer:
+            if incremental and existing_file and os.path.exists(FILE_MANIFEST):
+                print(f"Incremental mode: refreshing only changed fiscal years (manifest: {FILE_MANIFEST})")
+                # No response cache: a refreshed year must come from RePORTER, not from pages cached before it changed
+                manifest, changed = fetch_delta(build_criteria(), INCLUDE_FIELDS, year_list,
+                                                iter_raw(existing_file), load_manifest(FILE_MANIFEST), writer)
+                print(f"Fiscal years with changed content: {', '.join(map(str, changed)) or 'none'}")
+            else:
+                if incremental:
+                    print(f"No {FILE_MANIFEST} (or raw store) yet; doing a full fetch.")
+                cache = ResponseCache(cache_only=cache_only) if use_cache or cache_only else None
+                if cache_only:
+                    print("Cache-only mode: replaying cached RePORTER responses (no network).")
+
+                builder = ManifestBuilder()
+                totals = {}  # year -> meta.total, which --incremental compares against fresh probes
+
+                def on_page(records):
+                    builder.add(records)
+                    writer.write(records)
+
+                fetch_grants(years=year_list, cache=cache, on_page=on_page,
+                             on_total=totals.__setitem__)
+                manifest = {str(year): builder.entry(year, totals.get(year)) for year in year_list}
+    except FetchError as e:
+        print(f"Error: {e}")
+        print(f"Leaving existing raw data untouched. Re-run --projects to retry.")
+        return
+    print(f"Total projects in raw store: {writer.count}")
     
-    with open(FILE_RAW, "w") as f:
-        json.dump(projects, f, indent=2)
-    print(f"Saved raw data to {FILE_RAW}")
+    save_manifest(FILE_MANIFEST, manifest)
+    print(f"Saved raw data to {out_file}")
 
 def step_reorganize():
     """Reorganize raw data by PI, then Core Grant, sorted by FY."""
     print(f"--- [Step 2] Reorganizing Data ---")
-    if not os.path.exists(FILE_RAW):
+    raw_file = find_raw(FILE_RAW, FILE_RAW_LEGACY)
+    if not raw_file:
         print(f"Error: {FILE_RAW} not found. Run --projects first.")
         return
 
-    with open(FILE_RAW, "r") as f:
-        raw_projects = json.load(f)
+    # Columnar table in by-PI order; projects_by_pi.json is written from it
+    print(f"Processing records from {raw_file}...")
+    table = ProjectTable.from_raw(iter_raw(raw_file), extract_core_project_num)
 
-    # Structure: { "PI Name": { "CoreNum": [List of Projects] } }
-    projects_by_pi = {}
-    
-    print(f"Processing {len(raw_projects)} records...")
-    for project in raw_projects:
-        pi_name = project.get("contact_pi_name")
-        if not pi_name:
-            pi_name = "Unknown"
-        
-        # Extract Core Number
-        proj_num = project.get("project_num")
-        core_num = extract_core_project_num(proj_num)
-        project["core_project_num"] = core_num # Add field to record
-        
-        # Create project_num_clip (remove first digit if present)
-        if proj_num and len(proj_num) > 0 and proj_num[0].isdigit():
-             clip = proj_num[1:]
-        else:
-             clip = proj_num
-        
-        # Create new ordered dictionary with project_num_clip first
-        new_project_entry = {"project_num_clip": clip}
-        new_project_entry.update(project)
-        
-        if pi_name not in projects_by_pi:
-            projects_by_pi[pi_name] = {}
-            
-        if core_num not in projects_by_pi[pi_name]:
-            projects_by_pi[pi_name][core_num] = []
-            
-        projects_by_pi[pi_name][core_num].append(new_project_entry)
-
-    # Sort each CoreNum's list by project_num_clip ascending
-    for pi in projects_by_pi:
-        for core_num in projects_by_pi[pi]:
-            projects_by_pi[pi][core_num].sort(key=lambda x: x.get("project_num_clip") or "")
-
-    with open(FILE_BY_PI, "w") as f:
-        json.dump(projects_by_pi, f, indent=2)
-    
-    print(f"Reorganized data for {len(projects_by_pi)} PIs.")
-    print(f"Saved to {FILE_BY_PI}")
+    table.write_by_pi(FILE_BY_PI)
+    table.save(FILE_TABLE)  # after the JSON, so the table is not mistaken for an older one
+    grants = table.core_grants()
+    save_core_grants(FILE_CORE_GRANTS, grants)
 
-def step_lookup(name_filter=None):
-    """Enhance PI info using LDAP (UMN)."""
+    print(f"Reorganized {len(table)} records for {len(table.pi_names)} PIs.")
+    print(f"Saved to {FILE_BY_PI} (columnar table: {FILE_TABLE})")
+    print(f"Summarized {sum(len(cores) for cores in grants.values())} core grants in {FILE_CORE_GRANTS}")
+
+def step_snapshot():
+    """Save a local snapshot of the LDAP directory for offline lookups."""
+    print(f"--- [Step 3a] LDAP Directory Snapshot ---")
+    conn = create_ldap_connection()
+    if not conn:
+        print("Error: Could not establish LDAP connection")
+        return
+    try:
+        count = take_snapshot(conn, FILE_LDAP_SNAPSHOT)
+    finally:
+        conn.unbind()
+    print(f"Saved {count} directory entries to {FILE_LDAP_SNAPSHOT}")
+
+def step_lookup(name_filter=None, jobs=1, rate=LDAP_DEFAULT_RATE, single_query=False, batch_size=0,
+                from_snapshot=False, sync=False, refresh_stale=False, refresh_limit=0,
+                hit_ttl_days=DEFAULT_HIT_TTL_DAYS, miss_ttl_days=DEFAULT_MISS_TTL_DAYS, miss_backoff=True):
+    """
+    Enhance PI info using LDAP (UMN), optionally with `jobs` parallel pooled
+    connections and `batch_size` PIs per search (0 = one search per PI).
+    With from_snapshot, PIs are resolved against FILE_LDAP_SNAPSHOT instead.
+    With sync, only cached PIs whose directory entry changed since the last
+    sync (modifyTimestamp) are re-resolved.
+    With refresh_stale, only cached PIs whose entry expired (see
+    lookup_cache.CachePolicy) are re-resolved, highest priority first and at
+    most refresh_limit of them (0 = all).
+    """
+    if sync and from_snapshot:
+        print("Error: --sync needs live LDAP and cannot be combined with --from-snapshot.")
+        return
     print(f"--- [Step 3] PI Lookup (LDAP - UMN) ---")
     if not os.path.exists(FILE_BY_PI):
         print(f"Error: {FILE_BY_PI} not found. Run --reorganize first.")
@@ -113,12 +171,8 @@ def step_lookup(name_filter=None):
     with open(FILE_BY_PI, "r") as f:
         projects_by_pi = json.load(f)
 
-    pi_details = {}
-
-    if os.path.exists(FILE_PI_DETAILS):
-        print(f"Found existing {FILE_PI_DETAILS}, loading cache...")
-        with open(FILE_PI_DETAILS, "r") as f:
-            pi_details = json.load(f)
+    # Cache plus any records journaled by an interrupted run
+    pi_details, journal = load_journaled(FILE_PI_DETAILS)
 
     # Collect all PI names: contact PIs (dict keys) + co-PIs from principal_investigators
     all_pi_names = set(pi for pi in projects_by_pi if pi != "Unknown")
@@ -147,63 +201,145 @@ def step_lookup(name_filter=None):
         name_filter_lower = name_filter.lower()
         pis_to_process = [pi for pi in all_pi_names if name_filter_lower in pi.lower()]
         print(f"Filtering by name: \"{name_filter}\" — {len(pis_to_process)} matching PIs (will overwrite cached entries)")
+    elif sync:
+        pis_to_process = []  # decided once connected
+    elif refresh_stale:
+        policy = CachePolicy(hit_ttl_days=hit_ttl_days, miss_ttl_days=miss_ttl_days,
+                             miss_backoff=miss_backoff, cache_path=FILE_PI_DETAILS)
+        pis_to_process = [pi for pi in policy.stale(pi_details) if pi in all_pi_names]
+        stale_misses = sum(1 for pi in pis_to_process if not pi_details[pi].get("ldap_dn"))
+        print(f"Expired entries: {len(pis_to_process)} ({stale_misses} not found, {len(pis_to_process) - stale_misses} found)")
+        if refresh_limit:
+            pis_to_process = pis_to_process[:refresh_limit]
     else:
         pis_to_process = [pi for pi in all_pi_names if pi not in pi_details]
 
     print(f"Total PIs: {total_pis}. Already cached: {len(pi_details)}. To process: {len(pis_to_process)}")
     
-    # Create single LDAP connection for all lookups
-    conn = create_ldap_connection()
-    if not conn:
-        print("Error: Could not establish LDAP connection")
-        return
+    pool = None
+    if from_snapshot:
+        if not os.path.exists(FILE_LDAP_SNAPSHOT):
+            print(f"Error: {FILE_LDAP_SNAPSHOT} not found. Run --snapshot first.")
+            return
+        snapshot = DirectorySnapshot(FILE_LDAP_SNAPSHOT)
+        print(f"Resolving against {snapshot.size} directory entries from {FILE_LDAP_SNAPSHOT} (taken {snapshot.taken_at:%Y-%m-%d %H:%M})")
+        workers = 1
+    else:
+        # Pool of bound LDAP connections (a single connection when jobs == 1)
+        pool = LdapConnectionPool(size=jobs, rate=rate, single_query=single_query)
+        if not pool.size:
+            print("Error: Could not establish LDAP connection")
+            return
+        if pool.size > 1:
+            print(f"Running {pool.size} parallel lookups (rate cap: {rate or 'none'}/s)")
+        workers = pool.size
+
+    if sync:
+        since = load_watermark(FILE_LDAP_SYNC, pi_details)
+        if not since:
+            # No watermark and no looked_up_at stamps: look every PI up, and sync from now on
+            watermark = current_watermark()
+            pis_to_process = sorted(all_pi_names)
+            print(f"No sync watermark and no lookup times cached: full lookup of {len(pis_to_process)} PIs")
+        else:
+            try:
+                changed, watermark = pool.run(lambda conn: changed_entries(conn, since), "modifyTimestamp sync")
+            except Exception as e:
+                print(f"Error: modifyTimestamp search failed ({e})")
+                pool.close()
+                return
+            pis_to_process = pis_to_resync(pi_details, changed)
+            print(f"Sync since {since}: {len(changed)} directory entries changed, {len(pis_to_process)} cached PIs to re-resolve")
     
+    if from_snapshot:
+        units = [pis_to_process]
+        run = lambda unit: {pi_name: get_pi_details(pi_name, None, snapshot=snapshot) for pi_name in unit}
+    elif batch_size:
+        units = [pis_to_process[i:i + batch_size] for i in range(0, len(pis_to_process), batch_size)]
+        print(f"Batching {batch_size} PIs per LDAP search ({len(units)} searches)")
+        run = pool.lookup_batch
+    else:
+        units = [[pi_name] for pi_name in pis_to_process]
+        run = lambda unit: {unit[0]: pool.lookup(unit[0])}
+
     count = 0
+    failed = 0
+    saved_at = 0
     try:
-        for pi_name in pis_to_process:
-            count += 1
-            print(f"[{count}/{len(pis_to_process)}] {pi_name}")
-            
-            details = get_pi_details(pi_name, conn)
-            if details:
-                pi_details[pi_name] = {
-                    "rank": details.get("rank"),
-                    "department": details.get("department"),
-                    "school": details.get("organization"),
-                    "ldap_dn": details.get("dn")
-                }
-            else:
-                 pi_details[pi_name] = {
-                    "rank": None,
-                    "department": None,
-                    "school": None,
-                    "ldap_dn": None
-                }
-            
-            if count % 10 == 0:
-                 with open(FILE_PI_DETAILS, "w") as f:
-                    json.dump(pi_details, f, indent=2)
-                    print(f"  (Checkpoint: saved {count} records)")
-                    
-            time.sleep(0.1)  # Small delay to avoid overwhelming LDAP server
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run, unit): unit for unit in units}
+            # Results are recorded here on the main thread as workers finish (in
+            # any order), so every checkpoint is a consistent snapshot.
+            for future in as_completed(futures):
+                unit = futures[future]
+                try:
+                    results = future.result()
+                except LDAPCommunicationError as e:
+                    # Leave uncached so the next run retries them
+                    for pi_name in unit:
+                        count += 1
+                        failed += 1
+                        print(f"[{count}/{len(pis_to_process)}] {pi_name} — LDAP unreachable ({e})")
+                    continue
+
+                for pi_name in unit:
+                    count += 1
+                    print(f"[{count}/{len(pis_to_process)}] {pi_name}")
+                    details = results.get(pi_name)
+
+                    if details:
+                        record = {
+                            "rank": details.get("rank"),
+                            "department": details.get("department"),
+                            "school": details.get("organization"),
+                            "ldap_dn": details.get("dn")
+                        }
+                    else:
+                        record = {
+                            "rank": None,
+                            "department": None,
+                            "school": None,
+                            "ldap_dn": None
+                        }
+                    pi_details[pi_name] = stamp(record, previous=pi_details.get(pi_name))
+                    journal.append(pi_name, pi_details[pi_name])
+                
+                if count - saved_at >= 10:
+                     saved_at = count
+                     journal.checkpoint()
+                     print(f"  (Checkpoint: saved {count} records)")
     
     finally:
-        # Always close the connection
-        if conn:
-            conn.unbind()
-            print("✓ LDAP connection closed")
-
-    with open(FILE_PI_DETAILS, "w") as f:
-        json.dump(pi_details, f, indent=2)
+        # Always close the connections
+        if pool:
+            pool.close()
+            print("✓ LDAP connection(s) closed")
+            if pool.rebinds:
+                print(f"  Rebound {pool.rebinds} dropped connection(s)")
+            print(pool.flight.summary())
+
+    if failed:
+        print(f"Warning: {failed} PIs could not be looked up (LDAP unreachable); re-run --lookup to retry them")
+    journal.compact(pi_details)
     print(f"Saved PI LDAP details to {FILE_PI_DETAILS}")
+    if sync and not failed:
+        # Only advance the watermark once every changed PI was re-resolved
+        save_watermark(FILE_LDAP_SYNC, watermark)
+        print(f"Sync watermark: {watermark}")
 
-def step_refine(verbose=False):
-    """Refine PI details by mapping LDAP departments to official UMN school/department."""
+def step_refine(verbose=False, full=False):
+    """
+    Refine PI details by mapping LDAP departments to official UMN school/department.
+    Only PIs whose department, override entries or (for pattern-mapped PIs)
+    the pattern table changed since the last run are re-mapped (see
+    refine_state.py); full=True re-maps every PI.
+    """
     print(f"--- [Step 4] Refining PI Details (Official Mapping) ---")
     if not os.path.exists(FILE_PI_DETAILS):
         print(f"Error: {FILE_PI_DETAILS} not found. Run --lookup first.")
         return
 
+    start = time.perf_counter()
     with open(FILE_PI_DETAILS, "r") as f:
         pi_details = json.load(f)
 
@@ -217,35 +353,59 @@ def step_refine(verbose=False):
         dept_overrides = overrides.get("department_overrides", {})
         print(f"Loaded overrides: {len(pi_overrides)} PI-level, {len(dept_overrides)} department-level")
 
+    previous = empty_refine_state() if full else load_refine_state(FILE_REFINE_STATE)
+    dirty = dirty_pis(pi_details, previous, pi_overrides, dept_overrides)
+    print(f"Re-mapping {len(dirty)} of {len(pi_details)} PIs")
+
     mapped = 0
     unmapped = 0
     overridden_pi = 0
     overridden_dept = 0
     unmapped_entries = []  # (pi_name, ldap_dept)
+    sources = {}  # pi_name -> "O", "D" or "P"
+    moved = []  # (pi_name, reason, before, after)
 
     for pi_name, details in pi_details.items():
         ldap_dept = details.get("department")
-        source = "P"  # default: pattern match
-
-        # Priority 1: PI-level override
-        if pi_name in pi_overrides:
-            ov = pi_overrides[pi_name]
-            school_official = ov.get("school_official")
-            dept_official = ov.get("department_official")
-            div_official = ov.get("division_official")
+
+        if pi_name not in dirty:
+            # Unchanged inputs: keep the previous mapping
+            source = previous["pis"][pi_name]["source"]
+            school_official, dept_official, div_official = (details.get(field) for field in OFFICIAL_FIELDS)
+        else:
+            source = "P"  # default: pattern match
+            # Priority 1: PI-level override
+            if pi_name in pi_overrides:
+                ov = pi_overrides[pi_name]
+                school_official = ov.get("school_official")
+                dept_official = ov.get("department_official")
+                div_official = ov.get("division_official")
+                source = "O"
+            # Priority 2: Department-level override
+            elif ldap_dept and ldap_dept in dept_overrides:
+                ov = dept_overrides[ldap_dept]
+                school_official = ov.get("school_official")
+                dept_official = ov.get("department_official")
+                div_official = ov.get("division_official")
+                source = "D"
+            # Priority 3: Pattern matching
+            else:
+                school_official, dept_official, div_official = map_department(ldap_dept)
+
+            before = tuple(details.get(field) for field in OFFICIAL_FIELDS)
+            after = (school_official, dept_official, div_official)
+            if pi_name in previous["pis"] and before != after:
+                moved.append((pi_name, dirty[pi_name], before, after))
+
+            details["school_official"] = school_official
+            details["department_official"] = dept_official
+            details["division_official"] = div_official
+
+        sources[pi_name] = source
+        if source == "O":
             overridden_pi += 1
-            source = "O"
-        # Priority 2: Department-level override
-        elif ldap_dept and ldap_dept in dept_overrides:
-            ov = dept_overrides[ldap_dept]
-            school_official = ov.get("school_official")
-            dept_official = ov.get("department_official")
-            div_official = ov.get("division_official")
+        elif source == "D":
             overridden_dept += 1
-            source = "D"
-        # Priority 3: Pattern matching
-        else:
-            school_official, dept_official, div_official = get_school_for_department(ldap_dept)
 
         if school_official:
             mapped += 1
@@ -253,10 +413,6 @@ def step_refine(verbose=False):
             unmapped += 1
             unmapped_entries.append((pi_name, ldap_dept))
 
-        details["school_official"] = school_official
-        details["department_official"] = dept_official
-        details["division_official"] = div_official
-
         if verbose:
             status = source if school_official else "✗"
             div_str = f" / {div_official}" if div_official else ""
@@ -267,8 +423,10 @@ def step_refine(verbose=False):
             }.get(source, f"\"{ldap_dept}\"")
             print(f"  {status} {pi_name}: {label} → {school_official or 'UNMAPPED'} / {dept_official or 'N/A'}{div_str}")
 
-    with open(FILE_PI_DETAILS, "w") as f:
-        json.dump(pi_details, f, indent=2)
+    if dirty:
+        with open(FILE_PI_DETAILS, "w") as f:
+            json.dump(pi_details, f, indent=2)
+    save_refine_state(FILE_REFINE_STATE, build_refine_state(pi_details, pi_overrides, dept_overrides, sources))
 
     print(f"\nMapped: {mapped}, Unmapped: {unmapped} (of {len(pi_details)} PIs)")
     if overridden_pi or overridden_dept:
@@ -278,50 +436,99 @@ def step_refine(verbose=False):
         for pi_name, ldap_dept in sorted(unmapped_entries):
             print(f"  - {pi_name}: \"{ldap_dept or 'None'}\"")
         print(f"\nTo fix: add entries to {FILE_OVERRIDES} or patterns to umn_structure.py")
-    print(f"Saved refined PI details to {FILE_PI_DETAILS}")
+    if moved:
+        print(f"\nMoved PIs ({len(moved)}):")
+        for pi_name, reason, before, after in sorted(moved):
+            old = " / ".join(v for v in before if v) or "UNMAPPED"
+            new = " / ".join(v for v in after if v) or "UNMAPPED"
+            print(f"  - {pi_name} ({reason}): {old} → {new}")
+    memo = map_department.cache_info()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"Re-mapped {len(dirty)} PIs, {len(moved)} moved; {memo.misses} distinct departments matched ({memo.hits} memo hits) in {elapsed_ms:.0f} ms")
+    if dirty:
+        print(f"Saved refined PI details to {FILE_PI_DETAILS}")
+    else:
+        print(f"{FILE_PI_DETAILS} is up to date")
+
+def step_suggest(top_k=3):
+    """Draft department overrides for PIs that --refine left unmapped."""
+    print(f"--- [Step 4b] Suggesting Mappings for Unmapped Departments ---")
+    if not os.path.exists(FILE_PI_DETAILS):
+        print(f"Error: {FILE_PI_DETAILS} not found. Run --lookup and --refine first.")
+        return
+
+    with open(FILE_PI_DETAILS, "r") as f:
+        pi_details = json.load(f)
+    pi_overrides = {}
+    dept_overrides = {}
+    if os.path.exists(FILE_OVERRIDES):
+        with open(FILE_OVERRIDES, "r") as f:
+            overrides = json.load(f)
+        pi_overrides = overrides.get("pi_overrides", {})
+        dept_overrides = overrides.get("department_overrides", {})
+
+    # Unmapped raw department strings -> PIs; explicit overrides (even to null) are decisions, not gaps
+    unmapped = {}
+    for pi_name, details in pi_details.items():
+        ldap_dept = details.get("department")
+        if details.get("school_official") or not ldap_dept:
+            continue
+        if pi_name in pi_overrides or ldap_dept in dept_overrides:
+            continue
+        unmapped.setdefault(ldap_dept, []).append(pi_name)
+    if not unmapped:
+        print("No unmapped department strings to suggest for.")
+        return
+
+    start = time.perf_counter()
+    index = SuggestionIndex(dept_overrides)
+    raw_strings = sorted(unmapped)
+    suggestions = index.suggest(raw_strings, top_k=top_k)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    draft = {}
+    for raw, candidates in zip(raw_strings, suggestions):
+        score, (school, dept, division) = candidates[0]
+        draft[raw] = {
+            "school_official": school,
+            "department_official": dept,
+            "division_official": division,
+            "reason": f"SUGGESTED (score {score}), review before merging; PIs: {', '.join(sorted(unmapped[raw]))}",
+            "candidates": [{"score": s, "school_official": c[0], "department_official": c[1], "division_official": c[2]}
+                           for s, c in candidates],
+        }
+    # Most confident first, so review can stop where suggestions turn to noise
+    draft = dict(sorted(draft.items(), key=lambda item: -item[1]["candidates"][0]["score"]))
+
+    with open(FILE_SUGGESTIONS, "w") as f:
+        json.dump({"department_overrides": draft}, f, indent=2)
+
+    print(f"Scored {len(raw_strings)} unmapped department strings ({sum(len(v) for v in unmapped.values())} PIs) "
+          f"against {len(index.labels)} indexed names in {elapsed_ms:.0f} ms")
+    for raw, entry in list(draft.items())[:10]:
+        best = entry["candidates"][0]
+        print(f"  {best['score']:.2f} \"{raw}\" → {best['school_official']} / {best['department_official']}")
+    print(f"Saved draft to {FILE_SUGGESTIONS}; copy reviewed entries into \"department_overrides\" in {FILE_OVERRIDES}")
 
-def step_join():
+def step_join(compress=False):
     """Join projects and PI details."""
     print(f"--- [Step 5] Joining Data ---")
     if not os.path.exists(FILE_BY_PI) or not os.path.exists(FILE_PI_DETAILS):
         print(f"Error: Missing input files. Ensure --reorganize and --lookup are run.")
         return
 
-    with open(FILE_BY_PI, "r") as f:
-        projects_by_pi = json.load(f)
+    table = load_project_table(FILE_TABLE, FILE_BY_PI)
         
     with open(FILE_PI_DETAILS, "r") as f:
         pi_details = json.load(f)
         
-    final_data = [] 
-    
-    # Iterate Structure: PI -> CoreNum -> [Projects]
-    for pi_name, core_groups in projects_by_pi.items():
-        details = pi_details.get(pi_name, {})
-        
-        for core_num, projects in core_groups.items():
-            for project in projects:
-                enriched = project.copy()
-                enriched["pi_rank"] = details.get("rank")
-                enriched["pi_department"] = details.get("department")
-                enriched["pi_school"] = details.get("school")
-                enriched["pi_school_official"] = details.get("school_official")
-                enriched["pi_department_official"] = details.get("department_official")
-                enriched["pi_division_official"] = details.get("division_official")
-                enriched["pi_ldap_dn"] = details.get("ldap_dn")
-                
-                final_data.append(enriched)
-
-    with open(FILE_FINAL, "w") as f:
-        json.dump(final_data, f, indent=2)
-    print(f"Saved final JSON to {FILE_FINAL}")
-    
-    try:
-        df = pd.json_normalize(final_data)
-        df.to_csv(FILE_FINAL_CSV, index=False)
-        print(f"Saved final CSV to {FILE_FINAL_CSV}")
-    except Exception as e:
-        print(f"Error saving CSV: {e}")
+    # Each project with its PI's details merged in on the PI name, streamed to both outputs
+    columns = table.flat_columns(added=PI_JOIN_FIELDS)
+    with JoinWriter(FILE_FINAL, FILE_FINAL_CSV, columns, compress=compress) as writer:
+        for enriched in table.iter_joined(details_frame(pi_details, PI_JOIN_FIELDS)):
+            writer.write(enriched)
+    print(f"Saved final JSON to {writer.json_path}")
+    print(f"Saved final CSV to {writer.csv_path} ({writer.count} records, {len(columns)} columns)")
 
 def _extract_x500_from_dn(ldap_dn):
     """Extract x500 ID from LDAP DN to construct email.
@@ -335,36 +542,15 @@ def _extract_x500_from_dn(ldap_dn):
     return match.group(1) if match else None
 
 
-def _build_unit_tree(structure):
-    """Convert flat UMN_STRUCTURE dict into nested children format for Runway import."""
-    # structure is: { "University of Minnesota": { "UMN Twin Cities": { "School": { "Dept": [divs] } } } }
-    uni_name = list(structure.keys())[0]  # "University of Minnesota"
-    uni_data = structure[uni_name]
-
-    root = {"name": uni_name, "children": []}
-
-    for campus_name in sorted(uni_data.keys()):
-        campus_node = {"name": campus_name, "children": []}
-        campus_data = uni_data[campus_name]
-
-        for school_name in sorted(campus_data.keys()):
-            school_node = {"name": school_name, "children": []}
-            dept_dict = campus_data[school_name]
-
-            for dept_name in sorted(dept_dict.keys()):
-                divisions = dept_dict[dept_name]
-                if divisions:
-                    dept_node = {"name": dept_name, "children": [
-                        {"name": div} for div in sorted(divisions)
-                    ]}
-                else:
-                    dept_node = {"name": dept_name}
-                school_node["children"].append(dept_node)
-
-            campus_node["children"].append(school_node)
-        root["children"].append(campus_node)
-
-    return root
+def _build_unit_tree(index, node_id=None):
+    """Convert the organization index into nested children format for Runway import."""
+    node_id = index.roots[0] if node_id is None else node_id  # "University of Minnesota"
+    node = {"name": index.names[node_id]}
+    children = index.children[node_id]  # pre-sorted by name
+    # University, campus and school nodes always list children; departments only when they have divisions
+    if children or index.depths[node_id] < LEVELS.index("Department"):
+        node["children"] = [_build_unit_tree(index, child) for child in children]
+    return node
 
 
 def step_pack():
@@ -374,18 +560,18 @@ def step_pack():
         print(f"Error: Missing input files. Ensure --reorganize and --refine are run.")
         return
 
-    with open(FILE_BY_PI, "r") as f:
-        projects_by_pi = json.load(f)
+    table = load_project_table(FILE_TABLE, FILE_BY_PI)
+    grants = load_core_grants(FILE_CORE_GRANTS, FILE_BY_PI, table)
 
     with open(FILE_PI_DETAILS, "r") as f:
         pi_details = json.load(f)
 
-    # 1. Build nested unit tree from UMN_STRUCTURE
-    flat_structure = build_structure_only()
-    unit_tree = _build_unit_tree(flat_structure)
+    # 1. Build nested unit tree from the organization index
+    index = org_index()
+    unit_tree = _build_unit_tree(index)
 
     # 2. Hierarchy levels (matches UMN structure)
-    hierarchy_levels = ["University", "Campus", "College/School", "Department", "Division"]
+    hierarchy_levels = list(LEVELS)
 
     # 3. Schemas for user and project resource types
     schemas = {
@@ -403,6 +589,9 @@ def step_pack():
                 "award_number": {"type": "string", "title": "Award Number"},
                 "core_project_num": {"type": "string", "title": "Core Project Number"},
                 "award_amount": {"type": "number", "title": "Award Amount"},
+                "cumulative_award_amount": {"type": "number", "title": "Cumulative Award Amount"},
+                "first_fiscal_year": {"type": "number", "title": "First Fiscal Year"},
+                "last_fiscal_year": {"type": "number", "title": "Last Fiscal Year"},
                 "funding_agency": {"type": "string", "title": "Funding Agency"},
                 "project_start_date": {"type": "string", "format": "date", "title": "Start Date"},
                 "project_end_date": {"type": "string", "format": "date", "title": "End Date"},
@@ -419,8 +608,10 @@ def step_pack():
     skipped_no_dept = 0
     copi_fallback_count = 0
     skipped_no_email = 0
+    pi_fallback_count = 0
+    invalid_units = set()
 
-    for pi_name, core_groups in projects_by_pi.items():
+    for pi_name, core_grants in grants.items():
         if pi_name == "Unknown":
             continue
 
@@ -445,6 +636,17 @@ def step_pack():
         unit_path = ["UMN Twin Cities", school, dept]
         if division:
             unit_path.append(division)
+        if not index.is_unit_path(unit_path):
+            # e.g. an override naming a department that is not in umn_structure.py; keep the PI
+            # and their projects under the same fallback co-PIs get
+            print(f"  Warning: {pi_name}: unit '{' / '.join(unit_path)}' is not in umn_structure.py; "
+                  f"placing in Other Departments")
+            if dept in index.dept_schools:
+                # A department under the wrong school (e.g. a stale override)
+                print(f"    '{dept}' is listed under: {', '.join(index.dept_schools[dept])}")
+            invalid_units.add(" / ".join(unit_path))
+            unit_path = ["UMN Twin Cities", "Other Departments"]
+            pi_fallback_count += 1
 
         # Parse name: "LAST, FIRST MIDDLE" -> first_name, last_name
         parts = pi_name.split(", ", 1)
@@ -470,25 +672,20 @@ def step_pack():
                 user_entry["attributes"]["general.rank"] = rank
             users.append(user_entry)
 
-        # Add projects - take most recent fiscal year record per core grant
-        for core_num, proj_list in core_groups.items():
-            # Pick the most recent record (highest fiscal_year)
-            proj_list_sorted = sorted(proj_list, key=lambda p: p.get("fiscal_year", 0), reverse=True)
-            proj = proj_list_sorted[0]
-
-            title = proj.get("project_title") or proj.get("title") or f"Grant {core_num}"
-
-            # Format dates (strip time portion)
-            start = (proj.get("project_start_date") or "")[:10]
-            end = (proj.get("project_end_date") or "")[:10]
-            budget_start = (proj.get("budget_start") or "")[:10]
-            budget_end = (proj.get("budget_end") or "")[:10]
+        # Add projects - one per core grant, from its summary and most recent fiscal year record
+        for core_num, grant in core_grants.items():
+            row = grant["latest_row"]
+            title = grant["title"]
+            start = grant["project_start_date"]
+            end = grant["project_end_date"]
+            budget_start = grant["budget_start"]
+            budget_end = grant["budget_end"]
 
-            abstract = (proj.get("abstract_text") or "").strip()
+            abstract = (table.get(row, "abstract_text") or "").strip()
 
             # Build co-PI list from principal_investigators array
             co_pis = []
-            for pi_entry in proj.get("principal_investigators") or []:
+            for pi_entry in table.get(row, "principal_investigators") or []:
                 # Convert "First Middle Last" to "LAST, FIRST MIDDLE" format
                 copi_last = pi_entry.get("last_name", "").strip().upper()
                 copi_first_raw = pi_entry.get("first_name", "").strip().upper()
@@ -508,12 +705,16 @@ def step_pack():
                     copi_school = copi_details.get("school_official")
                     copi_dept = copi_details.get("department_official")
                     copi_div = copi_details.get("division_official")
+                    copi_unit_path = None
                     if copi_school and copi_dept:
                         copi_unit_path = ["UMN Twin Cities", copi_school, copi_dept]
                         if copi_div:
                             copi_unit_path.append(copi_div)
-                    else:
-                        # Fallback for co-PIs with unmapped LDAP departments
+                        if not index.is_unit_path(copi_unit_path):
+                            invalid_units.add(" / ".join(copi_unit_path))
+                            copi_unit_path = None
+                    if copi_unit_path is None:
+                        # Fallback for co-PIs with unmapped or unknown departments
                         copi_unit_path = ["UMN Twin Cities", "Other Departments"]
                         copi_fallback_count += 1
                     email_set.add(copi_email)
@@ -541,12 +742,15 @@ def step_pack():
                 "status": "current",
                 "unit_path": unit_path,
                 "attributes": {
-                    "grant_info.award_number": proj.get("project_num", ""),
+                    "grant_info.award_number": grant["project_num"],
                     "grant_info.core_project_num": core_num,
-                    "grant_info.award_amount": proj.get("award_amount"),
+                    "grant_info.award_amount": grant["award_amount"],
                     "grant_info.funding_agency": "NIH",
                 }
             }
+            for field in ("cumulative_award_amount", "first_fiscal_year", "last_fiscal_year"):
+                if grant[field] is not None:
+                    project_entry["attributes"][f"grant_info.{field}"] = grant[field]
             if co_pis:
                 project_entry["co_pis"] = co_pis
             if abstract:
@@ -562,8 +766,8 @@ def step_pack():
 
             projects.append(project_entry)
 
-    # Add "Other Departments" unit to the tree if any co-PIs needed the fallback
-    if copi_fallback_count > 0:
+    # Add "Other Departments" unit to the tree if any PIs or co-PIs needed the fallback
+    if pi_fallback_count > 0 or copi_fallback_count > 0:
         campus_node = unit_tree.get("children", [{}])[0]  # "UMN Twin Cities"
         campus_node.setdefault("children", []).append({"name": "Other Departments"})
 
@@ -602,6 +806,12 @@ def step_pack():
         print(f"  Skipped (no email): {skipped_no_email} PIs")
     if skipped_no_dept:
         print(f"  Skipped (no dept mapping): {skipped_no_dept} PIs")
+    if pi_fallback_count:
+        print(f"  PIs in Other Departments (unit not in umn_structure.py): {pi_fallback_count}")
+    if invalid_units:
+        print(f"  Unknown unit paths (check {FILE_OVERRIDES}):")
+        for unit in sorted(invalid_units):
+            print(f"    - {unit}")
     if copi_fallback_count:
         print(f"  Co-PIs in Other Departments (unmapped): {copi_fallback_count}")
 
@@ -609,35 +819,74 @@ def main():
     parser = argparse.ArgumentParser(description="NIH Reporter Department Utility (LDAP Version)")
     parser.add_argument("--projects", action="store_true", help="Fetch raw grants from NIH RePORTER")
     parser.add_argument("--years", type=int, default=0, help="Number of years to fetch (0 for current year, N for last N years)")
+    parser.add_argument("--incremental", action="store_true", help="Re-query only fiscal years that changed since the last fetch; always goes to RePORTER, bypassing the response cache (used with --projects)")
+    parser.add_argument("--gzip", action="store_true", help="Write the raw NDJSON store (--projects) and the final JSON/CSV (--join) gzip-compressed")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk RePORTER response cache (used with --projects)")
+    parser.add_argument("--cache-only", action="store_true", help="Replay cached RePORTER responses without network access (used with --projects)")
     parser.add_argument("--reorganize", action="store_true", help="Organize grants by PI")
+    parser.add_argument("--snapshot", action="store_true", help="Save a local snapshot of the LDAP directory for offline lookups")
     parser.add_argument("--lookup", action="store_true", help="Lookup PI details on LDAP (UMN)")
     parser.add_argument("--name", type=str, default=None, help="Re-lookup only PIs matching this name (used with --lookup)")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of parallel pooled LDAP connections (used with --lookup)")
+    parser.add_argument("--ldap-rate", type=float, default=LDAP_DEFAULT_RATE, help="Global LDAP lookup rate cap per second, 0 to disable (used with --lookup)")
+    parser.add_argument("--single-query", action="store_true", help="Send one combined OR filter per PI instead of progressive searches (used with --lookup)")
+    parser.add_argument("--batch-size", type=int, default=0, help="Look up this many PIs per paged LDAP search, 0 for one search per PI (used with --lookup)")
+    parser.add_argument("--from-snapshot", action="store_true", help="Resolve PIs against the local directory snapshot instead of live LDAP (used with --lookup)")
+    parser.add_argument("--sync", action="store_true", help="Re-resolve only cached PIs whose LDAP entry changed since the last sync (used with --lookup)")
+    parser.add_argument("--refresh-stale", action="store_true", help="Re-resolve only expired cache entries, not-found PIs first (used with --lookup)")
+    parser.add_argument("--refresh-limit", type=int, default=0, help="Re-resolve at most this many expired entries, 0 for all (used with --refresh-stale)")
+    parser.add_argument("--hit-ttl", type=float, default=DEFAULT_HIT_TTL_DAYS, help="Days before a found PI expires (used with --refresh-stale)")
+    parser.add_argument("--miss-ttl", type=float, default=DEFAULT_MISS_TTL_DAYS, help="Days before a not-found PI expires, doubling per repeated miss (used with --refresh-stale)")
+    parser.add_argument("--no-miss-backoff", action="store_true", help="Keep the not-found TTL fixed instead of doubling it per repeated miss (used with --refresh-stale)")
     parser.add_argument("--refine", action="store_true", help="Map LDAP departments to official UMN school/department")
     parser.add_argument("--verbose", "-v", action="store_true", help="Show detailed mapping output (used with --refine)")
+    parser.add_argument("--full", action="store_true", help="Re-map every PI instead of only changed ones (used with --refine)")
+    parser.add_argument("--suggest", action="store_true", help="Draft department overrides for unmapped PIs into override_suggestions.json")
+    parser.add_argument("--top-k", type=int, default=3, help="Candidate mappings listed per department string (used with --suggest)")
     parser.add_argument("--join", action="store_true", help="Join grants and PI details")
     parser.add_argument("--pack", action="store_true", help="Pack units + projects into single Runway import file")
 
     args = parser.parse_args()
+    if args.incremental and args.cache_only:
+        parser.error("--incremental probes RePORTER for fresh totals and cannot be combined with --cache-only")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.batch_size < 0:
+        parser.error("--batch-size must be 0 (one search per PI) or more")
+    if args.top_k < 1:
+        parser.error("--top-k must be at least 1")
 
     if args.projects:
-        step_projects(years=args.years)
+        step_projects(years=args.years, use_cache=not args.no_cache, cache_only=args.cache_only,
+                      incremental=args.incremental, compress=args.gzip)
 
     if args.reorganize:
         step_reorganize()
 
+    if args.snapshot:
+        step_snapshot()
+
     if args.lookup:
-        step_lookup(name_filter=args.name)
+        step_lookup(name_filter=args.name, jobs=args.jobs, rate=args.ldap_rate or None,
+                    single_query=args.single_query, batch_size=args.batch_size,
+                    from_snapshot=args.from_snapshot, sync=args.sync,
+                    refresh_stale=args.refresh_stale, refresh_limit=args.refresh_limit,
+                    hit_ttl_days=args.hit_ttl, miss_ttl_days=args.miss_ttl,
+                    miss_backoff=not args.no_miss_backoff)
 
     if args.refine:
-        step_refine(verbose=args.verbose)
+        step_refine(verbose=args.verbose, full=args.full)
+
+    if args.suggest:
+        step_suggest(top_k=args.top_k)
 
     if args.join:
-        step_join()
+        step_join(compress=args.gzip)
 
     if args.pack:
         step_pack()
 
-    if not any(vars(args).values()):
+    if not any([args.projects, args.reorganize, args.snapshot, args.lookup, args.refine, args.suggest, args.join, args.pack]):
         parser.print_help()
 
 if __name__ == "__main__":
@@ -1,20 +1,40 @@
 import argparse
 import json
 import os
-import time
 import datetime
-import pandas as pd
-from fetch_va_grants import fetch_va_grants
+from fetch_va_grants import fetch_va_grants, get_fiscal_years, build_criteria, INCLUDE_FIELDS
+from fetch_engine import FetchError
+from response_cache import ResponseCache
+from incremental_fetch import load_manifest, save_manifest, ManifestBuilder, fetch_delta
+from raw_store import RawStoreWriter, iter_raw, find_raw, raw_path
+from project_table import ProjectTable, load_project_table, save_core_grants, load_core_grants
+from join_output import JoinWriter
 from scrape_va_details import build_listing_index, scrape_detail_page
+from journal import load_journaled
 
 # File Constants
-FILE_RAW = "va_projects_raw.json"
+FILE_RAW = "va_projects_raw.ndjson"
+FILE_RAW_LEGACY = "va_projects_raw.json"
+FILE_MANIFEST = "va_projects_manifest.json"
 FILE_BY_PI = "va_projects_by_pi.json"
+FILE_TABLE = "va_projects_table.pkl"
+FILE_CORE_GRANTS = "va_core_grants.json"
 FILE_VA_DETAILS = "va_project_details.json"
 FILE_FINAL = "va_final_data.json"
 FILE_FINAL_CSV = "va_final_data.csv"
 FILE_RUNWAY = "va_runway_import.json"
 
+# Final-output column -> scraped detail key, added by --join to projects with scraped details
+VA_JOIN_FIELDS = {
+    "total_award_amount": "total_award_amount",
+    "project_period": "project_period",
+    "va_location": "location",
+    "congressional_district": "congressional_district",
+    "portfolio": "portfolio",
+    "research_service": "research_service",
+}
+CSV_DROP = ("principal_investigators",)
+
 
 def extract_core_project_num(project_num):
     """
@@ -56,22 +76,20 @@ def _make_placeholder_email(pi_name, email_set):
     return email
 
 
-def _get_profile_id_for_pi(pi_name, projects_by_pi):
-    """Extract NIH profile_id for a contact PI from their project data."""
-    core_groups = projects_by_pi.get(pi_name, {})
-    for core_num, proj_list in core_groups.items():
-        for proj in proj_list:
-            for pi_entry in proj.get("principal_investigators") or []:
-                if pi_entry.get("is_contact_pi"):
-                    pid = pi_entry.get("profile_id")
-                    if pid:
-                        return str(pid)
+def _get_profile_id_for_pi(table, start, stop):
+    """Extract NIH profile_id for a contact PI from their project rows [start, stop)."""
+    for row in range(start, stop):
+        for pi_entry in table.get(row, "principal_investigators") or []:
+            if pi_entry.get("is_contact_pi"):
+                pid = pi_entry.get("profile_id")
+                if pid:
+                    return str(pid)
     return None
 
 
-def _get_copi_profile_id(copi_name, proj):
+def _get_copi_profile_id(copi_name, principal_investigators):
     """Extract NIH profile_id for a co-PI from a project's principal_investigators."""
-    for pi_entry in proj.get("principal_investigators") or []:
+    for pi_entry in principal_investigators:
         last = pi_entry.get("last_name", "").strip().upper()
         first = pi_entry.get("first_name", "").strip().upper()
         middle = pi_entry.get("middle_name", "").strip().upper()
@@ -84,8 +102,8 @@ def _get_copi_profile_id(copi_name, proj):
 
 # ── Step 1: Fetch VA grants ──────────────────────────────────────────────────
 
-def step_projects(years=5, org_name=None):
-    """Fetch VA grants from NIH RePORTER API and save to FILE_RAW."""
+def step_projects(years=5, org_name=None, use_cache=True, cache_only=False, incremental=False, compress=False):
+    """Stream VA grants from NIH RePORTER API into FILE_RAW (optionally only changed fiscal years)."""
     print(f"--- [Step 1] Fetching VA Projects ---")
     if years == 0:
         print("Fetching projects for the current year only.")
@@ -93,13 +111,44 @@ def step_projects(years=5, org_name=None):
         print(f"Fetching projects for the last {years} years.")
     if org_name:
         print(f"Filtering by organization: {org_name}")
+    year_list = get_fiscal_years(years)
+    out_file = raw_path(FILE_RAW, compress)
+    existing_file = find_raw(FILE_RAW, FILE_RAW_LEGACY)
 
-    projects = fetch_va_grants(years=years, org_name=org_name)
-    print(f"Total VA projects fetched: {len(projects)}")
+    try:
+        with RawStoreWriter(out_file) as writer:
+            if incremental and existing_file and os.path.exists(FILE_MANIFEST):
+                print(f"Incremental mode: refreshing only changed fiscal years (manifest: {FILE_MANIFEST})")
+                # No response cache: a refreshed year must come from RePORTER, not from pages cached before it changed
+                manifest, changed = fetch_delta(build_criteria(org_name), INCLUDE_FIELDS, year_list,
+                                                iter_raw(existing_file), load_manifest(FILE_MANIFEST), writer,
+                                                label="VA grants")
+                print(f"Fiscal years with changed content: {', '.join(map(str, changed)) or 'none'}")
+            else:
+                if incremental:
+                    print(f"No {FILE_MANIFEST} (or raw store) yet; doing a full fetch.")
+                cache = ResponseCache(cache_only=cache_only) if use_cache or cache_only else None
+                if cache_only:
+                    print("Cache-only mode: replaying cached RePORTER responses (no network).")
+
+                builder = ManifestBuilder()
+                totals = {}  # year -> meta.total, which --incremental compares against fresh probes
+
+                def on_page(records):
+                    builder.add(records)
+                    writer.write(records)
+
+                fetch_va_grants(years=year_list, org_name=org_name, cache=cache, on_page=on_page,
+                                on_total=totals.__setitem__)
+                manifest = {str(year): builder.entry(year, totals.get(year)) for year in year_list}
+    except FetchError as e:
+        print(f"Error: {e}")
+        print(f"Leaving existing raw data untouched. Re-run --projects to retry.")
+        return
+    print(f"Total VA projects in raw store: {writer.count}")
 
-    with open(FILE_RAW, "w") as f:
-        json.dump(projects, f, indent=2)
-    print(f"Saved raw data to {FILE_RAW}")
+    save_manifest(FILE_MANIFEST, manifest)
+    print(f"Saved raw data to {out_file}")
 
 
 # ── Step 2: Reorganize by PI ─────────────────────────────────────────────────
@@ -107,50 +156,23 @@ def step_projects(years=5, org_name=None):
 def step_reorganize():
     """Reorganize raw data by PI, then Core Grant Number."""
     print(f"--- [Step 2] Reorganizing Data ---")
-    if not os.path.exists(FILE_RAW):
+    raw_file = find_raw(FILE_RAW, FILE_RAW_LEGACY)
+    if not raw_file:
         print(f"Error: {FILE_RAW} not found. Run --projects first.")
         return
 
-    with open(FILE_RAW, "r") as f:
-        raw_projects = json.load(f)
-
-    projects_by_pi = {}
-    print(f"Processing {len(raw_projects)} records...")
-
-    for project in raw_projects:
-        pi_name = project.get("contact_pi_name")
-        if not pi_name:
-            pi_name = "Unknown"
-
-        proj_num = project.get("project_num")
-        core_num = extract_core_project_num(proj_num)
-        project["core_project_num"] = core_num
-
-        # Create project_num_clip (remove leading digit if present)
-        if proj_num and len(proj_num) > 0 and proj_num[0].isdigit():
-            clip = proj_num[1:]
-        else:
-            clip = proj_num
-
-        new_project_entry = {"project_num_clip": clip}
-        new_project_entry.update(project)
+    # Columnar table in by-PI order; va_projects_by_pi.json is written from it
+    print(f"Processing records from {raw_file}...")
+    table = ProjectTable.from_raw(iter_raw(raw_file), extract_core_project_num)
 
-        if pi_name not in projects_by_pi:
-            projects_by_pi[pi_name] = {}
-        if core_num not in projects_by_pi[pi_name]:
-            projects_by_pi[pi_name][core_num] = []
-        projects_by_pi[pi_name][core_num].append(new_project_entry)
+    table.write_by_pi(FILE_BY_PI)
+    table.save(FILE_TABLE)  # after the JSON, so the table is not mistaken for an older one
+    grants = table.core_grants()
+    save_core_grants(FILE_CORE_GRANTS, grants)
 
-    # Sort each CoreNum's list by project_num_clip ascending
-    for pi in projects_by_pi:
-        for core_num in projects_by_pi[pi]:
-            projects_by_pi[pi][core_num].sort(key=lambda x: x.get("project_num_clip") or "")
-
-    with open(FILE_BY_PI, "w") as f:
-        json.dump(projects_by_pi, f, indent=2)
-
-    print(f"Reorganized data for {len(projects_by_pi)} PIs.")
-    print(f"Saved to {FILE_BY_PI}")
+    print(f"Reorganized {len(table)} records for {len(table.pi_names)} PIs.")
+    print(f"Saved to {FILE_BY_PI} (columnar table: {FILE_TABLE})")
+    print(f"Summarized {sum(len(cores) for cores in grants.values())} core grants in {FILE_CORE_GRANTS}")
 
 
 # ── Step 3: Scrape VA website ────────────────────────────────────────────────
@@ -175,12 +197,8 @@ def step_scrape(years=5, skip_details=False):
                     api_project_nums.add(pnum)
     print(f"Found {len(api_project_nums)} unique project numbers from API data")
 
-    # Load existing cache
-    va_details = {}
-    if os.path.exists(FILE_VA_DETAILS):
-        print(f"Found existing {FILE_VA_DETAILS}, loading cache...")
-        with open(FILE_VA_DETAILS, "r") as f:
-            va_details = json.load(f)
+    # Load existing cache plus any records journaled by an interrupted run
+    va_details, journal = load_journaled(FILE_VA_DETAILS)
 
     # Build year list
     current_year = datetime.datetime.now().year
@@ -261,31 +279,54 @@ def step_scrape(years=5, skip_details=False):
         }
         if detail:
             va_details[proj_num].update(detail)
+        journal.append(proj_num, va_details[proj_num])
 
         # Checkpoint every 10 records
         if count % 10 == 0:
-            with open(FILE_VA_DETAILS, "w") as f:
-                json.dump(va_details, f, indent=2)
+            journal.checkpoint()
             print(f"    (Checkpoint: saved {count} records)")
 
-        time.sleep(1)
-
-    with open(FILE_VA_DETAILS, "w") as f:
-        json.dump(va_details, f, indent=2)
+    journal.compact(va_details)
     print(f"Saved {len(va_details)} project details to {FILE_VA_DETAILS}")
 
 
 # ── Step 4: Join ─────────────────────────────────────────────────────────────
 
-def step_join():
+def _contact_pi(project):
+    """The contact PI entry of a project's principal_investigators, or None."""
+    for pi_entry in project.get("principal_investigators") or []:
+        if pi_entry.get("is_contact_pi"):
+            return pi_entry
+    return None
+
+
+def _first_rows(table, va_details):
+    """
+    First row that gets each column added by the join, for the CSV schema:
+    pi_title / pi_profile_id from the first record with a contact PI, the
+    scraped columns from the first record with scraped details. Columns no
+    record gets are left out, as pd.json_normalize did.
+    """
+    first = {}
+    contact_rows = (row for row in range(len(table)) if _contact_pi(table.record(row)) is not None)
+    row = next(contact_rows, None)
+    if row is not None:
+        first.update({"pi_title": row, "pi_profile_id": row})
+    matched_rows = (row for row in range(len(table)) if (table.get(row, "project_num") or None) in va_details)
+    row = next(matched_rows, None)
+    if row is not None:
+        first.update(dict.fromkeys(VA_JOIN_FIELDS, row))
+    return first
+
+
+def step_join(compress=False):
     """Join API data with scraped VA details into final output."""
     print(f"--- [Step 4] Joining Data ---")
     if not os.path.exists(FILE_BY_PI):
         print(f"Error: {FILE_BY_PI} not found. Run --reorganize first.")
         return
 
-    with open(FILE_BY_PI, "r") as f:
-        projects_by_pi = json.load(f)
+    table = load_project_table(FILE_TABLE, FILE_BY_PI)
 
     # VA details are optional
     va_details = {}
@@ -296,51 +337,37 @@ def step_join():
     else:
         print(f"Warning: {FILE_VA_DETAILS} not found. Proceeding without scraped data.")
 
-    final_data = []
+    # Each record gets its contact PI's title and profile ID, then the scraped details when
+    # there are any for its project_num, and is streamed to both outputs; principal_investigators
+    # does not flatten well, so it stays out of the CSV
+    first_rows = _first_rows(table, va_details)
+    columns = table.flat_columns(added=list(first_rows), drop=CSV_DROP, first_rows=first_rows)
     matched_count = 0
+    with JoinWriter(FILE_FINAL, FILE_FINAL_CSV, columns, compress=compress) as writer:
+        for pi_name, groups in table.iter_pis():
+            for core_num, start, stop in groups:
+                for row in range(start, stop):
+                    enriched = table.record(row)  # a fresh dict, so it is enriched in place
 
-    for pi_name, core_groups in projects_by_pi.items():
-        for core_num, projects in core_groups.items():
-            for project in projects:
-                enriched = project.copy()
-
-                # Extract PI title and profile_id from principal_investigators
-                pis = project.get("principal_investigators") or []
-                for pi_entry in pis:
-                    if pi_entry.get("is_contact_pi"):
-                        enriched["pi_title"] = pi_entry.get("title")
-                        enriched["pi_profile_id"] = pi_entry.get("profile_id")
-                        break
-
-                # Merge scraped details
-                proj_num = project.get("project_num")
-                if proj_num and proj_num in va_details:
-                    detail = va_details[proj_num]
-                    enriched["total_award_amount"] = detail.get("total_award_amount")
-                    enriched["project_period"] = detail.get("project_period")
-                    enriched["va_location"] = detail.get("location")
-                    enriched["congressional_district"] = detail.get("congressional_district")
-                    enriched["portfolio"] = detail.get("portfolio")
-                    enriched["research_service"] = detail.get("research_service")
-                    matched_count += 1
-
-                final_data.append(enriched)
-
-    with open(FILE_FINAL, "w") as f:
-        json.dump(final_data, f, indent=2)
-    print(f"Saved final JSON to {FILE_FINAL}")
-    print(f"  Total records: {len(final_data)}, with scraped details: {matched_count}")
+                    # Extract PI title and profile_id from principal_investigators
+                    contact = _contact_pi(enriched)
+                    if contact is not None:
+                        enriched["pi_title"] = contact.get("title")
+                        enriched["pi_profile_id"] = contact.get("profile_id")
 
-    try:
-        df = pd.json_normalize(final_data)
-        # Drop nested columns that don't flatten well in CSV
-        for col in ["principal_investigators"]:
-            if col in df.columns:
-                df = df.drop(columns=[col])
-        df.to_csv(FILE_FINAL_CSV, index=False)
-        print(f"Saved final CSV to {FILE_FINAL_CSV}")
-    except Exception as e:
-        print(f"Error saving CSV: {e}")
+                    # Merge scraped details
+                    proj_num = enriched.get("project_num")
+                    if proj_num and proj_num in va_details:
+                        detail = va_details[proj_num]
+                        for column, key in VA_JOIN_FIELDS.items():
+                            enriched[column] = detail.get(key)
+                        matched_count += 1
+
+                    writer.write(enriched, csv_drop=CSV_DROP)
+
+    print(f"Saved final JSON to {writer.json_path}")
+    print(f"  Total records: {writer.count}, with scraped details: {matched_count}")
+    print(f"Saved final CSV to {writer.csv_path} ({len(columns)} columns)")
 
 
 # ── Step 5: Pack for Runway ──────────────────────────────────────────────────
@@ -352,8 +379,8 @@ def step_pack():
         print(f"Error: {FILE_BY_PI} not found. Run --reorganize first.")
         return
 
-    with open(FILE_BY_PI, "r") as f:
-        projects_by_pi = json.load(f)
+    table = load_project_table(FILE_TABLE, FILE_BY_PI)
+    grants = load_core_grants(FILE_CORE_GRANTS, FILE_BY_PI, table)
 
     # Load scraped details if available (for location, total award, etc.)
     va_details = {}
@@ -381,6 +408,9 @@ def step_pack():
                 "core_project_num": {"type": "string", "title": "Core Project Number"},
                 "award_amount": {"type": "number", "title": "Award Amount (FY)"},
                 "total_award_amount": {"type": "number", "title": "Total Award Amount"},
+                "cumulative_award_amount": {"type": "number", "title": "Cumulative Award Amount (RePORTER)"},
+                "first_fiscal_year": {"type": "number", "title": "First Fiscal Year"},
+                "last_fiscal_year": {"type": "number", "title": "Last Fiscal Year"},
                 "funding_agency": {"type": "string", "title": "Funding Agency"},
                 "portfolio": {"type": "string", "title": "Portfolio"},
                 "research_service": {"type": "string", "title": "Research Service"},
@@ -402,20 +432,14 @@ def step_pack():
     # Map PI name -> profile_id
     pi_profile_map = {}
 
-    for pi_name, core_groups in projects_by_pi.items():
+    for pi_name, core_grants in grants.items():
         if pi_name == "Unknown":
             continue
+        summaries = list(core_grants.values())
+        pi_start, pi_stop = summaries[0]["rows"][0], summaries[-1]["rows"][1]  # the PI's rows, in by-PI order
 
         # Determine site from org_city/org_state (from first project)
-        first_proj = None
-        for core_num, proj_list in core_groups.items():
-            if proj_list:
-                first_proj = proj_list[0]
-                break
-        if not first_proj:
-            continue
-
-        org = first_proj.get("organization") or {}
+        org = table.get(pi_start, "organization") or {}
         org_city = (org.get("org_city") or "").strip()
         org_state = (org.get("org_state") or "").strip()
         # Title-case the city but keep state abbreviation uppercase
@@ -436,7 +460,7 @@ def step_pack():
         pi_email_map[pi_name] = email
 
         # Get profile_id
-        profile_id = _get_profile_id_for_pi(pi_name, projects_by_pi)
+        profile_id = _get_profile_id_for_pi(table, pi_start, pi_stop)
         if profile_id:
             pi_profile_map[pi_name] = profile_id
 
@@ -444,13 +468,10 @@ def step_pack():
 
         # Get rank from principal_investigators
         rank = None
-        for core_num, proj_list in core_groups.items():
-            for proj in proj_list:
-                for pi_entry in proj.get("principal_investigators") or []:
-                    if pi_entry.get("is_contact_pi") and pi_entry.get("title"):
-                        rank = pi_entry["title"]
-                        break
-                if rank:
+        for row in range(pi_start, pi_stop):
+            for pi_entry in table.get(row, "principal_investigators") or []:
+                if pi_entry.get("is_contact_pi") and pi_entry.get("title"):
+                    rank = pi_entry["title"]
                     break
             if rank:
                 break
@@ -469,24 +490,21 @@ def step_pack():
             user_entry["attributes"]["general.nih_investigator_id"] = profile_id
         users.append(user_entry)
 
-        # Add projects - take most recent fiscal year record per core grant
-        for core_num, proj_list in core_groups.items():
-            proj_list_sorted = sorted(proj_list, key=lambda p: p.get("fiscal_year", 0), reverse=True)
-            proj = proj_list_sorted[0]
-
-            title = proj.get("project_title") or proj.get("title") or f"Grant {core_num}"
-
-            # Format dates
-            start = (proj.get("project_start_date") or "")[:10]
-            end = (proj.get("project_end_date") or "")[:10]
-            budget_start = (proj.get("budget_start") or "")[:10]
-            budget_end = (proj.get("budget_end") or "")[:10]
+        # Add projects - one per core grant, from its summary and most recent fiscal year record
+        for core_num, grant in core_grants.items():
+            row = grant["latest_row"]
+            title = grant["title"]
+            start = grant["project_start_date"]
+            end = grant["project_end_date"]
+            budget_start = grant["budget_start"]
+            budget_end = grant["budget_end"]
 
-            abstract = (proj.get("abstract_text") or "").strip()
+            abstract = (table.get(row, "abstract_text") or "").strip()
+            investigators = table.get(row, "principal_investigators") or []
 
             # Build co-PI list
             co_pis = []
-            for pi_entry in proj.get("principal_investigators") or []:
+            for pi_entry in investigators:
                 if pi_entry.get("is_contact_pi"):
                     continue
                 copi_last = pi_entry.get("last_name", "").strip().upper()
@@ -511,7 +529,7 @@ def step_pack():
                     copi_first_title = copi_first_title.split()[0] if copi_first_title.split() else copi_first_title
 
                     # Co-PI might be at a different site; use project's site as default
-                    copi_profile_id = _get_copi_profile_id(copi_name, proj)
+                    copi_profile_id = _get_copi_profile_id(copi_name, investigators)
                     copi_user = {
                         "email": copi_email,
                         "first_name": copi_first_title,
@@ -530,7 +548,7 @@ def step_pack():
                 co_pis.append(copi_email)
 
             # Merge scraped details
-            proj_num = proj.get("project_num")
+            proj_num = grant["project_num"]
             scraped = va_details.get(proj_num, {}) if proj_num else {}
 
             project_entry = {
@@ -540,12 +558,15 @@ def step_pack():
                 "status": "current",
                 "unit_path": unit_path,
                 "attributes": {
-                    "grant_info.award_number": proj.get("project_num", ""),
+                    "grant_info.award_number": grant["project_num"],
                     "grant_info.core_project_num": core_num,
-                    "grant_info.award_amount": proj.get("award_amount"),
+                    "grant_info.award_amount": grant["award_amount"],
                     "grant_info.funding_agency": "VA",
                 }
             }
+            for field in ("cumulative_award_amount", "first_fiscal_year", "last_fiscal_year"):
+                if grant[field] is not None:
+                    project_entry["attributes"][f"grant_info.{field}"] = grant[field]
             # Total award from scraping
             total_award = scraped.get("total_award_amount")
             if total_award:
@@ -620,6 +641,10 @@ def main():
     parser.add_argument("--projects", action="store_true", help="Fetch VA grants from NIH RePORTER")
     parser.add_argument("--years", type=int, default=5, help="Number of years to fetch (default 5)")
     parser.add_argument("--org", type=str, default=None, help="Filter by organization name (e.g. 'MINNEAPOLIS VA MEDICAL CENTER')")
+    parser.add_argument("--incremental", action="store_true", help="Re-query only fiscal years that changed since the last fetch; always goes to RePORTER, bypassing the response cache (used with --projects)")
+    parser.add_argument("--gzip", action="store_true", help="Write the raw NDJSON store (--projects) and the final JSON/CSV (--join) gzip-compressed")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk RePORTER response cache (used with --projects)")
+    parser.add_argument("--cache-only", action="store_true", help="Replay cached RePORTER responses without network access (used with --projects)")
     parser.add_argument("--reorganize", action="store_true", help="Organize grants by PI")
     parser.add_argument("--scrape", action="store_true", help="Scrape VA website for supplemental details")
     parser.add_argument("--skip-details", action="store_true", help="Skip detail page scraping (listing data only)")
@@ -627,9 +652,13 @@ def main():
     parser.add_argument("--pack", action="store_true", help="Pack for Runway import")
 
     args = parser.parse_args()
+    if args.incremental and args.cache_only:
+        parser.error("--incremental probes RePORTER for fresh totals and cannot be combined with --cache-only")
 
     if args.projects:
-        step_projects(years=args.years, org_name=args.org)
+        step_projects(years=args.years, org_name=args.org,
+                      use_cache=not args.no_cache, cache_only=args.cache_only,
+                      incremental=args.incremental, compress=args.gzip)
 
     if args.reorganize:
         step_reorganize()
@@ -638,7 +667,7 @@ def main():
         step_scrape(years=args.years, skip_details=args.skip_details)
 
     if args.join:
-        step_join()
+        step_join(compress=args.gzip)
 
     if args.pack:
         step_pack()
@@ -0,0 +1,139 @@
+"""
+Offline ORCID index built from the ORCID public data file.
+
+build_index() streams the summaries archive (a .tar.gz of one v3.0 record
+summary XML per ORCID iD, or an extracted directory of them) member by
+member, never holding more than one record in memory. Records that do not
+mention the target organization are skipped without parsing; for the rest
+the first current employment at the organization is kept. The result is a
+compact gzip NDJSON file that OrcidIndex loads into a name-keyed dict, so
+get_pi_details(..., index=...) answers without touching the API.
+"""
+import os
+import tarfile
+import xml.etree.ElementTree as ET
+from raw_store import RawStoreWriter, iter_raw
+
+DEFAULT_ORG = "University of Minnesota"
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child(element, name):
+    for child in element:
+        if _local(child.tag) == name:
+            return child
+    return None
+
+
+def _text(element, *path):
+    for name in path:
+        if element is None:
+            return None
+        element = _child(element, name)
+    return element.text.strip() if element is not None and element.text else None
+
+
+def parse_summary(data, org_name=DEFAULT_ORG):
+    """
+    Parse one record summary XML (bytes). Returns an index record
+    {orcid_id, family_name, given_names, rank, department, organization}
+    for a current employment at org_name, or None.
+    """
+    root = ET.fromstring(data)
+    orcid_id = _text(root, "orcid-identifier", "path")
+    name = _child(_child(root, "person"), "name") if _child(root, "person") is not None else None
+    family_name = _text(name, "family-name")
+    given_names = _text(name, "given-names")
+    if not (orcid_id and family_name and given_names):
+        return None
+
+    for element in root.iter():
+        if _local(element.tag) != "employment-summary":
+            continue
+        if _child(element, "end-date") is not None:
+            continue  # only current employment
+        organization = _text(element, "organization", "name") or ""
+        # Loose matching for organization, as in get_employment_details
+        if org_name.lower() in organization.lower():
+            return {
+                "orcid_id": orcid_id,
+                "family_name": family_name,
+                "given_names": given_names,
+                "rank": _text(element, "role-title"),
+                "department": _text(element, "department-name"),
+                "organization": organization,
+            }
+    return None
+
+
+def _iter_summaries(archive_path):
+    """Yield the raw bytes of every record summary XML in a .tar(.gz) archive or directory."""
+    if os.path.isdir(archive_path):
+        for dirpath, _, filenames in os.walk(archive_path):
+            for filename in sorted(filenames):
+                if filename.endswith(".xml"):
+                    with open(os.path.join(dirpath, filename), "rb") as f:
+                        yield f.read()
+        return
+    # "r|*" reads the archive as a stream: no random access, no member list kept in memory
+    with tarfile.open(archive_path, "r|*") as archive:
+        for member in archive:
+            if member.isfile() and member.name.endswith(".xml"):
+                yield archive.extractfile(member).read()
+
+
+def build_index(archive_path, out_path, org_name=DEFAULT_ORG):
+    """Stream `archive_path` into an index of current `org_name` employees. Returns (records scanned, records kept)."""
+    needle = org_name.lower().encode("utf-8")
+    scanned = 0
+    with RawStoreWriter(out_path) as writer:
+        for data in _iter_summaries(archive_path):
+            scanned += 1
+            if scanned % 100000 == 0:
+                print(f"  ... scanned {scanned} records, kept {writer.count}")
+            if needle not in data.lower():
+                continue  # cheap pre-filter before XML parsing
+            try:
+                record = parse_summary(data, org_name)
+            except ET.ParseError as e:
+                print(f"  Skipping unparsable record: {e}")
+                continue
+            if record:
+                writer.write([record])
+    return scanned, writer.count
+
+
+def name_keys(family_name, given_names):
+    """Index keys for a person: (family name, each given-name token), case-folded, trailing periods dropped."""
+    family = family_name.lower()
+    return {(family, token.rstrip(".").lower()) for token in given_names.split() if token.rstrip(".")}
+
+
+class OrcidIndex:
+    """Name-keyed lookup over an index file written by build_index()."""
+
+    def __init__(self, path):
+        self.path = path
+        self.by_name = {}  # (family, given token) -> [record] in archive order
+        self.size = 0
+        for record in iter_raw(path):
+            self.size += 1
+            for key in name_keys(record["family_name"], record["given_names"]):
+                self.by_name.setdefault(key, []).append(record)
+
+    def lookup(self, last_name, first_name):
+        """First indexed person matching the name (as the ORCID search would), as a get_pi_details result."""
+        matches = self.by_name.get((last_name.lower(), first_name.rstrip(".").lower()))
+        if not matches:
+            return None
+        record = matches[0]
+        return {
+            "orcid_id": record["orcid_id"],
+            "rank": record["rank"],
+            "department": record["department"],
+            "organization": record["organization"],
+            "source": "ORCID (public data file)",
+        }
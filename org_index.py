@@ -0,0 +1,92 @@
+"""
+Flattened, precomputed index of the UMN organizational structure.
+
+UMN_STRUCTURE is walked once per process (org_index()) into integer node
+IDs: names, parent and depth arrays, name-sorted child lists, a
+path -> node ID map and a department -> schools reverse map. The index is
+immutable (tuples and read-only mappings), so the structure builders and
+the pack step can share one instance, and validating a unit path is a
+single dict lookup instead of a descent through nested dicts.
+"""
+from functools import lru_cache
+from types import MappingProxyType
+from umn_structure import UMN_STRUCTURE
+
+LEVELS = ("University", "Campus", "College/School", "Department", "Division")
+
+
+class OrgIndex:
+    def __init__(self, structure=UMN_STRUCTURE):
+        names, parents, depths, children = [], [], [], []
+        path_ids = {}
+        dept_schools = {}
+
+        def add(name, parent, path):
+            node_id = len(names)
+            names.append(name)
+            parents.append(parent)
+            depths.append(len(path) - 1)
+            children.append([])
+            path_ids[path] = node_id
+            if parent >= 0:
+                children[parent].append(node_id)
+            return node_id
+
+        self.roots = []
+        for uni_name, uni_data in structure.items():
+            uni_id = add(uni_name, -1, (uni_name,))
+            self.roots.append(uni_id)
+            for campus_name, campus_data in uni_data.items():
+                campus_path = (uni_name, campus_name)
+                campus_id = add(campus_name, uni_id, campus_path)
+                for school_name, dept_dict in campus_data.items():
+                    school_path = campus_path + (school_name,)
+                    school_id = add(school_name, campus_id, school_path)
+                    for dept_name, divisions in dept_dict.items():
+                        dept_path = school_path + (dept_name,)
+                        dept_id = add(dept_name, school_id, dept_path)
+                        dept_schools.setdefault(dept_name, []).append(school_name)
+                        for division in divisions:
+                            add(division, dept_id, dept_path + (division,))
+
+        self.roots = tuple(self.roots)
+        self.names = tuple(names)
+        self.parents = tuple(parents)
+        self.depths = tuple(depths)
+        self.children = tuple(tuple(sorted(ids, key=lambda i: names[i])) for ids in children)
+        self.path_ids = MappingProxyType(path_ids)
+        self.dept_schools = MappingProxyType({dept: tuple(sorted(schools)) for dept, schools in dept_schools.items()})
+
+    def __len__(self):
+        return len(self.names)
+
+    def path(self, node_id):
+        """Full name path from the university down to node_id."""
+        path = []
+        while node_id >= 0:
+            path.append(self.names[node_id])
+            node_id = self.parents[node_id]
+        return tuple(reversed(path))
+
+    def unit_id(self, unit_path, root=None):
+        """Node ID of a unit path given below the university (e.g. ["UMN Twin Cities", school, dept]), or None."""
+        root = self.roots[0] if root is None else root
+        return self.path_ids.get((self.names[root],) + tuple(unit_path))
+
+    def is_unit_path(self, unit_path):
+        return self.unit_id(unit_path) is not None
+
+    def to_nested(self, node_id, leaf=list):
+        """
+        Nested dict of the subtree below node_id with name-sorted keys, down
+        to departments, each department mapping to leaf(sorted division names).
+        """
+        if self.depths[node_id] == LEVELS.index("Department"):
+            return leaf([self.names[c] for c in self.children[node_id]])
+        return {self.names[c]: self.to_nested(c, leaf) for c in self.children[node_id]}
+
+
+@lru_cache(maxsize=None)
+def org_index():
+    """The process-wide index of UMN_STRUCTURE, built on first use."""
+    return OrgIndex()
@@ -0,0 +1,416 @@
+"""
+Columnar in-memory project table shared by --reorganize, --join and --pack.
+
+One pandas object column per record field (equal values stored once) plus
+categorical PI, core-number and fiscal-year codes, with rows in by-PI order
+so every PI and (PI, core) group is a contiguous row range. --reorganize
+builds it from the raw store and saves it, along with a per-core-grant
+summary index (core_grants()) for --pack; --join merges it with the PI
+details a chunk of rows at a time.
+"""
+import json
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+
+JOIN_CHUNK_ROWS = 2000
+SCALAR_KINDS = {"string", "integer", "floating", "mixed-integer-float", "boolean", "empty"}
+PI_KEY = "__pi__"  # merge key column for joins on the PI name
+
+
+class _Missing:
+    """Marks a field absent from a record (as opposed to present and null)."""
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __reduce__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+def reorganized_entry(project, extract_core_project_num):
+    """
+    The --reorganize form of a raw record: ("PI Name", core number, entry)
+    with project_num_clip first and core_project_num added.
+    """
+    pi_name = project.get("contact_pi_name")
+    if not pi_name:
+        pi_name = "Unknown"
+
+    # Extract Core Number
+    proj_num = project.get("project_num")
+    core_num = extract_core_project_num(proj_num)
+    project["core_project_num"] = core_num
+
+    # Create project_num_clip (remove first digit if present)
+    if proj_num and len(proj_num) > 0 and proj_num[0].isdigit():
+        clip = proj_num[1:]
+    else:
+        clip = proj_num
+
+    entry = {"project_num_clip": clip}
+    entry.update(project)
+    return pi_name, core_num, entry
+
+
+class _ColumnBuilder:
+    """
+    Appends records field by field, padding absent fields with MISSING.
+    Equal values are stored once: a grant's title, abstract and investigator
+    list repeat in every fiscal year's record. Each record's own key order is
+    kept as a layout code (records from one API mostly share a handful).
+    """
+
+    def __init__(self):
+        self.columns = {}  # field -> list of values, in first-seen field order
+        self.pis = []
+        self.cores = []
+        self.layouts = {}  # tuple of a record's keys, in its order -> layout code
+        self.layout_codes = []
+        self._shared = {}  # value (or repr of a list/dict) -> the one stored copy
+
+    def _share(self, value):
+        """
+        The one stored copy of value. Records come from JSON, so a list or
+        dict holds only str/int/float/bool/None/list/dict and its repr() is
+        equal exactly when the values (and their key order) are; 1 and 1.0 or
+        True and 1 keep different reprs. Shared copies are never mutated:
+        record() hands them out as is and callers only add top-level keys.
+        """
+        if isinstance(value, str):
+            return self._shared.setdefault(value, value)
+        if isinstance(value, (list, dict)) and value:
+            return self._shared.setdefault((type(value), repr(value)), value)
+        return value
+
+    def add(self, pi_name, core_num, entry):
+        n = len(self.pis)
+        for key, value in entry.items():
+            value = self._share(value)
+            column = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = [MISSING] * n
+            column.append(value)
+        self.pis.append(pi_name)
+        self.cores.append(core_num)
+        self.layout_codes.append(self.layouts.setdefault(tuple(entry), len(self.layouts)))
+        for column in self.columns.values():
+            if len(column) == n:
+                column.append(MISSING)
+
+    def build(self):
+        return ProjectTable.from_columns(self.columns, self.pis, self.cores, list(self.layouts), self.layout_codes)
+
+
+class ProjectTable:
+    def __init__(self, frame, codes, layouts):
+        self.frame = frame  # one object column per record field, rows in by-PI order
+        self.codes = codes  # categorical "pi", "core" and "fiscal_year" columns and the "layout" code, same rows
+        self.layouts = layouts  # layout code -> the record's field names, in the record's own order
+        self.fields = list(frame.columns)
+        self._values = [frame[field].to_numpy() for field in self.fields]
+        self._index = {field: i for i, field in enumerate(self.fields)}
+        self._layout_fields = [[self._index[field] for field in layout] for layout in layouts]
+        self.layout_codes = codes["layout"].to_numpy()
+
+        pi_codes = codes["pi"].cat.codes.to_numpy()
+        core_codes = codes["core"].cat.codes.to_numpy()
+        n = len(frame)
+        pi_change = np.r_[True, pi_codes[1:] != pi_codes[:-1]] if n else np.zeros(0, dtype=bool)
+        group_change = pi_change | np.r_[True, core_codes[1:] != core_codes[:-1]] if n else pi_change
+        self.pi_offsets = np.r_[np.flatnonzero(pi_change), n]  # PI p owns rows [pi_offsets[p], pi_offsets[p+1])
+        self.group_offsets = np.r_[np.flatnonzero(group_change), n]  # same for each (PI, core) group
+        self.pi_group_offsets = np.searchsorted(self.group_offsets, self.pi_offsets)  # PI p owns groups [..p], [..p+1])
+        self.pi_names = list(codes["pi"].cat.categories[pi_codes[self.pi_offsets[:-1]]])
+        self.group_cores = list(codes["core"].cat.categories[core_codes[self.group_offsets[:-1]]])
+        # Latest-record selection compares fiscal years through their ordered category codes
+        self.fiscal_year_codes = codes["fiscal_year"].cat.codes.to_numpy()
+
+    def __len__(self):
+        return len(self.frame)
+
+    @classmethod
+    def from_raw(cls, records, extract_core_project_num):
+        """Build the table from raw RePORTER records in one streaming pass."""
+        builder = _ColumnBuilder()
+        for project in records:
+            builder.add(*reorganized_entry(project, extract_core_project_num))
+        return builder.build()
+
+    @classmethod
+    def from_by_pi(cls, projects_by_pi):
+        """Build the table from an already reorganized {pi: {core: [entry, ...]}} dict."""
+        builder = _ColumnBuilder()
+        for pi_name, core_groups in projects_by_pi.items():
+            for core_num, projects in core_groups.items():
+                for entry in projects:
+                    builder.add(pi_name, core_num, entry)
+        return builder.build()
+
+    @classmethod
+    def from_columns(cls, columns, pis, cores, layouts, layout_codes):
+        n = len(pis)
+        # Factorize in first-seen order: PI codes follow first appearance, and
+        # (PI, core) group codes follow first appearance of the pair
+        pi_codes, pi_names = pd.factorize(pd.Series(pis, dtype=object))
+        core_codes, core_names = pd.factorize(pd.Series(cores, dtype=object), use_na_sentinel=False)
+        group_codes, _ = pd.factorize(pd.Series(pi_codes.astype(np.int64) * max(len(core_names), 1) + core_codes))
+        clip = columns.get("project_num_clip", [None] * n)
+        clip_ranks, _ = pd.factorize(pd.Series([c if isinstance(c, str) else "" for c in clip], dtype=object), sort=True)
+        order = np.lexsort((clip_ranks, group_codes, pi_codes))  # stable, like list.sort()
+
+        frame = pd.DataFrame({field: pd.Series(values, dtype=object).take(order).reset_index(drop=True)
+                              for field, values in columns.items()})
+        years = pd.Series(columns.get("fiscal_year", [None] * n), dtype=object).take(order)
+        years = pd.to_numeric(years.where(years.map(lambda v: v is not MISSING)), errors="coerce")
+        codes = pd.DataFrame({
+            "pi": pd.Categorical.from_codes(pi_codes[order], categories=pi_names),
+            "core": pd.Categorical.from_codes(core_codes[order], categories=pd.Index(core_names, dtype=object)),
+            "fiscal_year": pd.Categorical(years.reset_index(drop=True), ordered=True),
+            "layout": np.asarray(layout_codes, dtype=np.int32).reshape(-1)[order],
+        })
+        return cls(frame, codes, layouts)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump({"frame": self.frame, "codes": self.codes, "layouts": self.layouts}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved table; returns None for a table saved without record layouts (rebuild it instead)."""
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if "layouts" not in data:
+            return None
+        return cls(data["frame"], data["codes"], data["layouts"])
+
+    def record(self, row):
+        """Row as the reorganized project dict, keys in the record's own order (values are shared with the table)."""
+        return {self.fields[i]: self._values[i][row] for i in self._layout_fields[self.layout_codes[row]]}
+
+    def get(self, row, field, default=None):
+        """One field of one row, without building the record."""
+        if field not in self._index:
+            return default
+        value = self._values[self._index[field]][row]
+        return default if value is MISSING else value
+
+    def iter_pis(self):
+        """Yield (pi_name, [(core_num, start_row, stop_row), ...]) in by-PI order."""
+        group_offsets = self.group_offsets.tolist()
+        pi_group_offsets = self.pi_group_offsets.tolist()
+        for p, pi_name in enumerate(self.pi_names):
+            yield pi_name, [(self.group_cores[g], group_offsets[g], group_offsets[g + 1])
+                            for g in range(pi_group_offsets[p], pi_group_offsets[p + 1])]
+
+    def latest(self, start, stop):
+        """Row with the highest fiscal year in [start, stop); the first such row on ties."""
+        return start + int(np.argmax(self.fiscal_year_codes[start:stop]))
+
+    def iter_joined(self, details, chunk_rows=JOIN_CHUNK_ROWS):
+        """
+        Yield every record (by-PI order, as record() builds it) with the
+        columns of `details`, a frame indexed by PI name, added after its own
+        fields; PIs without details get None. Each chunk of rows is joined
+        with one DataFrame.merge, so only chunk_rows enriched records exist
+        at a time.
+        """
+        details = details.rename_axis(PI_KEY).reset_index()
+        added = [column for column in details.columns if column != PI_KEY]
+        for start in range(0, len(self), chunk_rows):
+            stop = min(start + chunk_rows, len(self))
+            chunk = self.frame.iloc[start:stop].assign(**{PI_KEY: self.codes["pi"].iloc[start:stop].astype(object)})
+            merged = chunk.merge(details, on=PI_KEY, how="left", sort=False)
+            merged[added] = merged[added].astype(object).where(merged[added].notna(), None)
+            values = [merged[field].to_numpy() for field in self.fields]
+            added_values = [merged[column].to_numpy() for column in added]
+            for i, code in enumerate(self.layout_codes[start:stop].tolist()):
+                record = {self.fields[j]: values[j][i] for j in self._layout_fields[code]}
+                for column, column_values in zip(added, added_values):
+                    record[column] = column_values[i]
+                yield record
+
+    def flat_columns(self, added=(), drop=(), first_rows=None):
+        """
+        Fixed CSV schema for records joined with the `added` columns, in
+        pd.json_normalize order: dict-valued fields become "field.key" columns
+        after the record's plain fields, and columns are ordered by the first
+        record that has them. `added` columns go after the record's own
+        fields and count as present in every record, or from the row given
+        in `first_rows` on. Fields in `drop` and their nested columns are
+        left out.
+        """
+        # Computed from the columns rather than by pd.json_normalize over every joined record, which
+        # would hold the whole output in memory. It relies on how pandas (2.x, _normalise_json_ordered)
+        # orders columns: by the first record that has them; within a record, its non-dict fields in
+        # record order, then each dict field's leaves depth-first as "field.key.subkey", with empty
+        # dicts giving no column. _flat_keys walks the leaves the same way, and join_output flattens
+        # each row to the same names.
+        # Where each field sits in each layout, to order columns first seen in the same record
+        positions = [{field: pos for pos, field in enumerate(layout)} for layout in self.layouts]
+        layout_codes = self.layout_codes
+        columns = []  # (first row, is nested, position in that record, position within the field, name)
+        for field, values in zip(self.fields, self._values):
+            if field in drop:
+                continue
+            is_dict = _is_dict(values)
+            plain = ~is_dict & ~_is_missing(values)
+            if plain.any():
+                row = int(np.argmax(plain))
+                columns.append((row, False, positions[layout_codes[row]][field], 0, field))
+            first_keys = {}
+            for row in np.flatnonzero(is_dict).tolist():
+                for key in _flat_keys(values[row], field):
+                    first_keys.setdefault(key, row)
+            columns.extend((row, True, positions[layout_codes[row]][field], i, key)
+                           for i, (key, row) in enumerate(first_keys.items()))
+        first_rows = first_rows or {}
+        columns.extend((first_rows.get(column, 0), False, len(self.fields) + i, 0, column)
+                       for i, column in enumerate(added))
+        return [column[4] for column in sorted(columns)]
+
+    def core_grants(self):
+        """
+        Summary of every core grant as {pi: {core: summary}} in by-PI order;
+        see the module docstring. Award amounts of records in the same fiscal
+        year (e.g. supplements) are added up; records without a fiscal year
+        or amount are left out of the per-year figures.
+        """
+        n = len(self)
+        starts = self.group_offsets[:-1]
+        sizes = np.diff(self.group_offsets)
+        group_ids = np.repeat(np.arange(len(starts)), sizes)
+        rows = np.arange(n)
+        # Latest row per group: the first row holding the group's highest fiscal-year code, as latest() picks it
+        best = np.maximum.reduceat(self.fiscal_year_codes, starts) if n else np.zeros(0, dtype=int)
+        latest_rows = np.minimum.reduceat(np.where(self.fiscal_year_codes == best[group_ids], rows, n), starts) if n else rows
+        years = np.asarray(self.codes["fiscal_year"], dtype=float)
+        first_years = np.fmin.reduceat(years, starts) if n else years
+        last_years = np.fmax.reduceat(years, starts) if n else years
+
+        amounts = self.frame["award_amount"] if "award_amount" in self._index else pd.Series([None] * n, dtype=object)
+        amounts = pd.to_numeric(amounts.where(~_is_missing(amounts.to_numpy())), errors="coerce")
+        by_year = (pd.DataFrame({"group": group_ids, "year": years, "amount": amounts.to_numpy(dtype=float)})
+                   .dropna().groupby(["group", "year"], sort=True)["amount"].sum())
+        running = by_year.groupby(level="group").cumsum()
+        awards = {}
+        for (group, year), amount, total in zip(by_year.index, by_year.to_numpy(), running.to_numpy()):
+            per_group = awards.setdefault(group, ({}, {}))
+            per_group[0][str(int(year))] = _number(amount)
+            per_group[1][str(int(year))] = _number(total)
+
+        grants = {}
+        for g, (pi_code, core_num) in enumerate(zip(np.repeat(np.arange(len(self.pi_names)), np.diff(self.pi_group_offsets)),
+                                                    self.group_cores)):
+            row = int(latest_rows[g])
+            by_fiscal_year, cumulative = awards.get(g, ({}, {}))
+            grants.setdefault(self.pi_names[pi_code], {})[core_num] = {
+                "rows": [int(starts[g]), int(starts[g] + sizes[g])],
+                "latest_row": row,
+                "project_num": self.get(row, "project_num", ""),
+                "title": self.get(row, "project_title") or self.get(row, "title") or f"Grant {core_num}",
+                "project_start_date": (self.get(row, "project_start_date") or "")[:10],
+                "project_end_date": (self.get(row, "project_end_date") or "")[:10],
+                "budget_start": (self.get(row, "budget_start") or "")[:10],
+                "budget_end": (self.get(row, "budget_end") or "")[:10],
+                "award_amount": self.get(row, "award_amount"),
+                "first_fiscal_year": None if np.isnan(first_years[g]) else int(first_years[g]),
+                "last_fiscal_year": None if np.isnan(last_years[g]) else int(last_years[g]),
+                "award_by_fiscal_year": by_fiscal_year,
+                "cumulative_award_by_fiscal_year": cumulative,
+                "cumulative_award_amount": list(cumulative.values())[-1] if cumulative else None,
+            }
+        return grants
+
+    def write_by_pi(self, path):
+        """Write projects_by_pi.json (same bytes as json.dump(..., indent=2)), one PI at a time."""
+        with open(path, "w") as f:
+            f.write("{")
+            for p, (pi_name, groups) in enumerate(self.iter_pis()):
+                core_groups = {core_num: [self.record(row) for row in range(start, stop)]
+                               for core_num, start, stop in groups}
+                body = json.dumps(core_groups, indent=2).replace("\n", "\n  ")
+                f.write(("," if p else "") + "\n  " + json.dumps(pi_name) + ": " + body)
+            f.write("\n}" if self.pi_names else "}")
+
+
+def load_project_table(table_path, by_pi_path):
+    """
+    The table saved by --reorganize, or one rebuilt from projects_by_pi.json
+    when the saved table is missing, older or in an outdated format. Returns
+    None if neither exists.
+    """
+    if os.path.exists(table_path) and (not os.path.exists(by_pi_path)
+                                       or os.path.getmtime(table_path) >= os.path.getmtime(by_pi_path)):
+        table = ProjectTable.load(table_path)
+        if table is not None or not os.path.exists(by_pi_path):
+            return table
+    if not os.path.exists(by_pi_path):
+        return None
+    print(f"  {table_path} missing, older than {by_pi_path} or outdated; rebuilding the project table")
+    with open(by_pi_path, "r") as f:
+        return ProjectTable.from_by_pi(json.load(f))
+
+
+def save_core_grants(path, grants):
+    with open(path, "w") as f:
+        json.dump(grants, f, indent=2)
+
+
+def load_core_grants(index_path, by_pi_path, table):
+    """
+    The core-grant index saved by --reorganize, or table.core_grants() when
+    the index is missing or older than projects_by_pi.json.
+    """
+    if os.path.exists(index_path) and (not os.path.exists(by_pi_path)
+                                       or os.path.getmtime(index_path) >= os.path.getmtime(by_pi_path)):
+        with open(index_path, "r") as f:
+            return json.load(f)
+    print(f"  {index_path} missing or older than {by_pi_path}; summarizing core grants from the project table")
+    return table.core_grants()
+
+
+def _number(value):
+    """A summed award amount as an int when it is whole (amounts are whole dollars)."""
+    return int(value) if float(value).is_integer() else float(value)
+
+
+def details_frame(details, fields):
+    """
+    A {pi name: {detail: value}} mapping as a frame indexed by PI name, one
+    object column per {output column: detail key} entry of `fields`.
+    """
+    frame = pd.DataFrame.from_dict(details, orient="index", dtype=object)
+    frame = frame.reindex(columns=list(fields.values())).set_axis(list(fields), axis=1)
+    return frame.astype(object)
+
+
+def _may_hold(values):
+    """False when pandas infers a plain scalar column, which cannot hold MISSING or dicts."""
+    return pd.api.types.infer_dtype(values, skipna=True) not in SCALAR_KINDS
+
+
+def _is_missing(values):
+    if not _may_hold(values):
+        return np.zeros(len(values), dtype=bool)
+    return np.fromiter((v is MISSING for v in values), dtype=bool, count=len(values))
+
+
+def _is_dict(values):
+    if not _may_hold(values):
+        return np.zeros(len(values), dtype=bool)
+    return np.fromiter((isinstance(v, dict) for v in values), dtype=bool, count=len(values))
+
+
+def _flat_keys(value, prefix):
+    for key, sub in value.items():
+        if isinstance(sub, dict):
+            yield from _flat_keys(sub, f"{prefix}.{key}")
+        else:
+            yield f"{prefix}.{key}"
@@ -0,0 +1,104 @@
+"""
+Adaptive query partitioning for RePORTER's paging ceiling.
+
+projects/search refuses offsets past MAX_OFFSET, so a single query can only
+ever page through MAX_PAGEABLE records. When a query reports a larger
+meta.total, its criteria are split recursively, first by bisecting the
+project_start_date range and then, for a single day that is still too big,
+by org_states, until every partition is fully pageable. Records that no
+partition can reach raise UnreachableRecords, so a fetch never silently
+truncates a year.
+"""
+import datetime
+
+MAX_OFFSET = 14999
+PAGE_LIMIT = 500
+MAX_PAGEABLE = (MAX_OFFSET // PAGE_LIMIT) * PAGE_LIMIT + PAGE_LIMIT  # 15,000 records
+
+DATE_RANGE_START = datetime.date(1950, 1, 1)
+DATE_RANGE_END = datetime.date(datetime.date.today().year + 10, 12, 31)
+
+ORG_STATES = [
+    "AK", "AL", "AR", "AS", "AZ", "CA", "CO", "CT", "DC", "DE", "FL", "FM", "GA", "GU", "HI",
+    "IA", "ID", "IL", "IN", "KS", "KY", "LA", "MA", "MD", "ME", "MH", "MI", "MN", "MO", "MP",
+    "MS", "MT", "NC", "ND", "NE", "NH", "NJ", "NM", "NV", "NY", "OH", "OK", "OR", "PA", "PR",
+    "PW", "RI", "SC", "SD", "TN", "TX", "UT", "VA", "VI", "VT", "WA", "WI", "WV", "WY",
+]
+
+
+class UnreachableRecords(Exception):
+    """Raised when some records of a query cannot be reached by any pageable partition."""
+
+
+def needs_partition(total):
+    return total is not None and total > MAX_PAGEABLE
+
+
+def _with_dates(criteria, start, end):
+    part = dict(criteria)
+    part["project_start_date"] = {"from_date": start.isoformat(), "to_date": end.isoformat()}
+    return part
+
+
+def _split_dates(criteria):
+    """Bisect the project_start_date range into two disjoint halves, or None for a single day."""
+    dates = criteria.get("project_start_date")
+    if dates:
+        start = datetime.date.fromisoformat(dates["from_date"][:10])
+        end = datetime.date.fromisoformat(dates["to_date"][:10])
+    else:
+        start, end = DATE_RANGE_START, DATE_RANGE_END
+    if start >= end:
+        return None
+    mid = datetime.date.fromordinal((start.toordinal() + end.toordinal()) // 2)
+    return [_with_dates(criteria, start, mid),
+            _with_dates(criteria, mid + datetime.timedelta(days=1), end)]
+
+
+def _split_states(criteria):
+    """Split by organization state (one partition per state), or None if already split."""
+    if criteria.get("org_states") and len(criteria["org_states"]) == 1:
+        return None
+    states = criteria.get("org_states") or ORG_STATES
+    return [dict(criteria, org_states=[state]) for state in states]
+
+
+def partition(criteria, total, probe):
+    """
+    Split `criteria` until every partition's meta.total fits in MAX_PAGEABLE.
+
+    Args:
+        criteria: RePORTER criteria dict whose total exceeds the ceiling.
+        total: its meta.total.
+        probe: callable(criteria) -> meta.total.
+
+    Returns:
+        list of (criteria, total) in deterministic order (date ascending),
+        skipping empty partitions.
+
+    Raises:
+        UnreachableRecords if a partition cannot be split further but is
+        still over the ceiling, or the partitions cover fewer records than
+        `total` (e.g. projects without a start date).
+    """
+    if not needs_partition(total):
+        return [(criteria, total)] if total else []
+
+    kind = "project_start_date"
+    parts = _split_dates(criteria)
+    if parts is None:
+        kind = "org_states"
+        parts = _split_states(criteria)
+    if parts is None:
+        raise UnreachableRecords(f"cannot split {criteria} further; "
+                                 f"{total - MAX_PAGEABLE} records are beyond the paging ceiling")
+
+    result = []
+    for part in parts:
+        result.extend(partition(part, probe(part), probe))
+
+    covered = sum(t for _, t in result)
+    if covered < total:
+        # e.g. projects without a start date, or organizations without a US state
+        raise UnreachableRecords(f"{total - covered} records are not reachable by {kind} partitions of {criteria}")
+    return result
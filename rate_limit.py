@@ -0,0 +1,36 @@
+"""
+Thread-safe token-bucket rate limiter shared by concurrent fetch workers
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket allowing `rate` acquisitions per second on average,
+    with bursts of up to `capacity` back-to-back acquisitions.
+    A single instance is shared by every worker hitting the same upstream.
+    """
+
+    def __init__(self, rate=1.0, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
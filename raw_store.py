@@ -0,0 +1,84 @@
+"""
+Append-only NDJSON raw store (optionally gzip-compressed).
+
+The fetch layer streams each RePORTER page into a RawStoreWriter as it
+arrives, and downstream steps read records back one at a time with
+iter_raw(), so peak memory does not grow with the number of years or
+agencies pulled. Legacy projects_raw.json arrays remain readable.
+"""
+import gzip
+import json
+import os
+import threading
+
+
+def raw_path(base, compress=False):
+    """Path of the raw store for `base` (e.g. projects_raw.ndjson[.gz])."""
+    return base + ".gz" if compress else base
+
+
+def find_raw(base, legacy=None):
+    """Return the existing raw store for `base` (gzip first, then plain, then legacy JSON), or None."""
+    for path in (base + ".gz", base, legacy):
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def open_text(path, mode, compress=None, newline=None, compresslevel=9):
+    """Open a UTF-8 text file, through gzip when compress is set (by default: when the path ends in .gz)."""
+    if compress is None:
+        compress = path.endswith(".gz")
+    if compress:
+        return gzip.open(path, mode + "t", compresslevel=compresslevel, encoding="utf-8", newline=newline)
+    return open(path, mode, encoding="utf-8", newline=newline)
+
+
+def iter_raw(path):
+    """Yield raw project records from an NDJSON(.gz) store or a legacy JSON array file."""
+    if path.endswith(".json"):
+        with open(path, "r") as f:
+            yield from json.load(f)
+        return
+    with open_text(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class RawStoreWriter:
+    """
+    Thread-safe NDJSON writer. Records go to a temporary file which replaces
+    `path` only when the `with` block exits cleanly, so a failed fetch leaves
+    the previous raw store untouched.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._tmp_path = f"{path}.tmp"
+        self._lock = threading.Lock()
+        self._file = None
+
+    def __enter__(self):
+        self._file = open_text(self._tmp_path, "w", compress=self.path.endswith(".gz"))
+        return self
+
+    def write(self, records):
+        with self._lock:
+            for record in records:
+                self._file.write(json.dumps(record))
+                self._file.write("\n")
+                self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is not None:
+            os.remove(self._tmp_path)
+            return False
+        os.replace(self._tmp_path, self.path)
+        # Drop the other compression variant so find_raw() never picks a stale copy
+        sibling = self.path[:-3] if self.path.endswith(".gz") else self.path + ".gz"
+        if os.path.exists(sibling):
+            os.remove(sibling)
+        return False
@@ -0,0 +1,87 @@
+"""
+Incremental state for main_ldap.py --refine.
+
+Each refine run records a fingerprint of every pi_overrides.json entry, of
+the DEPT_PATTERNS table, and the raw department string and mapping source
+of every PI (refine_state.json). The next run re-maps only PIs whose inputs
+changed: new PIs, PIs whose LDAP department changed or whose official fields
+are missing, PIs whose PI-level or department-level override entry was
+added, edited or removed, and pattern-mapped PIs when the pattern table
+changed. Department strings are resolved through an in-process LRU memo, so
+PIs sharing a department cost one match.
+"""
+import hashlib
+import json
+import os
+from functools import lru_cache
+from umn_structure import DEPT_PATTERNS, get_school_for_department
+
+MEMO_SIZE = 1024
+OFFICIAL_FIELDS = ("school_official", "department_official", "division_official")
+
+map_department = lru_cache(maxsize=MEMO_SIZE)(get_school_for_department)
+
+
+def fingerprint(obj):
+    """Short, stable content hash of a JSON-serializable value."""
+    data = json.dumps(obj, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def patterns_fingerprint():
+    # Order matters: earlier patterns win
+    return fingerprint(list(DEPT_PATTERNS.items()))
+
+
+def empty_refine_state():
+    return {"patterns": None, "pi_overrides": {}, "department_overrides": {}, "pis": {}}
+
+
+def load_refine_state(path):
+    if not os.path.exists(path):
+        return empty_refine_state()
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_refine_state(path, state):
+    with open(path, "w") as f:
+        json.dump(state, f, indent=2)
+
+
+def build_refine_state(pi_details, pi_overrides, dept_overrides, sources):
+    """State to record after a run; `sources` maps pi_name -> "O", "D" or "P"."""
+    return {
+        "patterns": patterns_fingerprint(),
+        "pi_overrides": {name: fingerprint(entry) for name, entry in pi_overrides.items()},
+        "department_overrides": {dept: fingerprint(entry) for dept, entry in dept_overrides.items()},
+        "pis": {name: {"department": details.get("department"), "source": sources[name]}
+                for name, details in pi_details.items()},
+    }
+
+
+def dirty_pis(pi_details, previous, pi_overrides, dept_overrides):
+    """Returns {pi_name: reason} for every PI that must be re-mapped."""
+    patterns_changed = previous.get("patterns") != patterns_fingerprint()
+    old_pi = previous.get("pi_overrides", {})
+    old_dept = previous.get("department_overrides", {})
+    old_pis = previous.get("pis", {})
+    dirty = {}
+    for pi_name, details in pi_details.items():
+        ldap_dept = details.get("department")
+        old = old_pis.get(pi_name)
+        if old is None:
+            dirty[pi_name] = "new"
+        elif old["department"] != ldap_dept:
+            dirty[pi_name] = "department changed"
+        elif any(field not in details for field in OFFICIAL_FIELDS):
+            dirty[pi_name] = "not refined"
+        elif old_pi.get(pi_name) != (fingerprint(pi_overrides[pi_name]) if pi_name in pi_overrides else None):
+            dirty[pi_name] = "PI override changed"
+        elif pi_name in pi_overrides:
+            continue  # a PI override shadows department overrides and patterns
+        elif ldap_dept and old_dept.get(ldap_dept) != (fingerprint(dept_overrides[ldap_dept]) if ldap_dept in dept_overrides else None):
+            dirty[pi_name] = "department override changed"
+        elif patterns_changed and old["source"] == "P":
+            dirty[pi_name] = "patterns changed"
+    return dirty
@@ -0,0 +1,137 @@
+"""
+Content-addressed on-disk cache for NIH RePORTER responses.
+
+Each response is stored under a SHA-256 of the canonical request payload
+(criteria, include_fields, offset, limit, sort). Closed fiscal years get a
+long TTL, the current fiscal year a short one, and the cache is capped in
+size with least-recently-used eviction.
+"""
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = ".reporter_cache"
+TTL_CLOSED_YEAR = 30 * 24 * 3600  # past fiscal years barely change
+TTL_OPEN_YEAR = 12 * 3600  # current fiscal year is still being awarded
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class CacheMiss(Exception):
+    """Raised in cache-only mode when a request is not cached."""
+
+
+def current_fiscal_year(today=None):
+    """Federal fiscal year: FY N runs from Oct 1 of N-1 through Sep 30 of N."""
+    today = today or datetime.date.today()
+    return today.year + 1 if today.month >= 10 else today.year
+
+
+def payload_key(payload):
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Args:
+        cache_dir: directory holding one <key>.json file per response.
+        max_bytes: total size cap; least recently used entries are evicted.
+        cache_only: never go to the network; a miss raises CacheMiss.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, cache_only=False,
+                 ttl_closed=TTL_CLOSED_YEAR, ttl_open=TTL_OPEN_YEAR):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.cache_only = cache_only
+        self.ttl_closed = ttl_closed
+        self.ttl_open = ttl_open
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # key -> size in bytes, oldest access first
+        self._index = OrderedDict()
+        entries = []
+        for entry in os.scandir(cache_dir):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+        self._total = sum(self._index.values())
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def ttl_for(self, payload):
+        years = payload.get("criteria", {}).get("fiscal_years") or []
+        current = current_fiscal_year()
+        if years and all(year < current for year in years):
+            return self.ttl_closed
+        return self.ttl_open
+
+    def get(self, payload):
+        """
+        Return the cached response for payload, or None if missing/expired.
+        In cache-only mode expired entries are still served and a miss raises CacheMiss.
+        """
+        key = payload_key(payload)
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+
+        fresh = entry is not None and time.time() - entry["fetched_at"] < self.ttl_for(payload)
+        if entry is not None and (fresh or self.cache_only):
+            with self._lock:
+                # Touched under the lock so put() cannot evict the file in between;
+                # an entry evicted since it was read counts as a miss
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    entry = None
+                else:
+                    self.hits += 1
+                    if key in self._index:
+                        self._index.move_to_end(key)
+            if entry is not None:
+                return entry["response"]
+
+        with self._lock:
+            self.misses += 1
+        if self.cache_only:
+            raise CacheMiss(f"Not cached: offset {payload.get('offset')} of {payload.get('criteria')}")
+        return None
+
+    def put(self, payload, response):
+        key = payload_key(payload)
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"fetched_at": time.time(), "response": response}, f)
+        size = os.path.getsize(tmp_path)
+
+        with self._lock:
+            # Swapped in under the lock too, so a concurrent eviction never sees a half-indexed entry
+            os.replace(tmp_path, path)
+            self._total += size - self._index.pop(key, 0)
+            self._index[key] = size
+            while self._total > self.max_bytes and len(self._index) > 1:
+                old_key, old_size = self._index.popitem(last=False)
+                self._total -= old_size
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+
+    def summary(self):
+        mb = self._total / (1024 * 1024)
+        return f"Cache: {self.hits} hits, {self.misses} misses ({len(self._index)} entries, {mb:.1f} MB)"
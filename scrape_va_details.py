@@ -1,6 +1,6 @@
 import requests
-import time
 import re
+import http_client
 from bs4 import BeautifulSoup
 
 VA_BASE_URL = "https://www.research.va.gov/about/funded_research"
@@ -18,7 +18,7 @@ def scrape_listing_page(year):
     print(f"  Fetching listing page: FY{year}...")
 
     try:
-        response = requests.get(url, timeout=30)
+        response = http_client.get(url, timeout=30)
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
         print(f"  Error fetching listing for FY{year}: {e}")
@@ -92,7 +92,7 @@ def scrape_detail_page(year, pid):
     url = VA_DETAIL_URL.format(year=year, pid=pid)
 
     try:
-        response = requests.get(url, timeout=30)
+        response = http_client.get(url, timeout=30)
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
         print(f"    Error fetching detail for pid={pid}: {e}")
@@ -150,7 +150,6 @@ def build_listing_index(years):
             # Keep the most recent year's entry if duplicate
             if proj_num not in index or entry["fiscal_year"] > index[proj_num]["fiscal_year"]:
                 index[proj_num] = entry
-        time.sleep(1)
     return index
 
 
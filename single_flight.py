@@ -0,0 +1,65 @@
+"""
+Single-flight de-duplication of equivalent lookups.
+
+Lookups are keyed by a canonical query key (e.g. the (surname, given name)
+pair an LDAP filter is built from). The first caller for a key runs the
+query; concurrent callers with the same key wait for it, and later callers
+reuse its result for the rest of the run (unless remember=False, which only
+coalesces calls that overlap in time). Failed queries are not remembered,
+so they are retried by the next caller.
+"""
+from concurrent.futures import Future
+import threading
+
+
+class SingleFlight:
+    def __init__(self, remember=True):
+        self.remember = remember
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> Future
+        self.requests = 0
+        self.executed = 0
+
+    def claim(self, key):
+        """
+        Returns (future, owner). The owner must run the query and resolve()
+        the future; everyone else waits on future.result().
+        """
+        with self._lock:
+            self.requests += 1
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.executed += 1
+            return future, True
+
+    def resolve(self, key, future, result=None, error=None):
+        if error is None and self.remember:
+            future.set_result(result)
+            return
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def do(self, key, fn):
+        """Run fn() once per key and share its result."""
+        future, owner = self.claim(key)
+        if not owner:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self.resolve(key, future, error=e)
+            raise
+        self.resolve(key, future, result)
+        return result
+
+    def summary(self):
+        saved = self.requests - self.executed
+        ratio = saved / self.requests if self.requests else 0.0
+        return f"Single-flight: {self.requests} lookups answered by {self.executed} queries ({saved} deduplicated, {ratio:.1%})"
@@ -186,200 +186,219 @@ UMN_STRUCTURE = {
     }
 }
 
-def get_school_for_department(dept_str):
-    """
-    Find the school for a given department string from LDAP.
-    Returns (school_name, normalized_department_name, division_name) tuple.
-    division_name is None when the department has no divisions or the
-    specific division could not be determined.
-    """
-    if not dept_str:
-        return None, None, None
+# Create a mapping of keywords/patterns to (school, normalized_dept, division)
+# Order matters: more specific patterns must appear before generic ones.
+DEPT_PATTERNS = {
+    # CFANS
+    "entomology": ("College of Food, Agricultural and Natural Resource Sciences", "Entomology", None),
+    "food sci": ("College of Food, Agricultural and Natural Resource Sciences", "Food Science and Nutrition", None),
+    "food/agr": ("College of Food, Agricultural and Natural Resource Sciences", "Food Science and Nutrition", None),
+    "agricultural": ("College of Food, Agricultural and Natural Resource Sciences", "Applied Economics", None),
+    "agronomy": ("College of Food, Agricultural and Natural Resource Sciences", "Plant and Soil Sciences", None),
+    "forest": ("College of Food, Agricultural and Natural Resource Sciences", "Forest Resources", None),
+    "animal science": ("College of Food, Agricultural and Natural Resource Sciences", "Animal Science", None),
+    "veterinary": ("College of Veterinary Medicine", "Veterinary Clinical Sciences", None),
+    "cvm": ("College of Veterinary Medicine", "Veterinary Clinical Sciences", None),
+    "cfans": ("College of Food, Agricultural and Natural Resource Sciences", "Applied Economics", None),
 
-    dept_lower = dept_str.lower()
+    # CLA
+    "lib arts": ("College of Liberal Arts", "Sociology", None),
+    "cla": ("College of Liberal Arts", "Sociology", None),
+    "art ": ("College of Liberal Arts", "Art", None),
+    "music": ("College of Liberal Arts", "Music", None),
+    "english": ("College of Liberal Arts", "English", None),
+    "history": ("College of Liberal Arts", "History", None),
+    "sociology": ("College of Liberal Arts", "Sociology", None),
+    "philosophy": ("College of Liberal Arts", "Philosophy", None),
+    "anthropology": ("College of Liberal Arts", "Anthropology", None),
+    "psychology": ("College of Liberal Arts", "Psychology", None),
+    "political science": ("College of Liberal Arts", "Political Science", None),
+    "economics": ("College of Liberal Arts", "Economics", None),
+    "communication": ("College of Liberal Arts", "Communication Studies", None),
+    "theatre": ("College of Liberal Arts", "Theatre Arts and Dance", None),
+    "dance": ("College of Liberal Arts", "Theatre Arts and Dance", None),
+    "linguistics": ("College of Liberal Arts", "Linguistics", None),
+    "german": ("College of Liberal Arts", "German, Scandinavian and Dutch", None),
+    "scandinavian": ("College of Liberal Arts", "Scandinavian Studies", None),
+    "french": ("College of Liberal Arts", "French and Italian", None),
+    "italian": ("College of Liberal Arts", "French and Italian", None),
+    "spanish": ("College of Liberal Arts", "Spanish and Portuguese", None),
+    "portuguese": ("College of Liberal Arts", "Spanish and Portuguese", None),
+    "asian": ("College of Liberal Arts", "Asian Languages and Literatures", None),
+    "classics": ("College of Liberal Arts", "Classics", None),
+    "religious": ("College of Liberal Arts", "Religious Studies", None),
 
-    # Create a mapping of keywords/patterns to (school, normalized_dept, division)
-    # Order matters: more specific patterns must appear before generic ones.
-    dept_patterns = {
-        # CFANS
-        "entomology": ("College of Food, Agricultural and Natural Resource Sciences", "Entomology", None),
-        "food sci": ("College of Food, Agricultural and Natural Resource Sciences", "Food Science and Nutrition", None),
-        "food/agr": ("College of Food, Agricultural and Natural Resource Sciences", "Food Science and Nutrition", None),
-        "agricultural": ("College of Food, Agricultural and Natural Resource Sciences", "Applied Economics", None),
-        "agronomy": ("College of Food, Agricultural and Natural Resource Sciences", "Plant and Soil Sciences", None),
-        "forest": ("College of Food, Agricultural and Natural Resource Sciences", "Forest Resources", None),
-        "animal science": ("College of Food, Agricultural and Natural Resource Sciences", "Animal Science", None),
-        "veterinary": ("College of Veterinary Medicine", "Veterinary Clinical Sciences", None),
-        "cvm": ("College of Veterinary Medicine", "Veterinary Clinical Sciences", None),
-        "cfans": ("College of Food, Agricultural and Natural Resource Sciences", "Applied Economics", None),
+    # CSE
+    "biomedical eng": ("College of Science and Engineering", "Biomedical Engineering", None),
+    "cseng chemical": ("College of Science and Engineering", "Chemical Engineering and Materials Science", None),
+    "cseng chemistry": ("College of Science and Engineering", "Chemistry", None),
+    "chemistry admin": ("College of Science and Engineering", "Chemistry", None),
+    "cseng civil": ("College of Science and Engineering", "Civil, Environmental and Geo-Engineering", None),
+    "cseng mech": ("College of Science and Engineering", "Mechanical Engineering", None),
+    "mechanical eng": ("College of Science and Engineering", "Mechanical Engineering", None),
+    "computer science": ("College of Science and Engineering", "Computer Science and Engineering", None),
+    "cseng aerospace": ("College of Science and Engineering", "Aerospace Engineering and Mechanics", None),
+    "industrial system": ("College of Science and Engineering", "Industrial and Systems Engineering", None),
+    "geology": ("College of Science and Engineering", "Geological Sciences", None),
+    "physics": ("College of Science and Engineering", "Physics", None),
+    "mathematics": ("College of Science and Engineering", "Mathematics", None),
+    "cseng ece": ("College of Science and Engineering", "Electrical and Computer Engineering", None),
+    "cseng earth": ("College of Science and Engineering", "Geological Sciences", None),
+    "cseng industrial": ("College of Science and Engineering", "Industrial and Systems Engineering", None),
+    "cseng robotics": ("College of Science and Engineering", "Computer Science and Engineering", None),
+    "cseng": ("College of Science and Engineering", "Chemistry", None),
+    "science/eng": ("College of Science and Engineering", "Chemistry", None),
+    "statistics": ("College of Science and Engineering", "Mathematics", None),
+    "bio science": ("College of Biological Sciences", "Biology", None),
+    "cbs": ("College of Biological Sciences", "Biology", None),
+    "medicinal chemistry": ("College of Science and Engineering", "Chemistry", None),
 
-        # CLA
-        "lib arts": ("College of Liberal Arts", "Sociology", None),
-        "cla": ("College of Liberal Arts", "Sociology", None),
-        "art ": ("College of Liberal Arts", "Art", None),
-        "music": ("College of Liberal Arts", "Music", None),
-        "english": ("College of Liberal Arts", "English", None),
-        "history": ("College of Liberal Arts", "History", None),
-        "sociology": ("College of Liberal Arts", "Sociology", None),
-        "philosophy": ("College of Liberal Arts", "Philosophy", None),
-        "anthropology": ("College of Liberal Arts", "Anthropology", None),
-        "psychology": ("College of Liberal Arts", "Psychology", None),
-        "political science": ("College of Liberal Arts", "Political Science", None),
-        "economics": ("College of Liberal Arts", "Economics", None),
-        "communication": ("College of Liberal Arts", "Communication Studies", None),
-        "theatre": ("College of Liberal Arts", "Theatre Arts and Dance", None),
-        "dance": ("College of Liberal Arts", "Theatre Arts and Dance", None),
-        "linguistics": ("College of Liberal Arts", "Linguistics", None),
-        "german": ("College of Liberal Arts", "German, Scandinavian and Dutch", None),
-        "scandinavian": ("College of Liberal Arts", "Scandinavian Studies", None),
-        "french": ("College of Liberal Arts", "French and Italian", None),
-        "italian": ("College of Liberal Arts", "French and Italian", None),
-        "spanish": ("College of Liberal Arts", "Spanish and Portuguese", None),
-        "portuguese": ("College of Liberal Arts", "Spanish and Portuguese", None),
-        "asian": ("College of Liberal Arts", "Asian Languages and Literatures", None),
-        "classics": ("College of Liberal Arts", "Classics", None),
-        "religious": ("College of Liberal Arts", "Religious Studies", None),
+    # Carlson
+    "carlson": ("Carlson School of Management", "Business and Management", None),
+    "management": ("Carlson School of Management", "Business and Management", None),
+    "accounting": ("Carlson School of Management", "Accounting", None),
+    "finance": ("Carlson School of Management", "Finance", None),
+    "bus/econ": ("Carlson School of Management", "Business and Management", None),
 
-        # CSE
-        "biomedical eng": ("College of Science and Engineering", "Biomedical Engineering", None),
-        "cseng chemical": ("College of Science and Engineering", "Chemical Engineering and Materials Science", None),
-        "cseng chemistry": ("College of Science and Engineering", "Chemistry", None),
-        "chemistry admin": ("College of Science and Engineering", "Chemistry", None),
-        "cseng civil": ("College of Science and Engineering", "Civil, Environmental and Geo-Engineering", None),
-        "cseng mech": ("College of Science and Engineering", "Mechanical Engineering", None),
-        "mechanical eng": ("College of Science and Engineering", "Mechanical Engineering", None),
-        "computer science": ("College of Science and Engineering", "Computer Science and Engineering", None),
-        "cseng aerospace": ("College of Science and Engineering", "Aerospace Engineering and Mechanics", None),
-        "industrial system": ("College of Science and Engineering", "Industrial and Systems Engineering", None),
-        "geology": ("College of Science and Engineering", "Geological Sciences", None),
-        "physics": ("College of Science and Engineering", "Physics", None),
-        "mathematics": ("College of Science and Engineering", "Mathematics", None),
-        "cseng ece": ("College of Science and Engineering", "Electrical and Computer Engineering", None),
-        "cseng earth": ("College of Science and Engineering", "Geological Sciences", None),
-        "cseng industrial": ("College of Science and Engineering", "Industrial and Systems Engineering", None),
-        "cseng robotics": ("College of Science and Engineering", "Computer Science and Engineering", None),
-        "cseng": ("College of Science and Engineering", "Chemistry", None),
-        "science/eng": ("College of Science and Engineering", "Chemistry", None),
-        "statistics": ("College of Science and Engineering", "Mathematics", None),
-        "bio science": ("College of Biological Sciences", "Biology", None),
-        "cbs": ("College of Biological Sciences", "Biology", None),
-        "medicinal chemistry": ("College of Science and Engineering", "Chemistry", None),
+    # Medical School — Department of Medicine divisions (must precede generic "medicine")
+    "med cardiology": ("Medical School", "Medicine", "Cardiovascular"),
+    "med endocrine": ("Medical School", "Medicine", "Diabetes, Endocrinology and Metabolism"),
+    "med gastro": ("Medical School", "Medicine", "Gastroenterology, Hepatology and Nutrition"),
+    "med general": ("Medical School", "Medicine", "General Internal Medicine"),
+    "med hema": ("Medical School", "Medicine", "Hematology, Oncology and Transplantation"),
+    "med inf disease": ("Medical School", "Medicine", "Infectious Diseases and International Medicine"),
+    "med nephrology": ("Medical School", "Medicine", "Nephrology and Hypertension"),
+    "med pulmonary": ("Medical School", "Medicine", "Pulmonary, Allergy, Critical Care and Sleep Medicine"),
+    "med rheumatic": ("Medical School", "Medicine", "Rheumatic and Autoimmune Diseases"),
+    "med veteran": ("Medical School", "Medicine", None),
+    # Medical School — other departments
+    "medicine": ("Medical School", "Medicine", None),
+    "med sch": ("Medical School", "Medicine", None),
+    "anesthesiology": ("Medical School", "Anesthesiology", None),
+    "anes": ("Medical School", "Anesthesiology", None),
+    "dermatology": ("Medical School", "Dermatology", None),
+    "neurology": ("Medical School", "Neurology", None),
+    "neuroscience": ("Medical School", "Neuroscience", None),
+    "neurosurgery": ("Medical School", "Neurosurgery", None),
+    "oncology": ("Medical School", "Oncology", None),
+    "pediatrics": ("Medical School", "Pediatrics", None),
+    "peds": ("Medical School", "Pediatrics", None),
+    "psychiatry": ("Medical School", "Psychiatry", None),
+    "radiology": ("Medical School", "Radiology", None),
+    "magnetic resonance": ("Medical School", "Radiology", None),
+    "surgery": ("Medical School", "Surgery", None),
+    "internal medicine": ("Medical School", "Medicine", "General Internal Medicine"),
+    "obstetrics": ("Medical School", "Obstetrics, Gynecology and Reproductive Medicine", None),
+    "ob/gyn": ("Medical School", "Obstetrics, Gynecology and Reproductive Medicine", None),
+    "orthop": ("Medical School", "Orthopaedic Surgery", None),
+    "otolaryngology": ("Medical School", "Otolaryngology", None),
+    "urology": ("Medical School", "Urology", None),
+    "ophthalmology": ("Medical School", "Ophthalmology", None),
+    "pharmacology": ("Medical School", "Pharmacology", None),
+    "lab med": ("Medical School", "Laboratory Medicine and Pathology", None),
+    "pathology": ("Medical School", "Pathology", None),
+    "microbiology": ("Medical School", "Microbiology and Immunology", None),
+    "immunology": ("Medical School", "Immunology", None),
+    "biochemistry": ("Medical School", "Biochemistry, Molecular Biology and Biophysics", None),
+    "bmbb": ("Medical School", "Biochemistry, Molecular Biology and Biophysics", None),
+    "genetics": ("Medical School", "Genetics, Cell Biology and Development", None),
+    "physiology": ("Medical School", "Physiology", None),
+    "fammed": ("Medical School", "Family Medicine and Community Health", None),
+    "family medicine": ("Medical School", "Family Medicine and Community Health", None),
+    "dmed": ("Medical School", "Family Medicine and Community Health", None),
+    "emergency": ("Medical School", "Emergency Medicine", None),
+    "dent biomaterials": ("Medical School", "Biomaterials", None),
+    "dent molecular": ("Medical School", "Microbiology and Immunology", None),
+    "experimental clinical pharm": ("Medical School", "Pharmacology", None),
+    "experimental & clinical pharm": ("Medical School", "Pharmacology", None),
+    "health informatics": ("Medical School", "Medicine", None),
+    "ms dean": ("Medical School", "Dean's Office", None),
+    "ms md/phd": ("Medical School", "Dean's Office", None),
+    "ms research": ("Medical School", "Dean's Office", None),
 
-        # Carlson
-        "carlson": ("Carlson School of Management", "Business and Management", None),
-        "management": ("Carlson School of Management", "Business and Management", None),
-        "accounting": ("Carlson School of Management", "Accounting", None),
-        "finance": ("Carlson School of Management", "Finance", None),
-        "bus/econ": ("Carlson School of Management", "Business and Management", None),
+    # Dentistry
+    "dent basic": ("School of Dentistry", "Oral Biology and Diagnostic Sciences", None),
+    "dent periodontics": ("School of Dentistry", "Periodontics, Prosthodontics and Implant Dentistry", None),
+    "endodontics": ("School of Dentistry", "Endodontics", None),
+    "oral surgery": ("School of Dentistry", "Oral and Maxillofacial Surgery", None),
+    "lmp": ("School of Dentistry", "Oral and Maxillofacial Pathology", None),
+    "gcd": ("School of Dentistry", "Oral Biology and Diagnostic Sciences", None),
+    "dent": ("School of Dentistry", "Oral Biology and Diagnostic Sciences", None),
+    "dentistry": ("School of Dentistry", "Oral Biology and Diagnostic Sciences", None),
 
-        # Medical School — Department of Medicine divisions (must precede generic "medicine")
-        "med cardiology": ("Medical School", "Medicine", "Cardiovascular"),
-        "med endocrine": ("Medical School", "Medicine", "Diabetes, Endocrinology and Metabolism"),
-        "med gastro": ("Medical School", "Medicine", "Gastroenterology, Hepatology and Nutrition"),
-        "med general": ("Medical School", "Medicine", "General Internal Medicine"),
-        "med hema": ("Medical School", "Medicine", "Hematology, Oncology and Transplantation"),
-        "med inf disease": ("Medical School", "Medicine", "Infectious Diseases and International Medicine"),
-        "med nephrology": ("Medical School", "Medicine", "Nephrology and Hypertension"),
-        "med pulmonary": ("Medical School", "Medicine", "Pulmonary, Allergy, Critical Care and Sleep Medicine"),
-        "med rheumatic": ("Medical School", "Medicine", "Rheumatic and Autoimmune Diseases"),
-        "med veteran": ("Medical School", "Medicine", None),
-        # Medical School — other departments
-        "medicine": ("Medical School", "Medicine", None),
-        "med sch": ("Medical School", "Medicine", None),
-        "anesthesiology": ("Medical School", "Anesthesiology", None),
-        "anes": ("Medical School", "Anesthesiology", None),
-        "dermatology": ("Medical School", "Dermatology", None),
-        "neurology": ("Medical School", "Neurology", None),
-        "neuroscience": ("Medical School", "Neuroscience", None),
-        "neurosurgery": ("Medical School", "Neurosurgery", None),
-        "oncology": ("Medical School", "Oncology", None),
-        "pediatrics": ("Medical School", "Pediatrics", None),
-        "peds": ("Medical School", "Pediatrics", None),
-        "psychiatry": ("Medical School", "Psychiatry", None),
-        "radiology": ("Medical School", "Radiology", None),
-        "magnetic resonance": ("Medical School", "Radiology", None),
-        "surgery": ("Medical School", "Surgery", None),
-        "internal medicine": ("Medical School", "Medicine", "General Internal Medicine"),
-        "obstetrics": ("Medical School", "Obstetrics, Gynecology and Reproductive Medicine", None),
-        "ob/gyn": ("Medical School", "Obstetrics, Gynecology and Reproductive Medicine", None),
-        "orthop": ("Medical School", "Orthopaedic Surgery", None),
-        "otolaryngology": ("Medical School", "Otolaryngology", None),
-        "urology": ("Medical School", "Urology", None),
-        "ophthalmology": ("Medical School", "Ophthalmology", None),
-        "pharmacology": ("Medical School", "Pharmacology", None),
-        "lab med": ("Medical School", "Laboratory Medicine and Pathology", None),
-        "pathology": ("Medical School", "Pathology", None),
-        "microbiology": ("Medical School", "Microbiology and Immunology", None),
-        "immunology": ("Medical School", "Immunology", None),
-        "biochemistry": ("Medical School", "Biochemistry, Molecular Biology and Biophysics", None),
-        "bmbb": ("Medical School", "Biochemistry, Molecular Biology and Biophysics", None),
-        "genetics": ("Medical School", "Genetics, Cell Biology and Development", None),
-        "physiology": ("Medical School", "Physiology", None),
-        "fammed": ("Medical School", "Family Medicine and Community Health", None),
-        "family medicine": ("Medical School", "Family Medicine and Community Health", None),
-        "dmed": ("Medical School", "Family Medicine and Community Health", None),
-        "emergency": ("Medical School", "Emergency Medicine", None),
-        "dent biomaterials": ("Medical School", "Biomaterials", None),
-        "dent molecular": ("Medical School", "Microbiology and Immunology", None),
-        "experimental clinical pharm": ("Medical School", "Pharmacology", None),
-        "experimental & clinical pharm": ("Medical School", "Pharmacology", None),
-        "health informatics": ("Medical School", "Medicine", None),
-        "ms dean": ("Medical School", "Dean's Office", None),
-        "ms md/phd": ("Medical School", "Dean's Office", None),
-        "ms research": ("Medical School", "Dean's Office", None),
+    # Nursing
+    "nursing": ("School of Nursing", "Nursing", None),
+    "son": ("School of Nursing", "Nursing", None),
 
-        # Dentistry
-        "dent basic": ("School of Dentistry", "Oral Biology and Diagnostic Sciences", None),
-        "dent periodontics": ("School of Dentistry", "Periodontics, Prosthodontics and Implant Dentistry", None),
-        "endodontics": ("School of Dentistry", "Endodontics", None),
-        "oral surgery": ("School of Dentistry", "Oral and Maxillofacial Surgery", None),
-        "lmp": ("School of Dentistry", "Oral and Maxillofacial Pathology", None),
-        "gcd": ("School of Dentistry", "Oral Biology and Diagnostic Sciences", None),
-        "dent": ("School of Dentistry", "Oral Biology and Diagnostic Sciences", None),
-        "dentistry": ("School of Dentistry", "Oral Biology and Diagnostic Sciences", None),
+    # Public Health
+    "sph": ("School of Public Health", "Division of Epidemiology and Community Health", None),
+    "public hlth": ("School of Public Health", "Division of Epidemiology and Community Health", None),
+    "epidemiology": ("School of Public Health", "Division of Epidemiology and Community Health", None),
+    "biostatistics": ("School of Public Health", "Biostatistics", None),
+    "environmental health": ("School of Public Health", "Division of Environmental Health Sciences", None),
+    "health policy": ("School of Public Health", "Division of Health Policy and Management", None),
 
-        # Nursing
-        "nursing": ("School of Nursing", "Nursing", None),
-        "son": ("School of Nursing", "Nursing", None),
+    # Pharmacy
+    "pharmacy": ("School of Pharmacy", "Pharmacy", None),
+    "cop": ("School of Pharmacy", "Pharmacy", None),
 
-        # Public Health
-        "sph": ("School of Public Health", "Division of Epidemiology and Community Health", None),
-        "public hlth": ("School of Public Health", "Division of Epidemiology and Community Health", None),
-        "epidemiology": ("School of Public Health", "Division of Epidemiology and Community Health", None),
-        "biostatistics": ("School of Public Health", "Biostatistics", None),
-        "environmental health": ("School of Public Health", "Division of Environmental Health Sciences", None),
-        "health policy": ("School of Public Health", "Division of Health Policy and Management", None),
+    # Architecture
+    "architecture": ("School of Architecture", "Architecture", None),
+    "design": ("School of Architecture", "Architecture", None),
 
-        # Pharmacy
-        "pharmacy": ("School of Pharmacy", "Pharmacy", None),
-        "cop": ("School of Pharmacy", "Pharmacy", None),
+    # Humphrey School of Public Affairs
+    "hhh": ("Humphrey School of Public Affairs", "Public Policy", None),
 
-        # Architecture
-        "architecture": ("School of Architecture", "Architecture", None),
-        "design": ("School of Architecture", "Architecture", None),
+    # Other Colleges
+    "kinesiology": ("College of Liberal Arts", "Psychology", None),
+    "ed psych": ("College of Liberal Arts", "Psychology", None),
+    "cehd": ("College of Liberal Arts", "Education", None),
+    "educ/hum": ("College of Liberal Arts", "Education", None),
+    "speech-language": ("College of Liberal Arts", "Communication Studies", None),
+    "physical therapy": ("College of Liberal Arts", "Psychology", None),
+    "child development": ("College of Liberal Arts", "Psychology", None),
+    "fsos": ("College of Liberal Arts", "Sociology", None),
+    "grad dean": ("Graduate School", "Graduate Studies", None),
+    "grad school": ("Graduate School", "Graduate Studies", None),
+    "law school": ("Law School", "Law", None),
+    "hormel": ("The Hormel Institute", "Research", None),
+}
 
-        # Humphrey School of Public Affairs
-        "hhh": ("Humphrey School of Public Affairs", "Public Policy", None),
+# All patterns compiled once into a single regex. Each alternative keeps the
+# word-boundary semantics of r'\b' + re.escape(pattern) + r'\b' and ends in
+# an empty marker group, so match.lastindex names the pattern (a leading
+# literal also lets the regex engine skip non-matching alternatives cheaply).
+# The zero-width lookahead lets finditer report a match at every position,
+# and since an alternation prefers its earliest alternative, taking the
+# lowest pattern index over all positions reproduces the in-order scan.
+_PATTERN_VALUES = list(DEPT_PATTERNS.values())
+_DEPT_MATCHER = re.compile(
+    r'(?=\b(?:' + '|'.join(re.escape(p) + '()' for p in DEPT_PATTERNS) + r')\b)')
 
-        # Other Colleges
-        "kinesiology": ("College of Liberal Arts", "Psychology", None),
-        "ed psych": ("College of Liberal Arts", "Psychology", None),
-        "cehd": ("College of Liberal Arts", "Education", None),
-        "educ/hum": ("College of Liberal Arts", "Education", None),
-        "speech-language": ("College of Liberal Arts", "Communication Studies", None),
-        "physical therapy": ("College of Liberal Arts", "Psychology", None),
-        "child development": ("College of Liberal Arts", "Psychology", None),
-        "fsos": ("College of Liberal Arts", "Sociology", None),
-        "grad dean": ("Graduate School", "Graduate Studies", None),
-        "grad school": ("Graduate School", "Graduate Studies", None),
-        "law school": ("Law School", "Law", None),
-        "hormel": ("The Hormel Institute", "Research", None),
-    }
 
-    # Try to match patterns (word-boundary regex to avoid false substring matches)
-    for pattern, (school, dept, division) in dept_patterns.items():
-        if re.search(r'\b' + re.escape(pattern) + r'\b', dept_lower):
-            return school, dept, division
+def get_school_for_department(dept_str):
+    """
+    Find the school for a given department string from LDAP.
+    Returns (school_name, normalized_department_name, division_name) tuple.
+    division_name is None when the department has no divisions or the
+    specific division could not be determined.
+    """
+    if not dept_str:
+        return None, None, None
+
+    dept_lower = dept_str.lower()
+
+    # Try to match patterns (word-boundary regex to avoid false substring
+    # matches); the earliest pattern in DEPT_PATTERNS wins
+    best = None
+    for match in _DEPT_MATCHER.finditer(dept_lower):
+        index = match.lastindex - 1
+        if best is None or index < best:
+            best = index
+            if best == 0:
+                break
+    if best is not None:
+        return _PATTERN_VALUES[best]
 
     # Default fallback
     return None, dept_str, None